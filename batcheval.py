@@ -0,0 +1,119 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+Evaluates arrays of hands with NumPy. NumPy is only needed by this module, so it is an optional dependency of the
+package: install it with ``pip install numpy`` to use the batch evaluator. The game, the engine, equity.py and
+preflop.py run without it.
+"""
+
+import numpy as np
+from cardlib import *
+
+
+_arrays = None
+
+
+def _evaluation_arrays():
+    """Converts the lookup tables of the cardlib evaluator into NumPy arrays the first time they are needed.
+
+        :return: The sorted rank hashes, the dense rank of each of them, the dense rank of every 13-bit flush rank mask
+         (0 if it is not a flush) and the rank hash of every card code.
+        :rtype: tuple of numpy.ndarray
+            """
+    global _arrays
+    if _arrays is None:
+        rank_table, flush_table = evaluation_tables()
+
+        rank_keys = np.array(sorted(rank_table), dtype=np.int64)
+        # The fractional ranks of hands of fewer than five cards are never looked up, since rows hold five to seven.
+        rank_ranks = np.array([int(rank_table[key][2]) for key in rank_keys.tolist()], dtype=np.int64)
+
+        flush_ranks = np.zeros(1 << 13, dtype=np.int64)
+        for rank_mask, entry in flush_table.items():
+            flush_ranks[rank_mask] = entry[2]
+
+        card_rank_keys = np.array([5 ** (code // 4) for code in range(52)], dtype=np.int64)
+
+        _arrays = rank_keys, rank_ranks, flush_ranks, card_rank_keys
+    return _arrays
+
+
+def prepare():
+    """A function that builds the lookup arrays of evaluate_batch now rather than at its first call, which takes a
+    few seconds. Worker processes forked afterwards inherit the arrays instead of building their own.
+    """
+    _evaluation_arrays()
+
+
+def evaluate_batch(codes):
+    """A function that evaluates many hands at once using NumPy array operations only.
+
+    The returned integers are the same dense ranks as PokerHand.rank, between 1 and 7462: a larger number is a
+    better hand and equal numbers are a tie, so the winner of a showdown is found with argmax.
+
+        :param codes: Card codes with one hand of five to seven cards per row.
+        :type codes: numpy.ndarray of shape (N, K)
+        :return: The dense rank of every hand.
+        :rtype: numpy.ndarray of shape (N,)
+            """
+    rank_keys, rank_ranks, flush_ranks, card_rank_keys = _evaluation_arrays()
+
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.ndim != 2 or not 5 <= codes.shape[1] <= 7:
+        raise ValueError('The card codes must have the shape (N, K) with K between 5 and 7.')
+    if codes.size and (codes.min() < 0 or codes.max() > 51):
+        raise ValueError('The card codes must be between 0 and 51.')
+    if (np.diff(np.sort(codes, axis=1), axis=1) == 0).any():
+        raise ValueError('The same card can not be in a hand twice.')
+
+    # Hands without a flush: look up the rank hash among the sorted table keys.
+    rank_hash = card_rank_keys[codes].sum(axis=1)
+    ranks = rank_ranks[np.searchsorted(rank_keys, rank_hash)]
+
+    # Hands with a flush: look up the rank mask of the cards in the flush suit.
+    suits = codes & 3
+    suit_counts = np.stack([(suits == suit).sum(axis=1) for suit in range(4)], axis=1)
+    flush_suit = suit_counts.argmax(axis=1)
+    has_flush = suit_counts.max(axis=1) >= 5
+    in_flush = suits == flush_suit[:, None]
+    flush_mask = np.where(in_flush, np.left_shift(1, codes >> 2), 0).sum(axis=1)
+
+    return np.where(has_flush, flush_ranks[flush_mask], ranks)
+
+
+def hands_to_codes(hands):
+    """A function that converts a list of hands into an array of card codes accepted by evaluate_batch.
+
+        :param hands: Hands with the same number of cards each.
+        :type hands: list of list of PlayingCard
+        :return: The card codes, one hand per row.
+        :rtype: numpy.ndarray of shape (N, K)
+            """
+    return np.array([[c.code for c in hand] for hand in hands], dtype=np.int64)
+
+
+def random_deals(seed_sequence, count, cards, excluded=()):
+    """A function that deals many random sets of cards at once with a NumPy generator, for example the runouts of a
+    Monte Carlo equity estimate in bulk. The same seed sequence always gives the same deals.
+
+        :param seed_sequence: The seed sequence of the random stream, for example a child of the root sequence.
+        :type seed_sequence: SeedSequence
+        :param count: The number of deals.
+        :type count: int
+        :param cards: The number of cards in every deal.
+        :type cards: int
+        :param excluded: Codes of cards that are not in the deck.
+        :type excluded: collection of int
+        :return: The card codes, one deal per row, that can be joined with the known cards and given to evaluate_batch.
+        :rtype: numpy.ndarray of shape (count, cards)
+            """
+    excluded = set(excluded)
+    stub = np.array([code for code in range(52) if code not in excluded], dtype=np.int64)
+    if not 0 <= cards <= len(stub):
+        raise ValueError(f'Cannot deal {cards} cards from a deck of {len(stub)} cards.')
+
+    rng = np.random.default_rng(np.random.SeedSequence(seed_sequence.generate_state()))
+    # Every row is an independent random permutation of the stub, of which the first cards are dealt.
+    order = rng.random((count, len(stub))).argsort(axis=1)[:, :cards]
+    return stub[order]
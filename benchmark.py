@@ -0,0 +1,305 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+Benchmarks of the hot paths of cardlib and pokermodel.
+
+Run with ``python benchmark.py``. The results are printed and written as JSON, by default to the temporary directory,
+and compared against a stored baseline to catch performance regressions. The timings depend on the machine, so the
+baseline is stored on the machine that runs the comparison, and the comparison fails until there is one::
+
+    python benchmark.py --save-baseline
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import platform
+import random
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from cardlib import *
+
+
+BENCHMARKS = {}  #: Maps the name of every benchmark to a function that sets it up.
+
+
+def benchmark(name):
+    """A decorator that registers a benchmark. The decorated function prepares the inputs and returns a function
+    without arguments that performs one operation.
+
+        :param name: The name of the benchmark in the results.
+        :type name: str
+            """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# One hand of every PokerHierarchy class, as card codes (code = 4 * (value - 2) + suit index).
+HIERARCHY_HANDS = {
+    PokerHierarchy.Straight_Flush: [48, 44, 40, 36, 32, 1, 6],
+    PokerHierarchy.Four_of_a_Kind: [48, 49, 50, 51, 32, 1, 6],
+    PokerHierarchy.Full_House: [48, 49, 50, 44, 45, 1, 6],
+    PokerHierarchy.Flush: [48, 40, 32, 20, 8, 1, 6],
+    PokerHierarchy.Straight: [48, 45, 42, 39, 32, 1, 6],
+    PokerHierarchy.Three_of_a_Kind: [48, 49, 50, 41, 34, 1, 6],
+    PokerHierarchy.Two_Pairs: [48, 49, 41, 42, 32, 1, 6],
+    PokerHierarchy.Pair: [48, 49, 41, 34, 27, 1, 6],
+    PokerHierarchy.High_cards: [48, 41, 34, 27, 16, 1, 6],
+}
+
+
+def _random_hands(count, size=7, seed=0):
+    """Returns a list of random hands of the given size.
+    """
+    rng = random.Random(seed)
+    return [rng.sample(CARDS, size) for _ in range(count)]
+
+
+@benchmark('deck.construct')
+def _deck_construct():
+    return StandardDeck
+
+
+@benchmark('deck.shuffle_draw')
+def _deck_shuffle_draw():
+    def op():
+        deck = StandardDeck()
+        deck.shuffle()
+        for _ in range(9):
+            deck.draw()
+    return op
+
+
+@benchmark('deck.reset_shuffle_draw')
+def _deck_reset_shuffle_draw():
+    deck = StandardDeck()
+
+    def op():
+        deck.reset()
+        deck.shuffle(9)
+        for _ in range(9):
+            deck.draw()
+    return op
+
+
+@benchmark('hand.best_poker_hand')
+def _best_poker_hand():
+    hands = []
+    for cards in _random_hands(1000):
+        hand = Hand()
+        hand.add_card(cards[0])
+        hand.add_card(cards[1])
+        hands.append((hand, cards[2:]))
+    state = {'i': 0}
+
+    def op():
+        i = state['i'] = (state['i'] + 1) % len(hands)
+        hand, board = hands[i]
+        hand.best_poker_hand(board)
+    return op
+
+
+@benchmark('hand.best_poker_hand_same_board')
+def _best_poker_hand_same_board():
+    # One board against a range of hole cards, evaluated again and again like an analysis of a spot.
+    rng = random.Random(0)
+    board = rng.sample(CARDS, 5)
+    rest = [card for card in CARDS if card not in board]
+    hands = []
+    for _ in range(200):
+        hand = Hand()
+        for card in rng.sample(rest, 2):
+            hand.add_card(card)
+        hands.append(hand)
+    state = {'i': 0}
+
+    def op():
+        i = state['i'] = (state['i'] + 1) % len(hands)
+        hands[i].best_poker_hand(board)
+    return op
+
+
+@benchmark('cache.evaluate_9_cards')
+def _cache_evaluate():
+    # Hands of more than seven cards are evaluated by _evaluate_many, which the cache saves on repeats.
+    cache = EvaluationCache(1 << 10)
+    hands = [[card.code for card in cards] for cards in _random_hands(200, size=9)]
+    state = {'i': 0}
+
+    def op():
+        i = state['i'] = (state['i'] + 1) % len(hands)
+        cache.evaluate(hands[i])
+    return op
+
+
+def _checks_benchmark(cards):
+    cards = sorted(CARDS[code] for code in cards)
+    return lambda: PokerHand.evaluate_by_checks(cards)
+
+
+def _poker_hand_benchmark(cards):
+    cards = [CARDS[code] for code in cards]
+    return lambda: PokerHand(cards)
+
+
+for _hand_type, _codes in HIERARCHY_HANDS.items():
+    benchmark(f'checks.{_hand_type.name}')(lambda codes=_codes: _checks_benchmark(codes))
+    benchmark(f'poker_hand.{_hand_type.name}')(lambda codes=_codes: _poker_hand_benchmark(codes))
+
+
+def _round_benchmark(game):
+    game.start_game(('Player 1', 'Player 2', str(10 ** 12)))
+
+    def op():
+        # Bet and call preflop, then check every street down to the showdown which starts the next round: eight
+        # actions heads-up.
+        rounds = game.rounds
+        game.bet('1')
+        while game.rounds == rounds:
+            game.call()
+    return op
+
+
+@benchmark('engine.round')
+def _engine_round():
+    from pokerengine import GameEngine
+    return _round_benchmark(GameEngine())
+
+
+@benchmark('gamemodel.round')
+def _game_round():
+    from pokermodel import GameModel
+    return _round_benchmark(GameModel())
+
+
+def measure(setup, min_time=0.2, repeats=3):
+    """A function that times a benchmark and measures its peak memory.
+
+        :param setup: The function that sets up the benchmark.
+        :type setup: callable
+        :param min_time: The minimum number of seconds of every timed repeat.
+        :type min_time: float
+        :param repeats: The number of timed repeats, of which the fastest is kept.
+        :type repeats: int
+        :return: The operations per second, nanoseconds per operation and peak memory in bytes.
+        :rtype: dict
+            """
+    op = setup()
+    op()
+
+    # Find a number of operations that runs for at least min_time.
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed * 1.2)))
+
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        best = min(best, time.perf_counter() - start)
+
+    # Only the operations are traced, not the setup.
+    op = setup()
+    tracemalloc.start()
+    try:
+        for _ in range(min(number, 1000)):
+            op()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'ops_per_sec': number / best, 'ns_per_op': best / number * 1e9, 'peak_memory_bytes': peak}
+
+
+def compare(results, baseline, tolerance):
+    """A function that finds the benchmarks that got slower than the baseline.
+
+        :param results: The current results.
+        :type results: dict
+        :param baseline: The stored results.
+        :type baseline: dict
+        :param tolerance: The allowed relative slowdown, 0.2 means 20 % more time per operation.
+        :type tolerance: float
+        :return: The names of the regressed benchmarks with their relative change in time per operation.
+        :rtype: dict
+            """
+    regressions = {}
+    for name, result in results.items():
+        if name in baseline:
+            change = result['ns_per_op'] / baseline[name]['ns_per_op'] - 1
+            if change > tolerance:
+                regressions[name] = change
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the cardlib and pokermodel hot paths.')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'benchmark_results.json'),
+                        help='file to write the JSON results to (default: in the temporary directory)')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='stored results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per timed repeat')
+    args = parser.parse_args(argv)
+
+    # The benchmarks cycle over fixed hands, so they would time the evaluation cache instead of the evaluator.
+    EVALUATION_CACHE.maxsize = 0
+    EVALUATION_CACHE.clear()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        try:
+            results[name] = measure(setup, args.min_time)
+        except ImportError as e:
+            print(f'{name:<32} skipped ({e})')
+            continue
+        r = results[name]
+        print(f'{name:<32} {r["ops_per_sec"]:>14,.0f} ops/s {r["ns_per_op"]:>14,.0f} ns/op '
+              f'{r["peak_memory_bytes"] / 1024:>10,.1f} KiB peak')
+
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    except FileNotFoundError:
+        print(f'ERROR no baseline at {args.baseline}, nothing was compared. Store one on this machine with '
+              f'--save-baseline.', file=sys.stderr)
+        return 2
+
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f'WARNING the baseline has no results for {", ".join(missing)}, store a new one with --save-baseline.',
+              file=sys.stderr)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, change in regressions.items():
+        print(f'REGRESSION {name}: {change:+.0%} time per operation compared to the baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,14 @@
 from enum import Enum
 from abc import ABC, abstractmethod
 import random
-from collections import Counter
+from collections import Counter, OrderedDict
+from bisect import bisect_left
+from array import array
+import hashlib
+import math
+import os
+import struct
+import sys
 
 
 class Suit(Enum):
@@ -19,9 +26,16 @@ class Suit(Enum):
 
 class PlayingCard(ABC):
     """An abstract base class representing all playing cards.
+
+    Every card also carries a compact integer code between 0 and 51, ordered by value and then suit, which is used
+    for hashing, bit masks and the hand evaluator.
     """
+    __slots__ = ('suit', 'value', 'code')
+
     def __init__(self, suit):
         self.suit = suit
+        self.value = self.get_value()
+        self.code = 4 * (self.value - 2) + suit.value - 1
 
     @abstractmethod
     def get_value(self):
@@ -33,13 +47,13 @@ class PlayingCard(ABC):
         pass
 
     def __eq__(self, other):
-        return self.get_value() == other.get_value() and self.suit == other.suit
+        return self.code == other.code
 
     def __lt__(self, other):
-        if self.get_value() == other.get_value():
-            return self.suit.value < other.suit.value
+        return self.code < other.code
 
-        return self.get_value() < other.get_value()
+    def __hash__(self):
+        return self.code
 
 
 class NumberedCard(PlayingCard):
@@ -50,11 +64,13 @@ class NumberedCard(PlayingCard):
         :param suit: The desired suit of the card.
         :type suit: Suit
         """
+    __slots__ = ()
+
     def __init__(self, value, suit):
-        super().__init__(suit)
         if value < 2 or value > 10:
             raise TypeError('A numbered card must have a value between 2 and 10.')
         self.value = value
+        super().__init__(suit)
 
     def get_value(self):
         return self.value
@@ -69,6 +85,8 @@ class JackCard(PlayingCard):
         :param suit: The desired suit of the card.
         :type suit: Suit
             """
+    __slots__ = ()
+
     def __init__(self, suit):
         super().__init__(suit)
 
@@ -85,6 +103,8 @@ class QueenCard(PlayingCard):
         :param suit: The desired suit of the card.
         :type suit: Suit
             """
+    __slots__ = ()
+
     def __init__(self, suit):
         super().__init__(suit)
 
@@ -101,6 +121,8 @@ class KingCard(PlayingCard):
         :param suit: The desired suit of the card.
         :type suit: Suit
             """
+    __slots__ = ()
+
     def __init__(self, suit):
         super().__init__(suit)
 
@@ -117,6 +139,8 @@ class AceCard(PlayingCard):
         :param suit: The desired suit of the card.
         :type suit: Suit
             """
+    __slots__ = ()
+
     def __init__(self, suit):
         super().__init__(suit)
 
@@ -127,29 +151,180 @@ class AceCard(PlayingCard):
         return f'Ace of {self.suit.name}'
 
 
+_CARD_CLASSES = {11: JackCard, 12: QueenCard, 13: KingCard, 14: AceCard}
+
+
+def _make_card(code):
+    """Creates the card with the given code.
+    """
+    value, suit = code // 4 + 2, Suit(code % 4 + 1)
+    if value in _CARD_CLASSES:
+        return _CARD_CLASSES[value](suit)
+    return NumberedCard(value, suit)
+
+
+CARDS = tuple(_make_card(code) for code in range(52))  #: The 52 interned cards, indexed by their code.
+
+
+def card_from_code(code):
+    """A function returning the interned card with the given code.
+
+        :param code: The code of the card, between 0 and 51.
+        :type code: int
+        :return: The card with the given code.
+        :rtype: PlayingCard
+            """
+    return CARDS[code]
+
+
+def cards_to_mask(cards):
+    """A function that packs cards into a 52-bit integer with one bit per card.
+
+        :param cards: The cards or card codes to pack.
+        :type cards: list of PlayingCard or int
+        :return: An integer with bit number code set for every card.
+        :rtype: int
+            """
+    mask = 0
+    for c in cards:
+        mask |= 1 << (c if isinstance(c, int) else c.code)
+    return mask
+
+
+def mask_to_cards(mask):
+    """A function that unpacks a 52-bit card mask into the interned cards.
+
+        :param mask: An integer with bit number code set for every card.
+        :type mask: int
+        :return: The cards in the mask, lowest code first.
+        :rtype: list of PlayingCard
+            """
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+
+class SeedSequence:
+    """A class that derives independent, reproducible random streams from one root seed, in the spirit of NumPy's
+    SeedSequence. Every child is identified by its spawn key, the path of indices from the root, so the stream of a
+    given deck, table or worker does not depend on how many other streams were made or in which process.
+
+        :param entropy: The root seed, or None to draw one from the operating system.
+        :type entropy: int
+        :param spawn_key: The indices leading from the root sequence to this one.
+        :type spawn_key: tuple of int
+            """
+    def __init__(self, entropy=None, spawn_key=()):
+        self.entropy = random.SystemRandom().getrandbits(128) if entropy is None else entropy
+        self.spawn_key = tuple(spawn_key)
+        self.children_spawned = 0
+
+    def child(self, index):
+        """A method returning the child sequence with the given index.
+
+            :param index: The index of the child.
+            :type index: int
+            :return: The child sequence.
+            :rtype: SeedSequence
+                """
+        return SeedSequence(self.entropy, self.spawn_key + (index,))
+
+    def spawn(self, count):
+        """A method returning the next count children that have not been spawned before.
+
+            :param count: The number of children.
+            :type count: int
+            :return: The child sequences.
+            :rtype: list of SeedSequence
+                """
+        children = [self.child(i) for i in range(self.children_spawned, self.children_spawned + count)]
+        self.children_spawned += count
+        return children
+
+    def generate_state(self, bits=128):
+        """A method returning a well mixed integer seed for this sequence.
+
+            :param bits: The number of bits of the seed, at most 512.
+            :type bits: int
+            :return: The seed.
+            :rtype: int
+                """
+        digest = hashlib.blake2b(repr((self.entropy, self.spawn_key)).encode(), digest_size=(bits + 7) // 8)
+        return int.from_bytes(digest.digest(), 'little') >> (-bits % 8)
+
+    def generator(self):
+        """A method returning a random generator seeded from this sequence.
+
+            :return: The generator.
+            :rtype: random.Random
+                """
+        return random.Random(self.generate_state())
+
+    def __repr__(self):
+        return f'SeedSequence(entropy={self.entropy}, spawn_key={self.spawn_key})'
+
+
+def sample_deals(rng, count, cards, excluded=()):
+    """A function that deals many random sets of cards from a deck in one call.
+
+        :param rng: The random generator to use.
+        :type rng: random.Random
+        :param count: The number of deals.
+        :type count: int
+        :param cards: The number of cards in every deal.
+        :type cards: int
+        :param excluded: Codes of cards that are not in the deck.
+        :type excluded: collection of int
+        :return: The codes of the cards of every deal, in dealt order.
+        :rtype: list of list of int
+            """
+    excluded = set(excluded)
+    stub = [code for code in range(52) if code not in excluded]
+    sample = rng.sample
+    return [sample(stub, cards) for _ in range(count)]
+
+
 class StandardDeck:
     """A class representing a standard 52-card deck. Generates a full deck when creating an instance.
 
-        :param cards: A list with cards that make up the deck.
+    The interned cards are kept in one fixed list for the lifetime of the deck. The cards left in the deck are the
+    first `size` cards of the list and drawing takes the last of them, so the deck can be reset and reshuffled for a
+    new round without allocating anything.
+
+        :param rng: The random generator used to shuffle, such as one from SeedSequence.generator(). Defaults to the
+         global generator of the random module.
+        :type rng: random.Random
+        :param cards: A list with cards that make up the deck, including the cards that have been drawn.
         :type cards: list
+        :param size: The number of cards left in the deck.
+        :type size: int
             """
-    def __init__(self):
+    def __init__(self, rng=None):
 
-        self.cards = []
+        self.cards = list(CARDS)
+        self.size = len(self.cards)
+        self.rng = rng or random
 
-        for value in range(2,11):
-            for suit in Suit:
-                self.cards.append(NumberedCard(value, suit))
-        for suit in Suit:
-            self.cards.append(JackCard(suit))
-            self.cards.append(QueenCard(suit))
-            self.cards.append(KingCard(suit))
-            self.cards.append(AceCard(suit))
+    def reset(self):
+        """A method that puts all drawn cards back in the deck, in their drawn order.
+        """
+        self.size = len(self.cards)
 
-    def shuffle(self):
+    def shuffle(self, count=None):
         """A method that randomizes the order of cards in the deck.
-        """
-        random.shuffle(self.cards)
+
+            :param count: If given, only the next count cards to be drawn are randomized (a partial Fisher-Yates
+             shuffle), which is enough when no more cards than that will be drawn before the next shuffle.
+            :type count: int
+                """
+        cards, rand = self.cards, self.rng.random
+        stop = 0 if count is None else max(self.size - count, 0)
+        for i in range(self.size - 1, max(stop, 1) - 1, -1):
+            j = int(rand() * (i + 1))
+            cards[i], cards[j] = cards[j], cards[i]
 
     def draw(self):
         """A method that draws (removes) and returns the top card from the deck.
@@ -157,29 +332,50 @@ class StandardDeck:
             :returns: The top card in the deck.
             :rtype: PlayingCard
                 """
-        return self.cards.pop()
+        if not self.size:
+            raise IndexError('draw from an empty deck')
+        self.size -= 1
+        return self.cards[self.size]
+
+    def remaining(self):
+        """A method returning the cards left in the deck.
+
+            :returns: The cards left, the top card last.
+            :rtype: list of PlayingCard
+                """
+        return self.cards[:self.size]
 
     def __repr__(self):
-        return f'Standard deck with cards: {self.cards}'
+        return f'Standard deck with cards: {self.remaining()}'
 
 
 class Hand:
-    """A class representing a players cards on their hand.
+    """A class representing a players cards on their hand. The codes and the summed packed evaluation key of the
+    cards are kept next to them, so that best_poker_hand only adds the other cards to the key.
 
         :param cards: A list with cards that make up the hand.
         :type cards: list
+        :param codes: The codes of the cards, in the same order.
+        :type codes: list of int
+        :param key: The sum of the packed evaluation keys of the cards.
+        :type key: int
             """
     def __init__(self):
 
         self.cards = []
+        self.codes = []
+        self.key = 0
 
     def add_card(self, card):
         """A method that adds a card to the hand.
 
-            :param card: A playingcard in the hand.
-            :type card: PlayingCard
+            :param card: A playingcard in the hand, or its code.
+            :type card: PlayingCard or int
                 """
+        card = CARDS[card] if isinstance(card, int) else card
         self.cards.append(card)
+        self.codes.append(card.code)
+        self.key += _CARD_EVAL_KEYS[card.code]
 
     def drop_cards(self, indices):
         """A method that removes a specific card from the hand.
@@ -189,30 +385,42 @@ class Hand:
                 """
         kept_cards = [self.cards[i] for i in range(len(self.cards)) if i not in indices]
         self.cards = kept_cards
+        self.codes = [card.code for card in kept_cards]
+        self.key = sum(map(_CARD_EVAL_KEYS.__getitem__, self.codes))
 
     def clear_all_cards(self):
         """
         Clears the hand of all cards
         """
         self.cards.clear()
+        self.codes.clear()
+        self.key = 0
 
     def sort(self):
         """A method that sort the cards in order depending on their value.
         """
         self.cards.sort()
+        self.codes.sort()
+
+    def mask(self):
+        """A method returning the cards of the hand packed into a 52-bit integer, usable as a cheap key.
+
+            :return: An integer with bit number code set for every card.
+            :rtype: int
+                """
+        return cards_to_mask(self.cards)
 
     def best_poker_hand(self, cards: list[PlayingCard] = []):
         """A method returning a PokerHand object which can be used for comparison.
 
-            :param cards: Additional cards that combines the player's hand.
+            :param cards: Additional cards, or their codes, that combines the player's hand.
             :type cards: list
             :return: A PokerHand object containing the type and secondary variables needed to distinguish multiple hands
              from each other.
             :rtype: PokerHand
                 """
-        all_cards = self.cards + cards
-
-        return PokerHand(all_cards)
+        codes = [c if c.__class__ is int else c.code for c in cards]
+        return PokerHand(self.codes + codes, self.key + sum(map(_CARD_EVAL_KEYS.__getitem__, codes)))
 
     def __repr__(self):
 
@@ -233,39 +441,809 @@ class PokerHierarchy(Enum):
     High_cards = 1
 
 
+
+# ---------------------------------------------------------------------------
+# Table-driven hand evaluation
+#
+# A hand of up to seven cards is folded into a single integer: the low 32 bits
+# hold the sum of 5**(value - 2) over all cards (a perfect hash of the rank
+# counts, since no value occurs more than four times) and the bits above hold
+# one 4-bit counter per suit. The suit counters tell with a few bit operations
+# if there is a flush, and one lookup on the rank hash gives every other hand.
+# The lookup tables are filled in the first time a hash is seen.
+#
+# Every entry also holds a dense rank between 1 and 7462, the position of the
+# hand among all distinct five-card poker hands (7462 being a royal flush), so
+# hands compare with a single integer comparison. Hands of fewer than five
+# cards get a fraction between the ranks of the five-card hands around them.
+# ---------------------------------------------------------------------------
+
+_RANK_BITS = 32
+_RANK_MASK = (1 << _RANK_BITS) - 1
+_SUITS = tuple(Suit)
+
+
+_CARD_EVAL_KEYS = [5 ** (code // 4) + (1 << (_RANK_BITS + 4 * (code % 4))) for code in range(52)]
+
+
+def _straight_high_card(rank_mask):
+    """Returns the highest card of the best straight in a 13-bit rank mask, or 0 if there is no straight.
+    """
+    for high in range(14, 5, -1):
+        pattern = 0b11111 << (high - 6)
+        if rank_mask & pattern == pattern:
+            return high
+    wheel = 0b1000000001111  # Ace, 2, 3, 4 and 5
+    if rank_mask & wheel == wheel:
+        return 5
+    return 0
+
+
+def _classify_rank_key(rank_key):
+    """Returns the PokerHierarchy object and secondary data of a hand without a flush.
+
+        :param rank_key: The sum of 5**(value - 2) over all cards of the hand.
+        :type rank_key: int
+        :return: PokerHierarchy object and the data needed to break ties.
+        :rtype: tuple
+            """
+    counts = {}
+    key = rank_key
+    for value in range(2, 15):
+        key, count = divmod(key, 5)
+        if count:
+            counts[value] = count
+
+    ranks = sorted(counts, reverse=True)
+    values = [v for v in ranks for _ in range(counts[v])]
+    fours = [v for v in ranks if counts[v] == 4]
+    threes = [v for v in ranks if counts[v] == 3]
+    twos = [v for v in ranks if counts[v] == 2]
+    straight = _straight_high_card(sum(1 << (v - 2) for v in ranks))
+
+    if fours:
+        kickers = [v for v in values if v != fours[0]]
+        result = PokerHierarchy.Four_of_a_Kind, (fours[0], kickers[0] if kickers else None)
+
+    elif threes and threes[1:] + twos:
+        result = PokerHierarchy.Full_House, (threes[0], max(threes[1:] + twos))
+
+    elif straight:
+        result = PokerHierarchy.Straight, straight
+
+    elif threes:
+        result = PokerHierarchy.Three_of_a_Kind, (threes[0], [v for v in values if v != threes[0]][:2])
+
+    elif len(twos) >= 2:
+        kickers = [v for v in values if v not in twos[:2]]
+        result = PokerHierarchy.Two_Pairs, (twos[0], twos[1], kickers[0] if kickers else None)
+
+    elif twos:
+        result = PokerHierarchy.Pair, (twos[0], [v for v in values if v != twos[0]][:3])
+
+    else:
+        result = PokerHierarchy.High_cards, values[:5]
+
+    return result
+
+
+def _classify_flush(rank_mask):
+    """Returns the PokerHierarchy object and the suitless secondary data of the flush in the 13-bit rank mask of a
+    single suit.
+    """
+    straight = _straight_high_card(rank_mask)
+    if straight:
+        return PokerHierarchy.Straight_Flush, straight
+    return PokerHierarchy.Flush, [v for v in range(14, 1, -1) if rank_mask >> (v - 2) & 1][:5]
+
+
+_five_card_strengths = []
+
+
+def _dense_rank(hand_type, secondary):
+    """Returns the dense rank of a hand: the number of distinct five-card poker hands it beats or ties. Hands of five
+    or more cards get a unique integer rank between 1 and 7462. A hand of fewer cards, such as AAKQ, lies strictly
+    between two five-card hands (AAKJT and AAKQ2), so it gets a fraction between their ranks that keeps the order of
+    the partial hands too.
+    """
+    if not _five_card_strengths:
+        strengths = [hand_strength(*_classify_rank_key(key)) for key in _rank_keys(2, 5) if _card_count(key) == 5]
+        strengths += [hand_strength(*_classify_flush(mask)) for mask in range(1 << 13) if bin(mask).count('1') == 5]
+        _five_card_strengths.extend(sorted(strengths))
+
+    strength = hand_strength(hand_type, secondary)
+    i = bisect_left(_five_card_strengths, strength)
+    if _five_card_strengths[i] == strength:
+        return i + 1
+    # A partial hand is missing the kickers of a five-card hand, so its strength never equals one.
+    below = _five_card_strengths[i - 1] if i else 0
+    return i + (strength - below) / (_five_card_strengths[i] - below)
+
+
+def _card_count(rank_key):
+    """Returns the number of cards in a rank hash.
+    """
+    count = 0
+    while rank_key:
+        rank_key, digit = divmod(rank_key, 5)
+        count += digit
+    return count
+
+
+def _rank_table_entry(rank_key):
+    """Evaluates a hand without a flush and stores the PokerHierarchy object, secondary data and dense rank in the
+    table.
+    """
+    hand_type, secondary = _classify_rank_key(rank_key)
+    entry = _rank_table[rank_key] = hand_type, secondary, _dense_rank(hand_type, secondary)
+    return entry
+
+
+def _flush_table_entry(rank_mask):
+    """Evaluates the flush in the 13-bit rank mask of a single suit and stores the PokerHierarchy object, suitless
+    secondary data and dense rank in the table.
+    """
+    hand_type, secondary = _classify_flush(rank_mask)
+    entry = _flush_table[rank_mask] = hand_type, secondary, _dense_rank(hand_type, secondary)
+    return entry
+
+
+_rank_table = {}
+_flush_table = {}
+
+
+def _rank_keys(first_value, cards):
+    """Yields the rank hash of every combination of at most the given number of cards with values from first_value
+    and up, with at most four cards of each value.
+    """
+    yield 0
+    for value in range(first_value, 15):
+        for count in range(1, min(4, cards) + 1):
+            for rest in _rank_keys(value + 1, cards - count):
+                yield count * 5 ** (value - 2) + rest
+
+
+def evaluation_tables():
+    """A function that fills in every entry of the evaluator tables, for callers that need them all at once such as
+    the batch evaluator. Takes a few seconds the first time.
+
+        :return: The table of hands without a flush, keyed by rank hash, and the table of flushes, keyed by the 13-bit
+         rank mask of the flush suit. Both hold tuples with the PokerHierarchy object, secondary data and dense rank.
+        :rtype: tuple of dict
+            """
+    for rank_key in _rank_keys(2, 7):
+        if rank_key not in _rank_table:
+            _rank_table_entry(rank_key)
+    for rank_mask in range(1 << 13):
+        if rank_mask not in _flush_table and bin(rank_mask).count('1') >= 5:
+            _flush_table_entry(rank_mask)
+    return _rank_table, _flush_table
+
+
+def evaluate_cards(cards):
+    """A function that evaluates up to seven cards with a few table lookups.
+
+        :param cards: The cards to evaluate.
+        :type cards: list of PlayingCard
+        :return: PokerHierarchy object, the data needed to distinguish the hand from others of the same type in the
+         same format as PokerHand.secondary, and the dense rank of the hand.
+        :rtype: tuple
+            """
+    return evaluate_codes([c.code for c in cards])
+
+
+def evaluate_codes(codes):
+    """A function that evaluates card codes with a few table lookups.
+
+        :param codes: The codes of the cards to evaluate.
+        :type codes: list of int
+        :return: PokerHierarchy object, the data needed to distinguish the hand from others of the same type in the
+         same format as PokerHand.secondary, and the dense rank of the hand.
+        :rtype: tuple
+            """
+    if len(codes) > 7:
+        return _evaluate_many(codes)
+    return evaluate_packed(sum(map(_CARD_EVAL_KEYS.__getitem__, codes)), codes)
+
+
+def _evaluate_many(codes):
+    """Evaluates more than seven card codes. The suit counters of the packed key only find a flush among seven cards,
+    and more cards can hold a flush in several suits or a flush together with a better hand, so the hand without a
+    flush and the flush of every suit with five cards or more are all looked up and the best one is kept.
+    """
+    rank_key = 0
+    suit_masks = [0, 0, 0, 0]
+    for code in codes:
+        rank_key += _CARD_EVAL_KEYS[code] & _RANK_MASK
+        suit_masks[code & 3] |= 1 << (code >> 2)
+    best = _rank_table.get(rank_key) or _rank_table_entry(rank_key)
+    for suit, rank_mask in enumerate(suit_masks):
+        if bin(rank_mask).count('1') >= 5:
+            hand_type, secondary, rank = _flush_table.get(rank_mask) or _flush_table_entry(rank_mask)
+            if rank > best[2]:
+                best = hand_type, (secondary, _SUITS[suit].name), rank
+    return best
+
+
+def card_eval_key(code):
+    """A function returning the packed evaluation key of a single card. The key of a hand is the sum of the keys of
+    its cards, so it can be updated card by card as a board is dealt.
+
+        :param code: The code of the card.
+        :type code: int
+        :return: The packed key of the card.
+        :rtype: int
+            """
+    return _CARD_EVAL_KEYS[code]
+
+
+def packed_has_flush(key):
+    """A function that tells if the packed key of at most seven cards holds five or more cards of one suit.
+
+        :param key: The sum of the packed keys of the cards.
+        :type key: int
+        :return: True if there is a flush.
+        :rtype: bool
+            """
+    # A suit counter of five or more has its 4-bit and one of its lower bits set.
+    suit_counts = key >> _RANK_BITS
+    return bool(suit_counts & (suit_counts << 1 | suit_counts << 2) & 0x4444)
+
+
+def evaluate_packed(key, codes):
+    """A function that evaluates a hand of at most seven cards from its packed key. The codes are only read when
+    the hand holds a flush.
+
+        :param key: The sum of the packed keys of the cards.
+        :type key: int
+        :param codes: The codes of the cards.
+        :type codes: list of int
+        :return: PokerHierarchy object, the data needed to distinguish the hand from others of the same type in the
+         same format as PokerHand.secondary, and the dense rank of the hand.
+        :rtype: tuple
+            """
+    suit_counts = key >> _RANK_BITS
+    flush = suit_counts & (suit_counts << 1 | suit_counts << 2) & 0x4444
+    if not flush:
+        rank_key = key & _RANK_MASK
+        return _rank_table.get(rank_key) or _rank_table_entry(rank_key)
+
+    suit = flush.bit_length() // 4
+    rank_mask = 0
+    for code in codes:
+        if code & 3 == suit:
+            rank_mask |= 1 << (code >> 2)
+    hand_type, secondary, rank = _flush_table.get(rank_mask) or _flush_table_entry(rank_mask)
+    return hand_type, (secondary, _SUITS[suit].name), rank
+
+
+def rank_packed(key, codes):
+    """A function returning only the dense rank of a hand of at most seven cards from its packed key, without
+    building the secondary data. The codes are only read when the hand holds a flush.
+
+        :param key: The sum of the packed keys of the cards.
+        :type key: int
+        :param codes: The codes of the cards.
+        :type codes: list of int
+        :return: The dense rank of the hand, between 1 and 7462 for five cards or more and a fraction for fewer.
+        :rtype: int or float
+            """
+    suit_counts = key >> _RANK_BITS
+    flush = suit_counts & (suit_counts << 1 | suit_counts << 2) & 0x4444
+    if not flush:
+        rank_key = key & _RANK_MASK
+        return (_rank_table.get(rank_key) or _rank_table_entry(rank_key))[2]
+
+    suit = flush.bit_length() // 4
+    rank_mask = 0
+    for code in codes:
+        if code & 3 == suit:
+            rank_mask |= 1 << (code >> 2)
+    return (_flush_table.get(rank_mask) or _flush_table_entry(rank_mask))[2]
+
+
+def rank_codes(codes):
+    """A function returning the dense rank of up to seven card codes.
+
+        :param codes: The codes of the cards to evaluate.
+        :type codes: list of int
+        :return: The dense rank of the hand, between 1 and 7462 for five cards or more and a fraction for fewer.
+        :rtype: int or float
+            """
+    if len(codes) > 7:
+        return evaluate_codes(codes)[2]
+    return rank_packed(sum(map(_CARD_EVAL_KEYS.__getitem__, codes)), codes)
+
+
+def hand_strength(hand_type, secondary):
+    """A function that packs the result of the evaluator into one integer that compares the same way as PokerHand
+    objects: the hierarchy in the high bits followed by up to five card values of four bits each. Suit names in the
+    secondary data are ignored.
+
+        :param hand_type: The type of the hand.
+        :type hand_type: PokerHierarchy
+        :param secondary: The tie-break data of the hand.
+        :type secondary: int, tuple or list
+        :return: The packed strength.
+        :rtype: int
+            """
+    values = []
+    for part in (secondary if isinstance(secondary, (tuple, list)) else [secondary]):
+        if isinstance(part, list):
+            values.extend(part)
+        elif isinstance(part, int):
+            values.append(part)
+    values = (values + [0] * 5)[:5]
+
+    strength = hand_type.value
+    for v in values:
+        strength = strength << 4 | v
+    return strength
+
+
+_straight_completions = {}
+
+
+def straight_completions(rank_mask):
+    """A function returning the values that would give a better straight than the 13-bit rank mask holds, or any
+    straight if it holds none. The result is stored the first time a mask is seen.
+
+        :param rank_mask: A 13-bit mask with bit value - 2 set for every value present.
+        :type rank_mask: int
+        :return: A 13-bit mask of the completing values.
+        :rtype: int
+            """
+    completions = _straight_completions.get(rank_mask)
+    if completions is None:
+        high = _straight_high_card(rank_mask)
+        completions = 0
+        for value in range(13):
+            if not rank_mask >> value & 1 and _straight_high_card(rank_mask | 1 << value) > high:
+                completions |= 1 << value
+        _straight_completions[rank_mask] = completions
+    return completions
+
+
+class HandState:
+    """A class holding the evaluator state of a growing set of cards, such as the hole cards of a player or the
+    table cards. Adding a card only updates a few integers, and the evaluation of the cards is one table lookup that
+    is kept until the next card is added. Two states, such as a hand and the table, are combined in constant time.
+
+        :param cards: The first cards, or their codes.
+        :type cards: list of PlayingCard
+        :param key: The sum of the packed evaluation keys of the cards.
+        :type key: int
+        :param mask: The cards packed into a 52-bit integer.
+        :type mask: int
+        :param ranks: A 13-bit mask of the values present.
+        :type ranks: int
+        :param suit_ranks: A 13-bit mask of the values present in every suit, by suit index.
+        :type suit_ranks: list of int
+        :param codes: The codes of the cards in the order they were added.
+        :type codes: list of int
+            """
+    __slots__ = ('key', 'mask', 'ranks', 'suit_ranks', 'codes', 'result')
+
+    def __init__(self, cards=()):
+        self.key = 0
+        self.mask = 0
+        self.ranks = 0
+        self.suit_ranks = [0, 0, 0, 0]
+        self.codes = []
+        self.result = None
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        """A method that adds a card to the state.
+
+            :param card: The card or its code.
+            :type card: PlayingCard or int
+                """
+        code = card if isinstance(card, int) else card.code
+        bit = 1 << code
+        if self.mask & bit:
+            raise ValueError(f'{CARDS[code]} is already in the hand.')
+        self.key += _CARD_EVAL_KEYS[code]
+        self.mask |= bit
+        self.ranks |= 1 << (code >> 2)
+        self.suit_ranks[code & 3] |= 1 << (code >> 2)
+        self.codes.append(code)
+        self.result = None
+
+    def copy(self):
+        """A method returning an independent copy of the state, for example to deal different runouts to.
+
+            :rtype: HandState
+                """
+        state = HandState()
+        state.key = self.key
+        state.mask = self.mask
+        state.ranks = self.ranks
+        state.suit_ranks = self.suit_ranks[:]
+        state.codes = self.codes[:]
+        state.result = self.result
+        return state
+
+    def combine(self, other):
+        """A method returning the state of the cards of both states, such as the hole cards and the table cards.
+
+            :param other: The other cards.
+            :type other: HandState
+            :return: A new state.
+            :rtype: HandState
+                """
+        if self.mask & other.mask:
+            raise ValueError('The hands share a card.')
+        state = HandState()
+        state.key = self.key + other.key
+        state.mask = self.mask | other.mask
+        state.ranks = self.ranks | other.ranks
+        state.suit_ranks = [a | b for a, b in zip(self.suit_ranks, other.suit_ranks)]
+        state.codes = self.codes + other.codes
+        return state
+
+    def evaluate(self):
+        """A method that evaluates the cards.
+
+            :return: PokerHierarchy object, the data needed to break ties in the same format as PokerHand.secondary and
+             the dense rank of the hand, which is the tie-break key.
+            :rtype: tuple
+                """
+        if self.result is None:
+            if len(self.codes) > 7:
+                self.result = evaluate_codes(self.codes)
+            else:
+                suit_counts = self.key >> _RANK_BITS
+                flush = suit_counts & (suit_counts << 1 | suit_counts << 2) & 0x4444
+                if not flush:
+                    rank_key = self.key & _RANK_MASK
+                    self.result = _rank_table.get(rank_key) or _rank_table_entry(rank_key)
+                else:
+                    suit = flush.bit_length() // 4
+                    rank_mask = self.suit_ranks[suit]
+                    hand_type, secondary, rank = _flush_table.get(rank_mask) or _flush_table_entry(rank_mask)
+                    self.result = hand_type, (secondary, _SUITS[suit].name), rank
+        return self.result
+
+    def rank(self):
+        """A method returning the dense rank of the cards, where a higher rank is a better hand.
+        """
+        return self.evaluate()[2]
+
+    def evaluate_with(self, code):
+        """A method that evaluates the cards together with one more card, without changing the state. Only valid for
+        states of at most six cards.
+
+            :param code: The code of the extra card.
+            :type code: int
+            :return: PokerHierarchy object, the tie-break data (without the suit of a flush) and the dense rank.
+            :rtype: tuple
+                """
+        key = self.key + _CARD_EVAL_KEYS[code]
+        suit_counts = key >> _RANK_BITS
+        flush = suit_counts & (suit_counts << 1 | suit_counts << 2) & 0x4444
+        if not flush:
+            rank_key = key & _RANK_MASK
+            return _rank_table.get(rank_key) or _rank_table_entry(rank_key)
+        suit = flush.bit_length() // 4
+        rank_mask = self.suit_ranks[suit] | (1 << (code >> 2) if code & 3 == suit else 0)
+        return _flush_table.get(rank_mask) or _flush_table_entry(rank_mask)
+
+    def evaluate_with_each(self, codes):
+        """A method that evaluates the cards together with each of the given cards in turn, as evaluate_with does. An
+        extra card that does not make a flush gives the same hand as the other cards of its value, so that hand is
+        only looked up once per value.
+
+            :param codes: The codes of the extra cards.
+            :type codes: list of int
+            :return: The result of evaluate_with for every extra card.
+            :rtype: list of tuple
+                """
+        results = []
+        by_value = {}
+        suit_counts = self.key >> _RANK_BITS
+        for code in codes:
+            counts = suit_counts + (1 << 4 * (code & 3))
+            if counts & (counts << 1 | counts << 2) & 0x4444:
+                results.append(self.evaluate_with(code))
+                continue
+            result = by_value.get(code >> 2)
+            if result is None:
+                result = by_value[code >> 2] = self.evaluate_with(code)
+            results.append(result)
+        return results
+
+    def hand_type(self):
+        """A method returning the PokerHierarchy object of the cards.
+        """
+        return self.evaluate()[0]
+
+    def suit_counts(self):
+        """A method returning the number of cards of every suit, by suit index.
+        """
+        return [self.key >> (_RANK_BITS + 4 * suit) & 15 for suit in range(4)]
+
+    def flush_draw(self):
+        """A method returning the suit in which one more card gives a flush, or None if there is no flush draw.
+
+            :rtype: Suit
+                """
+        for suit, count in enumerate(self.suit_counts()):
+            if count == 4:
+                return _SUITS[suit]
+        return None
+
+    def straight_draw(self):
+        """A method returning the values that would give the cards a better straight, empty if there is no straight
+        draw.
+
+            :rtype: list of int
+                """
+        completions = straight_completions(self.ranks)
+        return [value + 2 for value in range(13) if completions >> value & 1]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return f'HandState with cards: {[CARDS[code] for code in self.codes]}'
+
+
+def showdown_ranks(hands, table):
+    """A function that ranks the hands of all players in a showdown at once. The packed key of the shared table
+    cards is only summed once, and every hand adds its hole cards to it, so no hand objects are built.
+
+        :param hands: The hole cards of the players, as any objects with the packed key and the codes of the cards such
+         as HandState or Hand.
+        :type hands: list of HandState
+        :param table: The table cards, as a HandState or Hand.
+        :type table: HandState
+        :return: The dense rank of every hand, in the given order.
+        :rtype: list of int
+            """
+    key, codes = table.key, table.codes
+    return [rank_packed(key + hand.key, codes + hand.codes) for hand in hands]
+
+
+def find_outs(hole, table, opponent=None):
+    """A function that finds the outs of a player: the unseen cards that, as the next table card, give the player a
+    better PokerHierarchy class or, if the player is behind, a better hand than the opponent. It also returns the
+    probability that at least one of the outs comes before the river.
+
+        :param hole: The state of the hole cards of the player.
+        :type hole: HandState
+        :param table: The state of the table cards, three or four cards.
+        :type table: HandState
+        :param opponent: The state of the hole cards of the opponent, if they are known. Their cards are not unseen.
+        :type opponent: HandState
+        :return: The codes of the outs and the probability to hit one of them by the river.
+        :rtype: tuple
+            """
+    if not 3 <= len(table) <= 4:
+        raise ValueError('Outs are only counted on the flop and the turn.')
+    hand = hole.combine(table)
+    current_type = hand.evaluate()[0].value
+    dead = hand.mask
+    if opponent is not None:
+        other = opponent.combine(table)
+        behind = other.rank() >= hand.rank()
+        dead |= other.mask
+    else:
+        behind = False
+
+    unseen = [code for code in range(52) if not dead >> code & 1]
+    mine = hand.evaluate_with_each(unseen)
+    theirs = other.evaluate_with_each(unseen) if behind else None
+    outs = [code for i, code in enumerate(unseen)
+            if mine[i][0].value > current_type or behind and mine[i][2] > theirs[i][2]]
+
+    # The chance that none of the outs is among the cards still to come.
+    to_come = 5 - len(table)
+    miss = math.comb(len(unseen) - len(outs), to_come) / math.comb(len(unseen), to_come)
+    return outs, 1 - miss
+
+
+class EvaluationCache:
+    """A class that keeps the evaluations of the most recently evaluated sets of cards, keyed by the 52-bit mask of
+    the cards, so evaluating the same hole cards and board again is one dictionary lookup. When the cache is full,
+    the least recently used entry is dropped.
+
+    The cache can be saved to a snapshot file and loaded again at startup. The snapshot only holds the card masks,
+    from the least to the most recently used, and the evaluations are made again when it is loaded.
+
+        :param maxsize: The largest number of entries, 0 turns the cache off.
+        :type maxsize: int
+            """
+    MAGIC = b'PKEC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQ')  #: Magic, version, reserved and the number of masks.
+
+    def __init__(self, maxsize=1 << 16):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def evaluate(self, codes):
+        """A method that evaluates card codes, looking them up in the cache first.
+
+            :param codes: The codes of the cards to evaluate.
+            :type codes: list of int
+            :return: PokerHierarchy object, the tie-break data and the dense rank, as returned by evaluate_codes.
+            :rtype: tuple
+                """
+        mask = 0
+        for code in codes:
+            mask |= 1 << code
+        if bin(mask).count('1') != len(codes):
+            # A list with a card twice has no mask of its own, so it is neither looked up nor stored.
+            return evaluate_codes(codes)
+        entry = self.entries.get(mask)
+        if entry is not None:
+            self.entries.move_to_end(mask)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = evaluate_codes(codes)
+        if self.maxsize:
+            self.entries[mask] = entry
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return entry
+
+    def hit_rate(self):
+        """A method returning the share of the lookups that were found in the cache.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """A method that empties the cache and resets the counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, path):
+        """A method that writes the card masks of the cache to a snapshot file.
+
+            :param path: The file to write.
+            :type path: str
+                """
+        masks = array('Q', self.entries)
+        if sys.byteorder == 'big':
+            masks.byteswap()
+        # Write to a temporary file first, so a snapshot is never left half written.
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, len(masks)))
+            f.write(masks.tobytes())
+        os.replace(path + '.tmp', path)
+
+    def load(self, path):
+        """A method that evaluates the card masks of a snapshot file into the cache. The most recently used masks
+        are kept if the snapshot holds more than fit.
+
+            :param path: The file written by save.
+            :type path: str
+            :return: The number of entries loaded.
+            :rtype: int
+                """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.HEADER.size:
+            raise ValueError(f'{path} is not an evaluation cache snapshot of version {self.VERSION}.')
+        magic, version, _, count = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION or len(data) != self.HEADER.size + 8 * count:
+            raise ValueError(f'{path} is not an evaluation cache snapshot of version {self.VERSION}.')
+
+        masks = array('Q', data[self.HEADER.size:])
+        if sys.byteorder == 'big':
+            masks.byteswap()
+        loaded = 0
+        for mask in masks[max(0, len(masks) - self.maxsize):] if self.maxsize else ():
+            if mask >> 52:
+                raise ValueError(f'{path} holds a card mask with more than 52 cards.')
+            codes = [code for code in range(52) if mask >> code & 1]
+            self.entries[mask] = evaluate_codes(codes)
+            self.entries.move_to_end(mask)
+            loaded += 1
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return loaded
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return (f'EvaluationCache with {len(self.entries)} of {self.maxsize} entries, {self.hits} hits and '
+                f'{self.misses} misses')
+
+
+EVALUATION_CACHE = EvaluationCache()  #: The cache of the evaluations of PokerHand.
+
+
 class PokerHand:
     """
     A class representing a poker hand that creates all attributes required to distinguish one poker hand from another.
-
-    :param cards: All the cards in the poker hand.
-    :type cards: list of PlayingCard
+    Poker hands are compared by their dense rank, an integer between 1 and 7462 where a higher rank is a better hand,
+    or a fraction between two ranks for a hand of fewer than five cards.
+    The evaluations of more than CACHED_CARDS cards, which go through the rank and flush tables once per suit, are
+    looked up in EVALUATION_CACHE first.
+
+    Up to seven cards the hand is evaluated straight from the packed key of the cards, and the cards are only turned
+    into PlayingCard objects when the cards attribute is read, so building a PokerHand costs little more than the
+    table lookup itself.
+
+    :param cards: All the cards in the poker hand, or their codes.
+    :type cards: list of PlayingCard or list of int
+    :param key: The sum of the packed evaluation keys of the cards if it is already known, as it is for a Hand.
+    :type key: int
     """
+    __slots__ = ('type', 'secondary', 'rank', '_cards')
 
-    def __init__(self, cards):
-        self.cards = cards
+    # Up to seven cards the packed key is about as fast as a lookup in the cache, so only larger hands are cached.
+    CACHED_CARDS = 7
 
-        check_funcs = [self.check_straight_flush,
-                       self.check_four_of_a_kind,
-                       self.check_full_house,
-                       self.check_flush,
-                       self.check_straight,
-                       self.check_three_of_a_kind,
-                       self.check_two_pairs,
-                       self.check_pair,
-                       self.high_cards]
+    def __init__(self, cards, key=None):
+        self._cards = cards
+        codes = cards if cards and cards[0].__class__ is int else [c.code for c in cards]
+        if len(codes) > self.CACHED_CARDS:
+            self.type, self.secondary, self.rank = EVALUATION_CACHE.evaluate(codes)
+        else:
+            if key is None:
+                key = sum(map(_CARD_EVAL_KEYS.__getitem__, codes))
+            self.type, self.secondary, self.rank = evaluate_packed(key, codes)
 
-        self.cards.sort()
+    @property
+    def cards(self):
+        """The cards of the hand.
+        """
+        cards = self._cards
+        if cards and cards[0].__class__ is int:
+            cards = self._cards = [CARDS[code] for code in cards]
+        return cards
+
+    @property
+    def name(self):
+        """The name of the type of the hand, such as 'Full_House'.
+        """
+        return self.type.name
+
+    @property
+    def hierarchy(self):
+        """The PokerHierarchy value of the type of the hand.
+        """
+        return self.type.value
+
+    @classmethod
+    def evaluate_by_checks(cls, cards):
+        """A class method that runs the check methods one by one on a sorted list of cards and returns the result
+        of the first one that matches. This is the original evaluator, kept to compare the table lookups of
+        evaluate_cards with. It is much slower and does not find the straight from ace to five.
+
+            :param cards: The sorted list of cards to evaluate.
+            :type cards: list of PlayingCard
+            :return: PokerHierarchy object and the data needed to distinguish the hand from others of the same type.
+            :rtype: tuple
+                """
+        check_funcs = [cls.check_straight_flush,
+                       cls.check_four_of_a_kind,
+                       cls.check_full_house,
+                       cls.check_flush,
+                       cls.check_straight,
+                       cls.check_three_of_a_kind,
+                       cls.check_two_pairs,
+                       cls.check_pair,
+                       cls.high_cards]
 
         for fn in check_funcs:
 
-            check = fn(self.cards)
+            check = fn(cards)
 
             if check is not None:
-                self.type, self.secondary = fn(self.cards)
-                break
-
-        self.name = self.type.name
-        self.hierarchy = self.type.value
+                return check
 
     @staticmethod
     def check_straight_flush(cards):
@@ -523,11 +1501,7 @@ class PokerHand:
             return f'{self.name.replace("_", " ")} of {self.secondary}'
 
     def __eq__(self, other):
-        return self.hierarchy == other.hierarchy and self.secondary == other.secondary
+        return self.rank == other.rank
 
     def __lt__(self, other):
-
-        if self.hierarchy == other.hierarchy:
-            return self.secondary < other.secondary
-        else:
-            return self.hierarchy < other.hierarchy
\ No newline at end of file
+        return self.rank < other.rank
\ No newline at end of file
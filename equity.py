@@ -0,0 +1,344 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+from cardlib import *
+
+
+_CHUNK_SAMPLES = 10000  #: The number of runouts dealt by one worker task.
+
+
+class EquityResult:
+    """
+    A class that counts how often each player wins, ties and loses over a number of runouts.
+
+    :param players: The number of players.
+    :type players: int
+    """
+    def __init__(self, players):
+        self.samples = 0
+        self.wins = [0] * players
+        self.ties = [0] * players
+        self.shares = [0.0] * players
+
+    def add(self, winners):
+        """
+        A method that counts one runout.
+
+        :param winners: Indices of the players with the best hand.
+        :type winners: list of int
+        """
+        self.samples += 1
+        if len(winners) == 1:
+            self.wins[winners[0]] += 1
+            self.shares[winners[0]] += 1
+        else:
+            for i in winners:
+                self.ties[i] += 1
+                self.shares[i] += 1 / len(winners)
+
+    def add_batch(self, best):
+        """
+        A method that counts many runouts at once, as evaluated by batcheval.
+
+        :param best: A boolean array with a row per player and a column per runout, true for the players with the best
+         hand of the runout.
+        :type best: numpy.ndarray of shape (players, N)
+        """
+        winners = best.sum(axis=0)
+        self.samples += best.shape[1]
+        for i in range(len(self.wins)):
+            self.wins[i] += int((best[i] & (winners == 1)).sum())
+            self.ties[i] += int((best[i] & (winners > 1)).sum())
+            self.shares[i] += float((best[i] / winners).sum())
+
+    def merge(self, other):
+        """
+        A method that adds the counts of another result to this one.
+
+        :param other: The result to add.
+        :type other: EquityResult
+        :return: This result.
+        :rtype: EquityResult
+        """
+        self.samples += other.samples
+        for i in range(len(self.wins)):
+            self.wins[i] += other.wins[i]
+            self.ties[i] += other.ties[i]
+            self.shares[i] += other.shares[i]
+        return self
+
+    def win_probability(self, player):
+        """
+        Returns the probability that the player wins the whole pot.
+        """
+        return self.wins[player] / self.samples if self.samples else 0.0
+
+    def tie_probability(self, player):
+        """
+        Returns the probability that the player splits the pot.
+        """
+        return self.ties[player] / self.samples if self.samples else 0.0
+
+    def lose_probability(self, player):
+        """
+        Returns the probability that the player loses the pot.
+        """
+        return 1.0 - self.win_probability(player) - self.tie_probability(player) if self.samples else 0.0
+
+    def equity(self, player):
+        """
+        Returns the share of the pot the player wins on average, counting split pots.
+        """
+        return self.shares[player] / self.samples if self.samples else 0.0
+
+    def __repr__(self):
+        players = ', '.join(f'player {i}: win {self.win_probability(i):.4f}, tie {self.tie_probability(i):.4f}, '
+                            f'lose {self.lose_probability(i):.4f}' for i in range(len(self.wins)))
+        return f'Equity over {self.samples} samples with {players}'
+
+
+def _to_codes(cards):
+    """Returns the codes of a list of cards or card codes.
+    """
+    return [c if isinstance(c, int) else c.code for c in cards]
+
+
+def _check_cards(holes, board):
+    """Raises a ValueError if the hole cards and the board are not a valid spot.
+    """
+    if len(holes) < 2:
+        raise ValueError('At least two players are needed to compute equities.')
+    if any(len(hole) != 2 for hole in holes):
+        raise ValueError('Every player must have exactly two hole cards.')
+    if len(board) > 5:
+        raise ValueError('The board can have at most five cards.')
+    known = [code for hole in holes for code in hole] + board
+    if len(set(known)) != len(known):
+        raise ValueError('The same card can not be dealt twice.')
+
+
+def showdown_winners(holes, board):
+    """A function returning the players with the best hand on a complete board.
+
+        :param holes: The codes of the hole cards of every player.
+        :type holes: list of list of int
+        :param board: The codes of the five board cards.
+        :type board: list of int
+        :return: Indices of the players with the best hand.
+        :rtype: list of int
+            """
+    ranks = [rank_codes(hole + board) for hole in holes]
+    best = max(ranks)
+    return [i for i, rank in enumerate(ranks) if rank == best]
+
+
+def _batch_evaluator():
+    """Returns the batcheval module, or None if NumPy is not installed. It is only imported when runouts are sampled, so
+    importing this module does not need NumPy.
+    """
+    try:
+        import batcheval
+    except ImportError:
+        return None
+    return batcheval
+
+
+def _sample_runouts(holes, board, samples, deadline, seed):
+    """Deals random runouts of the board and counts the results. Runs in a worker process. With NumPy installed the
+    runouts of every batch are dealt and evaluated as arrays by batcheval, otherwise one at a time.
+
+        :param holes: The codes of the hole cards of every player.
+        :type holes: list of list of int
+        :param board: The codes of the known board cards.
+        :type board: list of int
+        :param samples: The number of runouts to deal.
+        :type samples: int
+        :param deadline: A time.time() value after which sampling stops early, or None.
+        :type deadline: float
+        :param seed: The seed sequence of the random stream of this worker.
+        :type seed: SeedSequence
+        :return: The counts of the dealt runouts.
+        :rtype: EquityResult
+            """
+    batcheval = _batch_evaluator()
+    rng = seed.generator()
+    dead = set(board).union(*holes)
+    missing = 5 - len(board)
+    result = EquityResult(len(holes))
+
+    # Deal the runouts in batches, so that the deadline is checked between batches.
+    for batch, start in enumerate(range(0, samples, 1024)):
+        if deadline is not None and time.time() > deadline:
+            break
+        size = min(1024, samples - start)
+        if batcheval is None:
+            for runout in sample_deals(rng, size, missing, dead):
+                result.add(showdown_winners(holes, board + runout))
+            continue
+
+        np = batcheval.np
+        runouts = batcheval.random_deals(seed.child(batch), size, missing, dead)
+        ranks = np.stack([batcheval.evaluate_batch(np.hstack([np.tile(hole + board, (size, 1)), runouts]))
+                          for hole in holes])
+        result.add_batch(ranks == ranks.max(axis=0))
+
+    return result
+
+
+def monte_carlo_equity(hole_cards, board=(), samples=100000, time_limit=None, workers=None, seed=None):
+    """A function that estimates the win, tie and lose probabilities of every player by dealing random runouts of the
+    board. The runouts are split over a pool of worker processes, each with its own random stream, and the counts of
+    all workers are merged. With NumPy installed the runouts are dealt and evaluated in arrays by batcheval, which
+    deals from other random streams, so a seed gives the same result only with the same evaluator.
+
+        :param hole_cards: The two hole cards, or their codes, of every player.
+        :type hole_cards: list of list of PlayingCard
+        :param board: The known board cards, or their codes.
+        :type board: list of PlayingCard
+        :param samples: The maximum number of runouts to deal.
+        :type samples: int
+        :param time_limit: The maximum number of seconds to sample for, or None for no limit.
+        :type time_limit: float
+        :param workers: The number of worker processes, defaults to the number of CPUs. 1 samples in this process.
+        :type workers: int
+        :param seed: The root seed of the random streams, or None for a random one.
+        :type seed: int
+        :return: The counts of all dealt runouts.
+        :rtype: EquityResult
+            """
+    holes = [_to_codes(hole) for hole in hole_cards]
+    board = _to_codes(board)
+    _check_cards(holes, board)
+
+    batcheval = _batch_evaluator()
+    if batcheval is not None:
+        # Build the lookup arrays before the time limit starts. Forked workers share the arrays built here, so they are
+        # built once rather than once per worker.
+        batcheval.prepare()
+
+    workers = workers or os.cpu_count() or 1
+    deadline = time.time() + time_limit if time_limit is not None else None
+    root = SeedSequence(seed)
+
+    # Chunk i is always dealt from child i of the root seed, so without a time limit the result does not depend on
+    # the number of workers.
+    chunks = [(min(_CHUNK_SAMPLES, samples - start), root.child(i))
+              for i, start in enumerate(range(0, samples, _CHUNK_SAMPLES))]
+    result = EquityResult(len(holes))
+
+    if workers == 1:
+        for size, chunk_seed in chunks:
+            result.merge(_sample_runouts(holes, board, size, deadline, chunk_seed))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_sample_runouts, holes, board, size, deadline, chunk_seed)
+                   for size, chunk_seed in chunks]
+        for future in as_completed(futures):
+            result.merge(future.result())
+
+    return result
+
+
+def _enumerate_boards(holes, board, first):
+    """Walks every runout of the board in combinatorial order and counts the results of a heads-up spot. The packed
+    evaluation keys of both players are updated card by card, so every board only costs one flush test and one table
+    lookup per player. Runs in a worker process.
+
+        :param holes: The codes of the hole cards of both players.
+        :type holes: list of list of int
+        :param board: The codes of the known board cards.
+        :type board: list of int
+        :param first: Only walk the runouts whose first new card is the card at this index of the remaining deck, or
+         None to walk all of them.
+        :type first: int
+        :return: The counts of all walked runouts.
+        :rtype: EquityResult
+            """
+    dead = set(board).union(*holes)
+    stub = [c.code for c in StandardDeck().cards if c.code not in dead]
+    stub.sort()
+    keys = [card_eval_key(code) for code in stub]
+    counts = [0, 0, 0]  # Wins of player 0, wins of player 1 and ties
+
+    def walk(start, missing, key0, key1, cards):
+        if missing == 0:
+            rank0 = rank_packed(key0, holes[0] + cards)
+            rank1 = rank_packed(key1, holes[1] + cards)
+            counts[0 if rank0 > rank1 else 1 if rank1 > rank0 else 2] += 1
+            return
+        for i in range(start, len(stub) - missing + 1):
+            cards.append(stub[i])
+            walk(i + 1, missing - 1, key0 + keys[i], key1 + keys[i], cards)
+            cards.pop()
+
+    board_key = sum(map(card_eval_key, board))
+    key0 = board_key + sum(map(card_eval_key, holes[0]))
+    key1 = board_key + sum(map(card_eval_key, holes[1]))
+    if first is None:
+        walk(0, 5 - len(board), key0, key1, list(board))
+    else:
+        walk(first + 1, 4 - len(board), key0 + keys[first], key1 + keys[first], board + [stub[first]])
+
+    result = EquityResult(2)
+    result.samples = sum(counts)
+    result.wins = counts[:2]
+    result.ties = [counts[2], counts[2]]
+    result.shares = [counts[0] + counts[2] / 2, counts[1] + counts[2] / 2]
+    return result
+
+
+def exact_equity(hole_cards, board=(), workers=None):
+    """A function that computes the exact win, tie and lose probabilities of a heads-up spot by walking every
+    possible runout of the board: 1,712,304 preflop, 990 on the flop and 44 on the turn. The runouts are split over
+    a pool of worker processes by their first new card.
+
+        :param hole_cards: The two hole cards, or their codes, of both players.
+        :type hole_cards: list of list of PlayingCard
+        :param board: The known board cards, or their codes.
+        :type board: list of PlayingCard
+        :param workers: The number of worker processes, defaults to the number of CPUs. 1 walks in this process.
+        :type workers: int
+        :return: The counts of all runouts.
+        :rtype: EquityResult
+            """
+    holes = [_to_codes(hole) for hole in hole_cards]
+    board = _to_codes(board)
+    _check_cards(holes, board)
+    if len(holes) != 2:
+        raise ValueError('Exact equities are only computed for heads-up spots.')
+
+    workers = workers or os.cpu_count() or 1
+    missing = 5 - len(board)
+    if workers == 1 or missing < 2:
+        return _enumerate_boards(holes, board, None)
+
+    result = EquityResult(2)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_enumerate_boards, holes, board, first)
+                   for first in range(48 - len(board) - missing + 1)]
+        for future in as_completed(futures):
+            result.merge(future.result())
+
+    return result
+
+
+def game_equity(game, workers=None):
+    """A function that computes the exact equities of the two players left in the round of a game at its street.
+
+        :param game: A game, such as GameModel, with exactly two players who have not folded. The hole cards are read
+         from the hands of game.in_round() and the board from game.tablestate.tablecards.
+        :type game: GameModel
+        :param workers: The number of worker processes, defaults to the number of CPUs.
+        :type workers: int
+        :return: The counts of all runouts, in the seat order of the two players.
+        :rtype: EquityResult
+            """
+    players = game.in_round()
+    if len(players) != 2:
+        raise ValueError(f'Exact equities need exactly two players left in the round, not {len(players)}.')
+    holes = [player.hand.cards for player in players]
+    return exact_equity(holes, game.tablestate.tablecards.cards, workers)
@@ -0,0 +1,220 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+A compact, append-only binary log of every hand played by a GameEngine or GameModel.
+
+A log file starts with an 8 byte header followed by fixed-width records of 12 bytes, one per event::
+
+    kind (uint8), seat (uint8), card (uint8), extra (uint8), value (int64)
+
+Every hand is written as one HAND record, one STACK record and two HOLE records per player, then its BET, CALL,
+ALL_IN, FOLD and BOARD records in the order they happened, the RESULT records of the payouts and finally one END
+record per player with the money after the hand. Files are rotated at hand boundaries, so every file starts with a
+HAND record.
+
+Next to every log file an index file with the suffix '.idx' holds the record number of the HAND record of every
+hand as a little-endian uint64, so a reader can seek to any hand without scanning the log.
+"""
+
+from array import array
+import os
+import struct
+import sys
+
+
+MAGIC = b'PKHH'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')  #: Magic, version and record size.
+RECORD = struct.Struct('<BBBBq')  #: Kind, seat, card, extra and value.
+
+# The kinds of records.
+HAND = 1  #: seat: the starting player, card: the number of players, value: the round number.
+STACK = 2  #: value: the money of the player at the start of the hand.
+HOLE = 3  #: card: the code of a hole card of the player.
+BOARD = 4  #: card: the code of a table card.
+BET = 5  #: value: the raise amount.
+CALL = 6  #: value: the amount called, 0 for a check.
+ALL_IN = 7  #: value: the amount moved into the pot.
+FOLD = 8
+RESULT = 9  #: extra: the PokerHierarchy value of the winning hand or 0 after a fold, value: the amount won.
+END = 10  #: value: the money of the player after the hand.
+
+ACTION_KINDS = {'bet': BET, 'call': CALL, 'all_in': ALL_IN, 'fold': FOLD}
+KIND_ACTIONS = {kind: action for action, kind in ACTION_KINDS.items()}
+NO_SEAT = 255  #: The seat of records that do not belong to a player.
+
+
+def log_path(directory, prefix, index):
+    """Returns the path of the log file with the given index.
+    """
+    return os.path.join(directory, f'{prefix}-{index:05d}.phh')
+
+
+def index_path(path):
+    """Returns the path of the index file of a log file.
+    """
+    return path + '.idx'
+
+
+def index_bytes(index):
+    """Returns the bytes of an index file holding the given record numbers.
+
+        :param index: The record numbers of the HAND records.
+        :type index: array
+        :return: The record numbers as little-endian uint64.
+        :rtype: bytes
+            """
+    if sys.byteorder == 'big':
+        index = array('Q', index)
+        index.byteswap()
+    return index.tobytes()
+
+
+class HandHistoryWriter:
+    """A class that records the hands of a game into binary log files. It is an observer of the game, so the game only
+    has to be created with it::
+
+        game = GameModel()
+        history = HandHistoryWriter(game, 'hand_history')
+
+    The records are packed into a preallocated buffer that is written to the file when it is full, so the memory
+    use stays the same however many hands are played. A new file is started when the current one has grown past
+    max_bytes. The writer closes itself when the game ends, otherwise close has to be called to write the buffered
+    records.
+
+        :param game: The game to record.
+        :type game: GameEngine
+        :param directory: The directory of the log files. It is created if needed.
+        :type directory: str
+        :param prefix: The start of the names of the log files.
+        :type prefix: str
+        :param max_bytes: The size after which a new file is started.
+        :type max_bytes: int
+        :param batch_records: The number of records kept in memory before they are written.
+        :type batch_records: int
+            """
+    def __init__(self, game, directory, prefix='hands', max_bytes=64 * 1024 * 1024, batch_records=4096):
+        if max_bytes <= FILE_HEADER.size or batch_records < 1:
+            raise ValueError('The log files and batches must have room for at least one record.')
+        self.game = game
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.buffer = bytearray(batch_records * RECORD.size)
+        self.offset = 0
+        self.file = None
+        self.file_bytes = 0
+        self.index_file = None
+        self.hand_index = array('Q')
+        self.paths = []
+        self.in_hand = False
+        self.holes = []
+
+        # Never overwrite an earlier log, continue after the last file instead.
+        os.makedirs(directory, exist_ok=True)
+        self.index = 0
+        while os.path.exists(log_path(directory, prefix, self.index)):
+            self.index += 1
+        self._open()
+
+        self.handlers = {'deal': self._deal, 'action': self._action, 'result': self._result,
+                         'endround': self._end, 'endgame': self._end_game}
+        game.add_observer(self)
+
+    def __call__(self, event, *args):
+        handler = self.handlers.get(event)
+        if handler is not None:
+            handler(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self):
+        """Starts a new log file.
+        """
+        path = log_path(self.directory, self.prefix, self.index)
+        self.index += 1
+        self.file = open(path, 'wb', buffering=0)
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self.index_file = open(index_path(path), 'wb', buffering=0)
+        self.file_bytes = FILE_HEADER.size
+        self.paths.append(path)
+
+    def _write(self, kind, seat, card, extra, value):
+        RECORD.pack_into(self.buffer, self.offset, kind, seat, card, extra, value)
+        self.offset += RECORD.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def _begin(self):
+        """Writes the records of the start of a hand, which are only known when the first action is taken.
+        """
+        if self.file_bytes + self.offset >= self.max_bytes:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+            self._open()
+
+        self.hand_index.append((self.file_bytes + self.offset - FILE_HEADER.size) // RECORD.size)
+        players = self.game.PlayerStates
+        starter = next((seat for seat, player in enumerate(players) if player.started), NO_SEAT)
+        self._write(HAND, starter, len(players), 0, self.game.rounds)
+        for seat, player in enumerate(players):
+            self._write(STACK, seat, 0, 0, player.money)
+        for seat, code in self.holes:
+            self._write(HOLE, seat, code, 0, 0)
+        self.holes.clear()
+        self.in_hand = True
+
+    def _deal(self, seat, code):
+        if seat is not None:
+            self.holes.append((seat, code))
+            return
+        if not self.in_hand:
+            self._begin()
+        self._write(BOARD, NO_SEAT, code, 0, 0)
+
+    def _action(self, seat, action, amount):
+        if not self.in_hand:
+            self._begin()
+        self._write(ACTION_KINDS[action], seat, 0, 0, amount)
+
+    def _result(self, seat, amount, hand_type):
+        self._write(RESULT, seat, 0, hand_type, amount)
+
+    def _end(self, *args):
+        if not self.in_hand:
+            return
+        for seat, player in enumerate(self.game.PlayerStates):
+            self._write(END, seat, 0, 0, player.money)
+        self.in_hand = False
+
+    def _end_game(self, *args):
+        # The game is over, so write the log now instead of relying on the application to close the writer.
+        self._end()
+        self.close()
+
+    def flush(self):
+        """Writes the buffered records to the current file.
+        """
+        if self.offset:
+            self.file.write(memoryview(self.buffer)[:self.offset])
+            self.file_bytes += self.offset
+            self.offset = 0
+        if self.hand_index:
+            self.index_file.write(index_bytes(self.hand_index))
+            del self.hand_index[:]
+
+    def close(self):
+        """Writes the buffered records, closes the file and stops recording the game.
+        """
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+            self.game.remove_observer(self)
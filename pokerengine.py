@@ -0,0 +1,622 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+from cardlib import *
+
+
+MAX_SEATS = 10  #: The largest number of players at a table.
+
+class Observable:
+    """
+    A base class for the game state that lets observers listen to changes without any Qt dependency.
+
+    Observers are called as observer(event, *args). Events with a message, such as 'bet' or 'winner', pass the
+    message as the only argument. 'changed' tells that the state of the object changed and 'new_cards' that the cards
+    of a hand changed.
+    """
+    def __init__(self):
+        self.observers = []
+
+    def add_observer(self, observer):
+        """
+        Adds a callable that is called on every event.
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Removes a callable added with add_observer. The list of observers is replaced instead of changed, so an
+        observer can remove itself while it is notified without the next observer being skipped.
+        """
+        observers = list(self.observers)
+        observers.remove(observer)
+        self.observers = observers
+
+    def notify(self, event, *args):
+        """
+        Calls all observers with the event and its arguments.
+        """
+        for observer in self.observers:
+            observer(event, *args)
+
+
+class EngineHand(Hand, Observable):
+    """
+    A class representing the cards of a player or the table, which can be flipped face down.
+
+    The showdown only needs the codes and the packed key that Hand keeps as cards are added. The full evaluator state
+    of the cards, from which the strength and the outs are read, is built from the codes when it is first asked for
+    and kept until the cards change.
+    """
+    def __init__(self):
+        Hand.__init__(self)
+        Observable.__init__(self)
+        self.flipped_cards = False
+        self._state = None
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def flip(self):
+        """
+        Flips over the cards (to hide them)
+        """
+        self.flipped_cards = not self.flipped_cards
+        self.notify('new_cards')
+
+    def flipped(self):
+        """
+        This model only flips all or no cards
+        """
+        return self.flipped_cards
+
+    @property
+    def state(self):
+        """
+        The evaluator state of the cards.
+        """
+        if self._state is None:
+            self._state = HandState(self.codes)
+        return self._state
+
+    def add_card(self, card):
+        super().add_card(card)
+        self._state = None
+        self.notify('new_cards')
+
+    def drop_cards(self, indices):
+        super().drop_cards(indices)
+        self._state = None
+        self.notify('new_cards')
+
+    def clear_all_cards(self):
+        super().clear_all_cards()
+        self._state = None
+
+    def strength(self, table=None):
+        """
+        Returns the evaluator state of the cards together with the table cards, from which the best hand class, the
+        dense rank and the draws of the player are read.
+
+        :param table: The table cards, or None for only the cards of this hand.
+        :type table: EngineHand
+        :return: The combined state.
+        :rtype: HandState
+        """
+        return self.state if table is None else self.state.combine(table.state)
+
+
+class Player(Observable):
+    """
+    A Class representing a player containing name, money, bet etc.
+    """
+    def __init__(self, name, money):
+        Observable.__init__(self)
+        self.hand = self.new_hand()
+        self.name = name
+        self.money = int(money)
+        self.bet = 0
+        self.wins = 0
+        self.active = False
+        self.started = False
+        # A player who folded, or has no money left, sits out the rest of the round.
+        self.folded = False
+        # The money put into the pot during the round, which decides the side pots the player can win.
+        self.contributed = 0
+        self.outs = []
+        self.out_probability = 0.0
+
+    def new_hand(self):
+        """
+        Creates the hand of the player. Subclasses can override it to use another kind of hand.
+        """
+        return EngineHand()
+
+    def set_active(self, active):
+        """
+        A method that sets a player as active or not.
+        """
+        self.active = active
+        self.notify('changed')
+
+    def set_starter(self, start):
+        """
+        A method that sets if a player has started a round or not.
+        """
+        self.started = start
+        self.notify('changed')
+
+    def won(self, amount):
+        """
+        A method that adds the pot to the player's money.
+        """
+        self.money += int(amount)
+        self.wins += 1
+        self.notify('changed')
+
+    def reset_bet(self):
+        """
+        A method that resets a player's bet.
+        """
+        self.bet = 0
+        self.notify('changed')
+
+
+class Table(Observable):
+    """
+    A class representing the table containing its cards.
+    """
+    def __init__(self):
+        Observable.__init__(self)
+        self.tablecards = self.new_hand()
+
+    def new_hand(self):
+        """
+        Creates the hand holding the table cards. Subclasses can override it to use another kind of hand.
+        """
+        return EngineHand()
+
+
+class GameEngine(Observable):
+    """
+    A class containing all the rules and actions to play a game of texas hold em for two to ten players, without any
+    user interface.
+
+    Observers receive the events 'bet', 'call', 'fold', 'all_in', 'winner' and 'endgame' with a message describing
+    what happened, 'endround' when a round is over and 'changed' when the pot or the active player changed. The
+    messages are only formatted when there are observers.
+
+    For recording the game, observers also receive the events 'deal' (seat, card code) for every dealt card, with the
+    seat None for the table, 'action' (seat, action, amount) for every accepted action and 'result' (seat, amount,
+    hand type) for every payout. The hand type is the PokerHierarchy value of the hand, or 0 when the other players
+    folded.
+
+    The betting of a street is over when every player still in the round with money left has acted since the last
+    raise and matched the highest bet. Players who are all in stay in the round without acting, and the money every
+    player put in decides which pots they can win: the showdown ranks all hands at once and pays the main pot and
+    every side pot from that one ranking.
+
+    When track_outs is set, the outs of every player and the probability to hit them by the river are updated in
+    player.outs and player.out_probability whenever table cards are dealt.
+
+    :param rng: The random generator used to shuffle the deck, for example from SeedSequence.generator(). Defaults to
+     the global generator of the random module.
+    :type rng: random.Random
+    """
+    def __init__(self, rng=None):
+        Observable.__init__(self)
+        self.track_outs = False
+        self.endgame = False
+        self.rounds = 0
+        self.PlayerStates = []
+        self.pot = 0
+        self.deck = StandardDeck(rng)
+        self.deck.shuffle()
+        self.tablestate = self.new_table()
+        self.blinds = []
+        # The seat whose turn it is, the highest bet of the street and the seats that acted since the last raise.
+        self.turn = 0
+        self.current_bet = 0
+        self.acted = set()
+
+    def new_player(self, name, money):
+        """
+        Creates a player. Subclasses can override it to use another kind of player.
+        """
+        return Player(name, money)
+
+    def new_table(self):
+        """
+        Creates the table. Subclasses can override it to use another kind of table.
+        """
+        return Table()
+
+    def deal_card(self, hand, seat=None):
+        """
+        Draws a card from the deck into a hand and notifies the observers.
+
+        :param hand: The hand of a player or the table cards.
+        :type hand: EngineHand
+        :param seat: The index of the player, or None for the table.
+        :type seat: int
+        """
+        card = self.deck.draw()
+        hand.add_card(card)
+        if self.observers:
+            self.notify('deal', seat, card.code)
+
+    def start_game(self, player_infos):
+        """
+        Sets player names and starting money based on input, which holds the names of two to ten players followed by
+        the starting money. Sets player 1 as the starting player.
+        """
+        *names, money = player_infos
+        if not 2 <= len(names) <= MAX_SEATS:
+            raise ValueError(f'A table has 2 to {MAX_SEATS} players, not {len(names)}.')
+        for name in names:
+            self.PlayerStates.append(self.new_player(name, money))
+
+        self.notify('changed')
+        self.turn = 0
+        self.PlayerStates[0].set_active(True)
+        for player in self.PlayerStates[1:]:
+            player.hand.flip()
+        self.PlayerStates[0].set_starter(True)
+        for seat, player in enumerate(self.PlayerStates):
+            self.deal_card(player.hand, seat)
+            self.deal_card(player.hand, seat)
+
+    def active_seat(self):
+        """
+        A method returning the index of the player whose turn it is.
+        """
+        return self.turn
+
+    def in_round(self):
+        """
+        A method returning the players who have not folded, including the players who are all in.
+        """
+        return [player for player in self.PlayerStates if not player.folded]
+
+    def can_bet(self):
+        """
+        A method returning the players who have not folded and have money left to bet.
+        """
+        return [player for player in self.PlayerStates if not player.folded and player.money > 0]
+
+    def highest_bettor(self):
+        """
+        A method returning the player holding the highest bet of the street, who is the player the others call.
+        """
+        return max(self.PlayerStates, key=lambda player: player.bet)
+
+    def set_active_seat(self, seat):
+        """
+        Gives the turn to a player. The cards of the active player are face up and the cards of the other players face
+        down, so the players can share one screen.
+        """
+        self.turn = seat
+        for other, player in enumerate(self.PlayerStates):
+            if player.active != (other == seat) or player.hand.flipped_cards != (other != seat):
+                player.hand.flipped_cards = other != seat
+                player.set_active(other == seat)
+
+    def next_seat(self, seat, condition):
+        """
+        Returns the first seat after a seat, going around the table, whose player meets a condition. Returns the seat
+        itself if no other player does.
+        """
+        seats = len(self.PlayerStates)
+        for step in range(1, seats):
+            if condition(self.PlayerStates[(seat + step) % seats]):
+                return (seat + step) % seats
+        return seat
+
+    def betting_done(self):
+        """
+        A method telling if the betting of the street is over: every player still in the round with money left has
+        acted since the last raise and matched the highest bet.
+        """
+        for seat, player in enumerate(self.PlayerStates):
+            if not player.folded and player.money > 0 and (player.bet != self.current_bet or seat not in self.acted):
+                return False
+        return True
+
+    def end_turn(self):
+        """
+        Moves on after an accepted action: to the next player, to the next street when the betting is over, or
+        straight to the showdown when at most one player can still bet.
+        """
+        if not self.betting_done():
+            self.next_player()
+        elif len(self.can_bet()) <= 1:
+            while len(self.tablestate.tablecards.cards) != 5:
+                self.new_card_event()
+            self.evaluate_winner()
+        else:
+            self.new_card_event()
+
+    def put_in(self, player, amount):
+        """
+        Moves money of a player into the pot.
+        """
+        self.pot += amount
+        player.bet += amount
+        player.contributed += amount
+        player.money -= amount
+        self.current_bet = max(self.current_bet, player.bet)
+        player.notify('changed')
+
+    def new_card_event(self):
+        """
+        A method that puts additional cards on the table depending on the state of the game. Also sets the first player
+        from the start player who can still bet as active.
+        """
+        for player in self.PlayerStates:
+            player.bet = 0
+        self.current_bet = 0
+        self.acted.clear()
+
+        if len(self.tablestate.tablecards.cards) == 0:
+            self.deal_card(self.tablestate.tablecards)
+            self.deal_card(self.tablestate.tablecards)
+            self.deal_card(self.tablestate.tablecards)
+        elif len(self.tablestate.tablecards.cards) == 3:
+            self.deal_card(self.tablestate.tablecards)
+        elif len(self.tablestate.tablecards.cards) == 4:
+            self.deal_card(self.tablestate.tablecards)
+        else:
+            self.evaluate_winner()
+            return
+        if self.track_outs:
+            self.update_outs()
+
+        starter = next(seat for seat, player in enumerate(self.PlayerStates) if player.started)
+        if self.PlayerStates[starter].folded or self.PlayerStates[starter].money == 0:
+            starter = self.next_seat(starter, lambda player: not player.folded and player.money > 0)
+        self.set_active_seat(starter)
+
+    def update_outs(self):
+        """
+        Counts the outs of the players still in the round on the flop and the turn, and clears them on the other
+        streets. Heads-up the outs are counted against the cards of the opponent, with more players only the cards that
+        improve the hand of the player count.
+        """
+        table = self.tablestate.tablecards.state
+        players = self.in_round()
+        for player in self.PlayerStates:
+            if 3 <= len(table) <= 4 and not player.folded:
+                opponent = None
+                if len(players) == 2:
+                    opponent = players[players[0] is player].hand.state
+                outs, player.out_probability = find_outs(player.hand.state, table, opponent)
+                player.outs = [CARDS[code] for code in outs]
+            else:
+                player.outs = []
+                player.out_probability = 0.0
+            player.notify('changed')
+
+    def fold(self):
+        """
+        A method that makes the active player fold. The last player left in the round wins the pot.
+        """
+        seat = self.active_seat()
+        player = self.PlayerStates[seat]
+        player.folded = True
+        players = self.in_round()
+        if self.observers:
+            self.notify('action', seat, 'fold', 0)
+        if len(players) > 1:
+            if self.observers:
+                self.notify('fold', f'{player.name} folded')
+            self.end_turn()
+            self.notify('changed')
+            return
+
+        for other in self.PlayerStates:
+            other.hand.flipped_cards = False
+            other.notify('changed')
+        winner = players[0]
+        if self.observers:
+            self.notify('winner', f"{player.name} folded!\n{winner.name} wins the pot of {self.pot}.")
+            self.notify('result', self.PlayerStates.index(winner), self.pot, 0)
+        winner.won(self.pot)
+        self.next_round()
+        self.notify('changed')
+
+    def all_in(self):
+        """
+        A method that makes the active player go all in
+        """
+        seat = self.active_seat()
+        player = self.PlayerStates[seat]
+        amount = player.money
+        cover = max(other.money + other.bet for other in self.in_round() if other is not player)
+        if player.money + player.bet > cover:
+            self.notify('all_in', "You can't bet more than your opponent's money!")
+            return
+
+        if self.observers:
+            self.notify('action', seat, 'all_in', amount)
+        if player.money + player.bet > self.current_bet:
+            # A raise, everybody else has to act again.
+            self.acted = {seat}
+        else:
+            self.acted.add(seat)
+        self.put_in(player, amount)
+        if self.observers:
+            self.notify('all_in', f'{player.name} is all in!')
+        self.end_turn()
+        self.notify('changed')
+
+    def bet(self, raise_amount):
+        """
+        A method that makes the active player bet with a given amount, on top of the highest bet of the street.
+        """
+        seat = self.active_seat()
+        player = self.PlayerStates[seat]
+        amount = int(raise_amount) + self.current_bet - player.bet
+        cover = max(other.money + other.bet for other in self.in_round() if other is not player)
+        if amount > player.money:
+            self.notify('bet', "You don't have enough money!\nTry a smaller bet!")
+        elif int(raise_amount) <= 0:
+            self.notify('bet', "You need to atleast bet 1 or check!")
+        elif amount == player.money:
+            self.notify('bet', "Are you sure you want to go all in?\nPress All In button")
+        elif player.bet + amount > cover:
+            self.notify('bet', "You can't bet more than your opponent's money!\nTry a smaller bet!")
+        else:
+            if self.observers:
+                self.notify('action', seat, 'bet', int(raise_amount))
+                if player.bet == self.current_bet:
+                    self.notify('bet', f"{player.name} bet {amount}")
+                else:
+                    self.notify('bet', f"{player.name} called {self.highest_bettor().name} and raised them "
+                                       f"{int(raise_amount)}")
+
+            self.put_in(player, amount)
+            self.acted = {seat}
+            self.end_turn()
+            self.notify('changed')
+
+    def call(self):
+        """
+        A method that makes the active player call the current bet or check. A player without the money to call puts
+        in all of it.
+        """
+        seat = self.active_seat()
+        player = self.PlayerStates[seat]
+        amount = min(self.current_bet - player.bet, player.money)
+        if self.observers:
+            self.notify('action', seat, 'call', amount)
+            if amount == 0:
+                self.notify('call', f"{player.name} checked")
+            elif amount == player.money:
+                self.notify('call', f"{player.name} called {self.highest_bettor().name} and is all in!")
+            else:
+                self.notify('call', f"{player.name} called {self.highest_bettor().name}")
+        if amount:
+            self.put_in(player, amount)
+        self.acted.add(seat)
+        self.end_turn()
+        self.notify('changed')
+
+    def side_pots(self):
+        """
+        A method splitting the pot into the main pot and the side pots. Every pot is a layer of the money put in by
+        the players: the main pot holds what every player still in the round put in, and every side pot the money
+        above that, which only the players who put in as much can win.
+
+        :return: The amount of every pot and the seats that can win it, from the main pot up.
+        :rtype: list of tuple
+        """
+        players = self.PlayerStates
+        pots = []
+        level = total = 0
+        for top in sorted({player.contributed for player in self.in_round()}):
+            amount = sum(min(player.contributed, top) - min(player.contributed, level) for player in players)
+            pots.append((amount, [seat for seat, player in enumerate(players)
+                                  if not player.folded and player.contributed >= top]))
+            total += amount
+            level = top
+        # Money of folded players above the highest bet still in the round belongs to the last pot.
+        amount, seats = pots[-1]
+        pots[-1] = amount + self.pot - total, seats
+        return pots
+
+    def evaluate_winner(self):
+        """
+        A method that evaluates the winners of the round. The hands of all players still in the round are ranked in one
+        batch against the table cards, and every pot goes to the best ranked players who can win it, with the odd
+        chips of a split pot going to the first seats. Shows the cards of these players and notifies the observers
+        with information regarding their PokerHands.
+        """
+        players = self.PlayerStates
+        seats = [seat for seat, player in enumerate(players) if not player.folded]
+        for seat in seats:
+            players[seat].hand.flipped_cards = False
+            players[seat].notify('changed')
+
+        # Rank every hand once, then walk the seats from the best hand down to find the winners of every pot.
+        table = self.tablestate.tablecards
+        ranks = dict(zip(seats, showdown_ranks([players[seat].hand for seat in seats], table)))
+        ranking = sorted(seats, key=ranks.get, reverse=True)
+        winnings = [0] * len(players)
+        pots = []
+        for amount, eligible in self.side_pots():
+            best = ranks[next(seat for seat in ranking if seat in eligible)]
+            winners = [seat for seat in eligible if ranks[seat] == best]
+            share, odd = divmod(amount, len(winners))
+            for n, seat in enumerate(winners):
+                winnings[seat] += share + (n < odd)
+            pots.append((amount, winners))
+
+        if self.observers:
+            messages = [', '.join(f'{players[seat].name} has {str(players[seat].hand.best_poker_hand(table.cards))}'
+                                  for seat in seats) + '.']
+            for n, (amount, winners) in enumerate(pots):
+                name = 'the pot' if len(pots) == 1 else 'the main pot' if n == 0 else f'side pot {n}'
+                if len(winners) == 1:
+                    messages.append(f'{players[winners[0]].name} wins {name} of {amount}!')
+                else:
+                    names = 'the players' if len(winners) == len(seats) else \
+                        ' and '.join(players[seat].name for seat in winners)
+                    messages.append(f'{name[0].upper()}{name[1:]} of {amount} is split between {names}.')
+            self.notify('winner', ' '.join(messages))
+
+        for seat, amount in enumerate(winnings):
+            if amount:
+                if self.observers:
+                    self.notify('result', seat, amount, players[seat].hand.strength(table).hand_type().value)
+                players[seat].won(amount)
+
+        self.notify('changed')
+
+        funded = [player for player in players if player.money > 0]
+        if len(funded) == 1:
+            self.endgame = True
+            self.notify('endgame', f"The Winner of The game is {funded[0].name}")
+
+        else:
+            self.next_round()
+
+    def next_player(self):
+        """
+        Gives the turn to the next player who is still in the round and has money left.
+        """
+        self.set_active_seat(self.next_seat(self.active_seat(), lambda player: not player.folded and player.money > 0))
+
+    def next_round(self):
+        """
+        Resets the pot and player bets. Deals new cards to the players with money left, the others sit out. The next
+        player with money starts the round and has the cards face up.
+        """
+        self.notify('endround')
+        self.rounds += 1
+        self.pot = 0
+        self.current_bet = 0
+        self.acted.clear()
+        # Reuse the deck and only shuffle the cards a round can deal: two per player and five on the table.
+        self.deck.reset()
+        self.deck.shuffle(2 * len(self.PlayerStates) + 5)
+        self.tablestate.tablecards.clear_all_cards()
+        self.tablestate.notify('changed')
+        for seat, player in enumerate(self.PlayerStates):
+            player.reset_bet()
+            player.contributed = 0
+            player.hand.clear_all_cards()
+            player.folded = player.money == 0
+            if not player.folded:
+                self.deal_card(player.hand, seat)
+                self.deal_card(player.hand, seat)
+            player.notify('changed')
+
+        # The start moves to the next player with money.
+        starter = next(seat for seat, player in enumerate(self.PlayerStates) if player.started)
+        starter = self.next_seat(starter, lambda player: player.money > 0)
+        for seat, player in enumerate(self.PlayerStates):
+            player.set_starter(seat == starter)
+        self.set_active_seat(starter)
+        if self.track_outs:
+            self.update_outs()
+        self.notify('changed')
@@ -1,18 +1,97 @@
 # DAT-171: Computer assignment 3
 # Authors: Daniel Soderqvist and Felix Mare
 
-from pokerview import *
+import time
+STARTED = time.perf_counter()  # Taken before the GUI modules are imported, so the report includes the imports.
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+from pokermodel import GameModel
+from pokerview import CardView, SetupWindow
+from handhistory import HandHistoryWriter
+import argparse
+import atexit
 import sys
 
+IMPORTED = time.perf_counter()
+
+
+class StartupReport(QObject):
+    """
+    Prints how long the start up took: the imports, the creation of the setup window, the first frame on the screen
+    and the reading of the card images in the background. If the card images are not read within wait_ms of the first
+    frame, they are reported as not loaded.
+    """
+    wait_ms = 10000
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.times = {'import': IMPORTED - STARTED}
+        self.timer = None
+        self.reported = False
+        window.installEventFilter(self)
+
+    def mark(self, name):
+        """
+        Notes the time since start of a step.
+        """
+        self.times[name] = time.perf_counter() - STARTED
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and 'first frame' not in self.times:
+            self.mark('first frame')
+            self.window.removeEventFilter(self)
+            # Wait for the card images before reporting, but not for ever.
+            if CardView.art.loaded_at is not None:
+                self.report()
+            else:
+                CardView.art.loaded.connect(self.report)
+                self.timer = QTimer()
+                self.timer.setSingleShot(True)
+                self.timer.timeout.connect(self.report)
+                self.timer.start(self.wait_ms)
+        return False
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        if self.timer is not None:
+            self.timer.stop()
+            CardView.art.loaded.disconnect(self.report)
+        times = [f'{name} {seconds * 1000:.0f} ms' for name, seconds in self.times.items()]
+        if CardView.art.loaded_at is None:
+            times.append('card images not loaded')
+        else:
+            times.append(f'card images {(CardView.art.loaded_at - STARTED) * 1000:.0f} ms')
+        print('Start up: ' + ', '.join(times), file=sys.stderr)
+
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Texas Hold'em for two players.")
+    parser.add_argument('--startup-report', action='store_true', help='print how long the start up took')
+    parser.add_argument('--hand-history', metavar='DIRECTORY', nargs='?', const='hand_history', default=None,
+                        help='write a hand-history log of the game to DIRECTORY (default: hand_history)')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     game = GameModel()
+    history = None
+    if args.hand_history is not None:
+        history = HandHistoryWriter(game, args.hand_history)
+        # The writer closes itself at the end of the game. Closing the window or quitting in between also writes the
+        # log.
+        atexit.register(history.close)
     window = SetupWindow(game)
+    if args.startup_report:
+        report = StartupReport(window)
+        report.mark('setup window')
     window.show()
     app.exec_()
+    if history is not None:
+        history.close()
 
 
 if __name__ == "__main__":
     main()
-
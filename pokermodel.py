@@ -4,6 +4,7 @@
 
 from PyQt5.QtCore import (pyqtSignal, QObject)
 from cardlib import *
+from pokerengine import *
 
 
 class CardModel(QObject):
@@ -20,94 +21,122 @@ class CardModel(QObject):
         """Returns true of cards should be drawn face down"""
 
 
-class HandModel(Hand, CardModel):
+class SignalBatch:
     """
-    A class representing the handmodel.
+    A class that coalesces the signals of the models of a game while an action runs. One action changes the same
+    player, hand or table many times, and without a batch every change repaints the views. Used as a context manager,
+    the batch collects the signals and emits each state signal once when the outermost action is done, followed by
+    the messages in the order they came. Outside of an action the signals are emitted right away.
     """
     def __init__(self):
-        Hand.__init__(self)
-        CardModel.__init__(self)
-        # Additional state needed by the UI
-        self.flipped_cards = False
+        self.depth = 0
+        self.pending = {}  # The state signals to emit, as (model, signal name), in the order of the first change.
+        self.messages = []
 
-    def __iter__(self):
-        return iter(self.cards)
+    def __enter__(self):
+        self.depth += 1
+        return self
 
-    def flip(self):
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if not self.depth:
+            self.flush()
+
+    def changed(self, model, name):
         """
-        Flips over the cards (to hide them)
+        Emits a state signal without arguments, or notes it until the action is done.
         """
-        self.flipped_cards = not self.flipped_cards
-        self.new_cards.emit()  # something changed, better emit the signal!
+        if self.depth:
+            self.pending[(model, name)] = None
+        else:
+            getattr(model, name).emit()
 
-    def flipped(self):
+    def message(self, model, name, *args, blocking=False):
         """
-        This model only flips all or no cards
+        Emits a message signal, or queues it until the action is done. A blocking message, such as the end of a
+        round that waits for the user, first emits everything collected so far so the views show the current state.
         """
-        return self.flipped_cards
+        if not self.depth:
+            getattr(model, name).emit(*args)
+        elif blocking:
+            self.flush()
+            getattr(model, name).emit(*args)
+        else:
+            self.messages.append((model, name, args))
 
-    def add_card(self, card):
-        super().add_card(card)
-        self.new_cards.emit()  # something changed, better emit the signal!
+    def flush(self):
+        """
+        Emits the collected signals. A slot can start a new action, so the collected signals are taken first.
+        """
+        pending, self.pending = self.pending, {}
+        messages, self.messages = self.messages, []
+        for model, name in pending:
+            getattr(model, name).emit()
+        for model, name, args in messages:
+            getattr(model, name).emit(*args)
 
 
-class PlayerState(QObject):
+class HandModel(EngineHand, CardModel):
     """
-    A Class representing a player state containing name, money, bet etc.
+    A class representing the handmodel.
     """
-    data_changed = pyqtSignal()
+    def __init__(self, batch=None):
+        EngineHand.__init__(self)
+        CardModel.__init__(self)
+        self.batch = batch or SignalBatch()
+        self.add_observer(self.emit_signal)
 
-    def __init__(self, name, money):
-        super().__init__()
-        self.hand = HandModel()
-        self.name = name
-        self.money = int(money)
-        self.bet = 0
-        self.wins = 0
-        self.active = False
-        self.started = False
-
-    def set_active(self, active):
+    def emit_signal(self, event, *args):
         """
-        A method that sets a player as active or not.
+        Emits the signal of the UI when the engine hand notifies a change.
         """
-        self.active = active
-        self.data_changed.emit()
+        self.batch.changed(self, 'new_cards')  # something changed, better emit the signal!
 
-    def set_starter(self, start):
-        """
-        A method that sets if a player has started a round or not.
-        """
-        self.started = start
-        self.data_changed.emit()
 
-    def won(self, amount):
-        """
-        A method that adds the pot to the player's money.
-        """
-        self.money += int(amount)
-        self.wins += 1
-        self.data_changed.emit()
+class PlayerState(Player, QObject):
+    """
+    A Class representing a player state containing name, money, bet etc.
+    """
+    data_changed = pyqtSignal()
 
-    def reset_bet(self):
+    def __init__(self, name, money, batch=None):
+        QObject.__init__(self)
+        self.batch = batch or SignalBatch()
+        Player.__init__(self, name, money)
+        self.add_observer(self.emit_signal)
+
+    def new_hand(self):
+        return HandModel(self.batch)
+
+    def emit_signal(self, event, *args):
         """
-        A method that resets a player's bet.
+        Emits the signal of the UI when the engine player notifies a change.
         """
-        self.bet = 0
-        self.data_changed.emit()
+        self.batch.changed(self, 'data_changed')
 
 
-class TableState(QObject):
+class TableState(Table, QObject):
     """
     A class representing the table containing its cards.
     """
     data_changed = pyqtSignal()
 
-    def __init__(self):
-        super().__init__()
-        self.tablecards = HandModel()
+    def __init__(self, batch=None):
+        QObject.__init__(self)
+        self.batch = batch or SignalBatch()
+        Table.__init__(self)
+        self.add_observer(self.emit_signal)
         self.data_changed.emit()
 
+    def new_hand(self):
+        return HandModel(self.batch)
+
+    def emit_signal(self, event, *args):
+        """
+        Emits the signal of the UI when the engine table notifies a change.
+        """
+        self.batch.changed(self, 'data_changed')
+
 
 class Blinds(QObject):  # NOT YET IMPLEMENTED
     """
@@ -121,9 +150,13 @@ class Blinds(QObject):  # NOT YET IMPLEMENTED
         self.big = int(big)
 
 
-class GameModel(QObject):
+class GameModel(GameEngine, QObject):
     """
-    A class containing all the information and actions to play a game of texas hold em.
+    A class containing all the information and actions to play a game of texas hold em. The rules live in
+    GameEngine, this class only turns the events of the engine into Qt signals.
+
+    Every action runs in the SignalBatch of the game, which is shared by its players, hands and table. The views get
+    one signal per changed model when the action is done, instead of one for every step of the rules.
     """
     signal_bet = pyqtSignal(str)
     signal_call = pyqtSignal(str)
@@ -135,258 +168,51 @@ class GameModel(QObject):
     data_changed = pyqtSignal()
 
     def __init__(self):
-        super().__init__()
-        self.endgame = False
-        self.PlayerStates = []
-        self.pot = 0
-        self.deck = StandardDeck()
-        self.deck.shuffle()
-        self.tablestate = TableState()
-        self.blinds = []
+        QObject.__init__(self)
+        self.batch = SignalBatch()
+        GameEngine.__init__(self)
+        self.signals = {'bet': 'signal_bet',
+                        'call': 'signal_call',
+                        'fold': 'signal_fold',
+                        'all_in': 'signal_all_in',
+                        'winner': 'signal_winner',
+                        'endround': 'signal_endround',
+                        'endgame': 'signal_endgame'}
+        self.add_observer(self.emit_signal)
+
+    def new_player(self, name, money):
+        return PlayerState(name, money, self.batch)
+
+    def new_table(self):
+        return TableState(self.batch)
+
+    def emit_signal(self, event, *args):
+        """
+        Emits the signal of the UI that matches the event of the engine. The events for recording the game, such as
+        'deal' and 'action', have no signal. The end of a round and of the game open a dialog that waits for the user,
+        so the views are updated before they are emitted.
+        """
+        if event == 'changed':
+            self.batch.changed(self, 'data_changed')
+        elif event in self.signals:
+            self.batch.message(self, self.signals[event], *args, blocking=event in ('endround', 'endgame'))
 
     def start_game(self, player_infos):
-        """
-        Sets player names and starting money based on input. Sets player 1 as the starting player.
-        """
-        self.PlayerStates.append(PlayerState(player_infos[0], player_infos[2]))
-        self.PlayerStates.append(PlayerState(player_infos[1], player_infos[2]))
-
-        # In case of implementing blinds
-        # self.blinds = Blinds(player_infos[-2], player_infos[-1])
-        # self.PlayerStates[0].bet += self.blinds.small
-        # self.PlayerStates[1].bet += self.blinds.big
-        # self.PlayerStates[0].money -= self.blinds.small
-        # self.PlayerStates[1].money -= self.blinds.big
-
-        self.data_changed.emit()
-        self.PlayerStates[0].set_active(True)
-        self.PlayerStates[1].hand.flip()
-        self.PlayerStates[0].set_starter(True)
-        for player in self.PlayerStates:
-            player.hand.add_card((self.deck.draw()))
-            player.hand.add_card((self.deck.draw()))
-
-    def who_is_active(self):
-        """
-        A method returning a list with the active and not active players. First player is the active one.
-        """
-        for player in self.PlayerStates:
-            if player.active:
-                active_player = player
-                player.hand.flipped_cards = True
-            else:
-                not_active_player = player
-                player.hand.flipped_cards = False
-        self.data_changed.emit()
-
-        return active_player, not_active_player
-
-    def new_card_event(self):
-        """
-        A method that puts additional cards on the table depending on the state of the game. Also sets the start player
-        as active.
-        """
-        self.PlayerStates[0].bet = 0
-        self.PlayerStates[1].bet = 0
-
-        if len(self.tablestate.tablecards.cards) == 0:
-            self.tablestate.tablecards.add_card(self.deck.draw())
-            self.tablestate.tablecards.add_card(self.deck.draw())
-            self.tablestate.tablecards.add_card(self.deck.draw())
-        elif len(self.tablestate.tablecards.cards) == 3:
-            self.tablestate.tablecards.add_card(self.deck.draw())
-        elif len(self.tablestate.tablecards.cards) == 4:
-            self.tablestate.tablecards.add_card(self.deck.draw())
-        else:
-            self.evaluate_winner()
-
-        for player in self.PlayerStates:
-            if player.started:
-                player.set_active(True)
-            else:
-                player.set_active(False)
+        with self.batch:
+            GameEngine.start_game(self, player_infos)
 
     def fold(self):
-        """
-        A method that makes the active player fold.
-        """
-        self.PlayerStates[0].hand.flipped_cards = False
-        self.PlayerStates[1].hand.flipped_cards = False
-        self.PlayerStates[0].data_changed.emit()
-        self.PlayerStates[1].data_changed.emit()
-        players = self.who_is_active()
-        self.signal_winner.emit(f"{players[0].name} folded!\n{players[1].name} wins the pot of {self.pot}.")
-        players[1].won(self.pot)
-        players[1].data_changed.emit()
-        self.next_round()
-        self.data_changed.emit()
+        with self.batch:
+            GameEngine.fold(self)
 
     def all_in(self):
-        """
-        A method that makes the active player go all in
-        """
-        players = self.who_is_active()
-        amount = players[0].money
-        if players[0].money + players[0].bet > players[1].money + players[1].bet:
-            self.signal_all_in.emit("You can't bet more than your opponent's money!")
-        elif players[0].money + players[0].bet == players[1].bet:
-            self.pot += int(amount)
-            players[0].bet += int(amount)
-            players[0].money -= int(amount)
-            players[0].data_changed.emit()
-            self.signal_all_in.emit(f'{players[0].name} is all in!')
-            while len(self.tablestate.tablecards.cards) != 5:
-                self.new_card_event()
-            self.evaluate_winner()
-            self.data_changed.emit()
-        elif self.PlayerStates[0].money == 0 or self.PlayerStates[0].money == 0:
-            while len(self.tablestate.tablecards.cards) != 5:
-                self.new_card_event()
-            self.evaluate_winner()
-            self.data_changed.emit()
-        else:
-            self.pot += int(amount)
-            players[0].bet += int(amount)
-            players[0].money -= int(amount)
-            players[0].data_changed.emit()
-            self.signal_all_in.emit(f'{players[0].name} is all in!')
-            self.next_player()
-            self.data_changed.emit()
+        with self.batch:
+            GameEngine.all_in(self)
 
     def bet(self, raise_amount):
-        """
-        A method that makes the active player bet with a given amount.
-        """
-        players = self.who_is_active()
-        amount = int(raise_amount) + int(players[1].bet) - int(players[0].bet)
-        if int(amount) > players[0].money:
-            self.signal_bet.emit("You don't have enough money!\nTry a smaller bet!")
-        elif int(amount) == 0 or amount == '':
-            self.signal_bet.emit("You need to atleast bet 1 or check!")
-        elif int(amount) - players[0].money == 0:
-            self.signal_bet.emit("Are you sure you want to go all in?\nPress All In button")
-        elif int(amount) > players[1].money + players[1].bet:
-            self.signal_bet.emit("You can't bet more than your opponent's money!\nTry a smaller bet!")
-        else:
-            if players[0].bet == players[1].bet:
-                self.signal_bet.emit(f"{players[0].name} bet {amount}")
-            else:
-                self.signal_bet.emit(f"{players[0].name} called {players[1].name} and raised them {int(raise_amount)}")
-
-            self.pot += int(amount)
-            players[0].bet += int(amount)
-            players[0].money -= int(amount)
-            players[0].data_changed.emit()
-            self.next_player()
-            self.data_changed.emit()
+        with self.batch:
+            GameEngine.bet(self, raise_amount)
 
     def call(self):
-        """
-        A method that makes the active player call the current bet or check.
-        """
-        players = self.who_is_active()
-        if players[0].bet == players[1].bet and players[0].active != players[0].started:
-            self.signal_call.emit(f"{players[0].name} checked")
-            self.new_card_event()
-        elif players[0].bet == players[1].bet:
-            self.signal_call.emit(f"{players[0].name} checked")
-            self.next_player()
-        else:
-            diff_amount = players[1].bet-players[0].bet
-            players[0].bet += diff_amount
-            players[0].money -= diff_amount
-            self.pot += diff_amount
-            self.signal_call.emit(f"{players[0].name} called {players[1].name}")
-            if players[0].money == 0:
-                self.signal_call.emit("Are you sure you want to go all in?\nPress All In button")
-                return
-            if players[1].money == 0:
-                while len(self.tablestate.tablecards.cards) != 5:
-                    self.new_card_event()
-                self.evaluate_winner()
-                return
-            self.new_card_event()
-        players[0].data_changed.emit()
-        self.data_changed.emit()
-
-    def evaluate_winner(self):
-        """
-        A method that evaluates the winner of the round. Shows both of the players cards and emits a signal with information
-        regarding the players PokerHands.
-        """
-        self.PlayerStates[0].hand.flipped_cards = False
-        self.PlayerStates[1].hand.flipped_cards = False
-        self.PlayerStates[0].data_changed.emit()
-        self.PlayerStates[1].data_changed.emit()
-
-        bph0 = self.PlayerStates[0].hand.best_poker_hand(self.tablestate.tablecards.cards)
-        bph1 = self.PlayerStates[1].hand.best_poker_hand(self.tablestate.tablecards.cards)
-
-        hand_string = f'{self.PlayerStates[0].name} has {str(bph0)}, {self.PlayerStates[1].name} has {str(bph1)}. '
-
-        if bph0 > bph1:
-            self.PlayerStates[0].won(self.pot)
-            self.signal_winner.emit(hand_string+f'{self.PlayerStates[0].name} wins the pot of {self.pot}!')
-
-        elif bph1 > bph0:
-            self.PlayerStates[1].won(self.pot)
-            self.signal_winner.emit(hand_string+f'{self.PlayerStates[1].name} wins the pot of {self.pot}!')
-
-        else:
-            self.signal_winner.emit(hand_string+f'The pot of {self.pot} is split between the players.')
-            self.PlayerStates[0].won(self.pot/2)
-            self.PlayerStates[1].won(self.pot/2)
-
-        self.data_changed.emit()
-
-        if self.PlayerStates[0].money == 0:
-            self.signal_endgame.emit(f"The Winner of The game is {self.PlayerStates[1].name}")
-
-        elif self.PlayerStates[1].money == 0:
-            self.signal_endgame.emit(f"The Winner of The game is {self.PlayerStates[0].name}")
-
-        else:
-            self.next_round()
-
-    def next_player(self):
-        """
-        Switches the active player
-        """
-        for player in self.PlayerStates:
-            if player.active:
-                player.set_active(False)
-            else:
-                player.set_active(True)
-
-    def next_round(self):
-        """
-        Resets the pot and player bets. Sets the new starting player as active. Makes sure that the new starting has
-        cards face up.
-        """
-        self.signal_endround.emit()
-        self.pot = 0
-        self.deck = StandardDeck()
-        self.deck.shuffle()
-        self.tablestate.tablecards.clear_all_cards()
-        self.tablestate.data_changed.emit()
-        for player in self.PlayerStates:
-            player.reset_bet()
-            player.hand.clear_all_cards()
-            player.hand.add_card(self.deck.draw())
-            player.hand.add_card(self.deck.draw())
-            player.data_changed.emit()
-
-        # Check who started the last time.
-        for player in self.PlayerStates:
-            if player.started:
-                player.set_starter(False)
-                player.set_active(False)
-                player.hand.flipped_cards = True
-
-            else:
-                player.set_starter(True)
-                player.set_active(True)
-                player.hand.flipped_cards = False
-        self.PlayerStates[0].data_changed.emit()
-        self.PlayerStates[1].data_changed.emit()
-        self.data_changed.emit()
+        with self.batch:
+            GameEngine.call(self)
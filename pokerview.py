@@ -5,13 +5,10 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtSvg import *
 from PyQt5.QtWidgets import *
-import sys
+import time
 from pokermodel import *
 
 
-app = QApplication(sys.argv)
-
-
 class TableScene(QGraphicsScene):
     """ A scene with a table cloth background """
     def __init__(self):
@@ -20,34 +17,165 @@ class TableScene(QGraphicsScene):
         # self.setBackgroundBrush(QBrush(self.tile))
 
 
-class CardItem(QGraphicsSvgItem):
-    """ A simple overloaded QGraphicsSvgItem that also stores the card position """
-    def __init__(self, renderer, position):
+class TableBackground(QWidget):
+    """
+    A widget painting the table cloth behind its children. The tiled image is drawn into a pixmap of the size of the
+    widget once per size, so a repaint only copies the pixmap. The children are drawn over it without an image of
+    their own, unlike a background-image style sheet that cascades to every child widget.
+    """
+    tile = None  # The table cloth image, read when the first background is painted.
+
+    def __init__(self):
         super().__init__()
-        self.setSharedRenderer(renderer)
+        self.background = None
+        self.background_size = None
+
+    def paintEvent(self, event):
+        ratio = self.devicePixelRatioF()
+        size = (self.width(), self.height(), ratio)
+        if size != self.background_size:
+            if TableBackground.tile is None:
+                TableBackground.tile = QPixmap('cards/table.png')
+            self.background = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+            self.background.setDevicePixelRatio(ratio)
+            painter = QPainter(self.background)
+            painter.drawTiledPixmap(self.rect(), self.tile)
+            painter.end()
+            self.background_size = size
+        # The painter is clipped to the region that needs a repaint, so only that part is copied.
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.background)
+        painter.end()
+
+
+class CardItem(QGraphicsPixmapItem):
+    """ A QGraphicsPixmapItem showing a pre-rendered card image that also stores the card position and image key """
+    def __init__(self, key, position):
+        super().__init__()
+        self.setTransformationMode(Qt.SmoothTransformation)
+        self.key = key
         self.position = position
 
 
-def read_cards():
+class CardPixmapCache:
+    """
+    A cache of card images rasterised at the size they are shown at. Every SVG is rendered once per pixel size and
+    device pixel ratio, instead of on every repaint. The views tell which sizes they use, and the images of a size are
+    dropped when no view shows cards at that size anymore, for example after a resize.
+    """
+    def __init__(self):
+        self.pixmaps = {}
+        self.users = {}
+
+    def acquire(self, size):
+        """
+        Registers a view showing cards at a size, given as (width, height, device pixel ratio).
+        """
+        self.users[size] = self.users.get(size, 0) + 1
+
+    def release(self, size):
+        """
+        Unregisters a view from a size and drops the images of the size if no other view uses it.
+        """
+        self.users[size] -= 1
+        if not self.users[size]:
+            del self.users[size]
+            for key in [key for key in self.pixmaps if key[1:] == size]:
+                del self.pixmaps[key]
+
+    def pixmap(self, key, renderer, size):
+        """
+        Returns the image of a card at a size, rendering it from the SVG the first time.
+        """
+        pixmap = self.pixmaps.get((key,) + size)
+        if pixmap is None:
+            width, height, ratio = size
+            pixmap = QPixmap(round(width * ratio), round(height * ratio))
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            renderer.render(painter)
+            painter.end()
+            pixmap.setDevicePixelRatio(ratio)
+            self.pixmaps[(key,) + size] = pixmap
+        return pixmap
+
+
+def card_files():
     """
-    Reads all the 52 cards from files.
-    :return: Dictionary of SVG renderers
+    Lists the SVG files of the card images.
+    :return: Dictionary of file names by image key, (value, suit) for the 52 cards and 'back' for the back side
     """
-    all_cards = dict()  # Dictionaries let us have convenient mappings between cards and their images
+    files = {'back': 'cards/Red_Back_2.svg'}
     for suit_file, suit in zip('HSCD', range(1, 5)):  # Check the order of the suits here!!!
         for value_file, value in zip(['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A'], range(2, 15)):
-            file = value_file + suit_file
-            key = (value, suit)  # I'm choosing this tuple to be the key for this dictionary
-            all_cards[key] = QSvgRenderer('cards/' + file + '.svg')
-    return all_cards
+            files[(value, suit)] = 'cards/' + value_file + suit_file + '.svg'
+    return files
+
+
+class CardArt(QObject):
+    """
+    The SVG renderers of the card images, which are only parsed when they are needed. Parsing all 53 files takes a
+    noticeable part of the start up, so it is not done at import. A renderer is parsed the first time a card is
+    shown, and preload parses the rest a file at a time while the event loop is idle, for example while the setup
+    window is shown, so the first deal does not wait for them.
+    """
+    loaded = pyqtSignal()  #: Emitted when the last card image is parsed.
+
+    def __init__(self):
+        super().__init__()
+        self.files = card_files()
+        self.renderers = {}
+        self.pending = []
+        self.timer = None
+        self.loaded_at = None
+
+    def renderer(self, key):
+        """
+        Returns the renderer of a card image, parsing the SVG file the first time.
+        """
+        renderer = self.renderers.get(key)
+        if renderer is None:
+            renderer = self.renderers[key] = QSvgRenderer(self.files[key])
+            if len(self.renderers) == len(self.files):
+                self.loaded_at = time.perf_counter()
+                self.loaded.emit()
+        return renderer
+
+    def default_size(self):
+        """
+        Returns the size of the card images in the SVG files.
+        """
+        return self.renderer('back').defaultSize()
+
+    def preload(self):
+        """
+        Starts parsing the remaining card images in the background of the event loop. Needs a running QApplication.
+        """
+        if self.timer is None:
+            self.pending = [key for key in self.files if key not in self.renderers]
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.load_next)
+            self.timer.start(0)
+
+    def load_next(self):
+        """
+        Parses the next pending card image, and stops the preloading when all are parsed.
+        """
+        while self.pending and self.pending[-1] in self.renderers:
+            self.pending.pop()
+        if self.pending:
+            self.renderer(self.pending.pop())
+        else:
+            self.timer.stop()
 
 
 class CardView(QGraphicsView):
     """ A View widget that represents the table area displaying a players cards. """
 
-    # We read all the card graphics as static class variables
-    back_card = QSvgRenderer('cards/Red_Back_2.svg')
-    all_cards = read_cards()
+    # The card graphics are shared by all views and only read when they are first needed.
+    art = CardArt()
+    # The rendered card images are shared by all views.
+    pixmaps = CardPixmapCache()
 
     def __init__(self, card_model: CardModel, card_spacing: int = 250, padding: int = 10):
         """
@@ -58,9 +186,13 @@ class CardView(QGraphicsView):
         """
         self.scene = TableScene()
         super().__init__(self.scene)
+        # Let the table background show through behind the cards.
+        self.viewport().setAutoFillBackground(False)
 
         self.card_spacing = card_spacing
         self.padding = padding
+        self.pixmap_size = None
+        self.card_items = []  # The items of the cards by position, kept between rounds.
 
         self.model = card_model
         # Whenever the this window should update, it should call the "change_cards" method.
@@ -74,28 +206,51 @@ class CardView(QGraphicsView):
         self.change_cards()
 
     def change_cards(self):
-        # Add the cards from scratch
-        self.scene.clear()
+        # Reconcile the items with the model: only the cards that changed get a new image, new cards get a new item
+        # and the items of cards that are gone are hidden to be reused by the next round.
+        shown = 0
         for i, card in enumerate(self.model):
+            shown += 1
             # The ID of the card in the dictionary of images is a tuple with (value, suit), both integers
-            graphics_key = (card.get_value(), card.suit.value)
-            renderer = self.back_card if self.model.flipped() else self.all_cards[graphics_key]
-            c = CardItem(renderer, i)
-
-            # Shadow effects are cool!
-            shadow = QGraphicsDropShadowEffect(c)
-            shadow.setBlurRadius(10.)
-            shadow.setOffset(5, 5)
-            shadow.setColor(QColor(0, 0, 0, 180))  # Semi-transparent black!
-            c.setGraphicsEffect(shadow)
-
-            # Place the cards on the default positions
-            c.setPos(c.position * self.card_spacing, 0)
-            # We could also do cool things like marking card by making them transparent if we wanted to!
-            # c.setOpacity(0.5 if self.model.marked(i) else 1.0)
-            self.scene.addItem(c)
-
-        self.update_view()
+            graphics_key = 'back' if self.model.flipped() else (card.get_value(), card.suit.value)
+            if i < len(self.card_items):
+                c = self.card_items[i]
+                c.setVisible(True)
+                if c.key == graphics_key:
+                    continue
+                c.key = graphics_key
+            else:
+                c = CardItem(graphics_key, i)
+
+                # Shadow effects are cool!
+                shadow = QGraphicsDropShadowEffect()
+                shadow.setBlurRadius(10.)
+                shadow.setOffset(5, 5)
+                shadow.setColor(QColor(0, 0, 0, 180))  # Semi-transparent black!
+                c.setGraphicsEffect(shadow)
+
+                # Place the cards on the default positions
+                c.setPos(c.position * self.card_spacing, 0)
+                # We could also do cool things like marking card by making them transparent if we wanted to!
+                # c.setOpacity(0.5 if self.model.marked(i) else 1.0)
+                self.scene.addItem(c)
+                self.card_items.append(c)
+            self.set_card_image(c)
+
+        for c in self.card_items[shown:]:
+            c.setVisible(False)
+
+        if self.pixmap_size is None:
+            self.update_view()
+
+    def set_card_image(self, item):
+        """
+        Gives a card item the image of its card at the size the cards are shown at.
+        """
+        if self.pixmap_size is not None:
+            renderer = self.art.renderer(item.key)
+            item.setPixmap(self.pixmaps.pixmap(item.key, renderer, self.pixmap_size))
+            item.setScale(self.art.default_size().height() / self.pixmap_size[1])
 
     def update_view(self):
         scale = (self.viewport().height()-2*self.padding)/313
@@ -105,6 +260,19 @@ class CardView(QGraphicsView):
         self.setSceneRect(-self.padding//scale, -self.padding//scale,
                           self.viewport().width()//scale, self.viewport().height()//scale)
 
+        # Show the cards as images rendered at the size they have on the screen, which are scaled back to the size of
+        # the card in the scene so the view scale does not resample them.
+        card_size = self.art.default_size()
+        size = (max(1, round(card_size.width() * scale)), max(1, round(card_size.height() * scale)),
+                self.devicePixelRatioF())
+        if size != self.pixmap_size:
+            self.pixmaps.acquire(size)
+            if self.pixmap_size is not None:
+                self.pixmaps.release(self.pixmap_size)
+            self.pixmap_size = size
+            for item in self.card_items:
+                self.set_card_image(item)
+
     def resizeEvent(self, painter):
         # This method is called when the window is resized.
         # If the widget is resize, we gotta adjust the card sizes.
@@ -137,8 +305,8 @@ class DisplayBox(QLineEdit):
         self.setText(f'{self.label}')
         self.setReadOnly(True)
         self.setAlignment(Qt.AlignCenter)
-        self.setStyleSheet("padding: 3px 0px;")
-        screen = app.primaryScreen()
+        self.setStyleSheet("padding: 3px 0px; background: transparent;")
+        screen = QApplication.primaryScreen()
         self.setFixedWidth(int(screen.size().width() * 0.05))
 
 
@@ -148,8 +316,8 @@ class EditBox(QLineEdit):
     """
     def __init__(self):
         super().__init__()
-        self.setStyleSheet("padding: 3px 0px;")
-        screen = app.primaryScreen()
+        self.setStyleSheet("padding: 3px 0px; background: transparent;")
+        screen = QApplication.primaryScreen()
         self.setFixedWidth(int(screen.size().width() * 0.05))
 
 
@@ -166,7 +334,7 @@ class PlayerView(QHBoxLayout):
         box = QHBoxLayout()
         box.addWidget(self.card_view)
         player_card = QWidget()
-        screen = app.primaryScreen()
+        screen = QApplication.primaryScreen()
         player_card.setFixedSize(int(screen.size().width() * 0.246), int(screen.size().height() * 0.3))
         player_card.setLayout(box)
 
@@ -175,16 +343,22 @@ class PlayerView(QHBoxLayout):
 
         self.player_name = DisplayBox(f'{self.game.PlayerStates[self.player_number].name}')
         self.player_name.setFont(QFont('Felix Titling'))
-        self.player_name.setStyleSheet('padding: 3px 0px; font-weight: bold')
+        self.player_name.setStyleSheet('padding: 3px 0px; background: transparent; font-weight: bold')
         self.money_box = DisplayBox(f'Money: {self.game.PlayerStates[self.player_number].money}')
         self.blind_box = DisplayBox(f'{self.game.PlayerStates[self.player_number].bet}-blind')
         self.bet_box = DisplayBox(f'Bet: {self.game.PlayerStates[self.player_number].bet}')
+        self.outs_box = DisplayBox('Outs: -')
+        # The engine only counts the outs while a view shows them.
+        if not self.game.track_outs:
+            self.game.track_outs = True
+            self.game.update_outs()
         self.flip_button = QPushButton('Flip cards')
         self.flip_button.clicked.connect(lambda x, checked=True: hand.flip())
 
         player_information.addWidget(self.player_name)
         player_information.addWidget(self.money_box)
         player_information.addWidget(self.bet_box)
+        player_information.addWidget(self.outs_box)
         player_information.addWidget(self.flip_button)
 
         self.addWidget(player_card)
@@ -199,6 +373,11 @@ class PlayerView(QHBoxLayout):
         self.card_view.change_cards()
         self.money_box.setText(f'Money: {self.game.PlayerStates[self.player_number].money}')
         self.bet_box.setText(f'Bet: {self.game.PlayerStates[self.player_number].bet}')
+        player = self.game.PlayerStates[self.player_number]
+        if 3 <= len(self.game.tablestate.tablecards.cards) <= 4:
+            self.outs_box.setText(f'Outs: {len(player.outs)} ({player.out_probability:.0%} by the river)')
+        else:
+            self.outs_box.setText('Outs: -')
 
 
 class PotInformation(QVBoxLayout):
@@ -236,7 +415,7 @@ class TableView(QWidget):
         self.card_view = CardView(hand)
         box = QHBoxLayout()
         box.addWidget(self.card_view)
-        screen = app.primaryScreen()
+        screen = QApplication.primaryScreen()
         self.setFixedSize(int(screen.size().width() * 0.6), int(screen.size().height() * 0.3))
         self.setLayout(box)
 
@@ -257,7 +436,7 @@ class ActionsView(QHBoxLayout):
         super().__init__()
         self.GameModel = GameModel
         self.raise_amount = EditBox()
-        self.raise_amount.setValidator(QIntValidator(0, 10000000000))
+        self.raise_amount.setValidator(QIntValidator(0, 2 ** 31 - 1))
         self.check_call_button = QPushButton('Check/Call')
         self.check_call_button.clicked.connect(self.call_check)
         self.fold_button = QPushButton('Fold')
@@ -317,7 +496,7 @@ class HeaderView(QVBoxLayout):
         header.setFrameStyle(QFrame.Panel | QFrame.Raised)
         header.setFont(QFont('Comic Sans MS', 40)) # Chiller - typsnitt
         header.setAlignment(Qt.AlignCenter)
-        screen = app.primaryScreen()
+        screen = QApplication.primaryScreen()
         header.setFixedSize(int(screen.size().width() * 0.75), int(screen.size().height() * 0.1))
         self.setAlignment(Qt.AlignCenter)
         self.addWidget(header)
@@ -341,7 +520,7 @@ class InformationView(QVBoxLayout):
         self.text.setFrameStyle(QFrame.Panel | QFrame.Raised)
         self.text.setFont(QFont('Constantia', 10))
         self.text.setAlignment(Qt.AlignCenter)
-        screen = app.primaryScreen()
+        screen = QApplication.primaryScreen()
         self.text.setFixedSize(int(screen.size().width() * 0.15), int(screen.size().height() * 0.1))
         self.text.setWordWrap(True)
         self.setAlignment(Qt.AlignCenter)
@@ -408,13 +587,14 @@ class InformationView(QVBoxLayout):
     def end_game(self, text):
         """
         A method that shows a message box upon the end of the game. Waits for the user to press ok to quit the application.
+        The application quits when the event loop is back, so the other observers of the game still see the end of it.
         """
         end_box = QMessageBox()
         end_box.setWindowTitle('Game finished')
 
         end_box.setText(text)
         end_box.exec()
-        quit()
+        QApplication.quit()
 
 
 class LabelAndBox(QVBoxLayout):
@@ -443,9 +623,9 @@ class SetupView(QVBoxLayout):
         self.lbl_box_3 = LabelAndBox('Stake:')
         self.lbl_box_4 = LabelAndBox('Small-blind:')
         self.lbl_box_5 = LabelAndBox('Big-blind:')
-        self.lbl_box_3.enter_info.setValidator(QIntValidator(0, 10000000000))
-        self.lbl_box_4.enter_info.setValidator(QIntValidator(0, 10000000000))
-        self.lbl_box_5.enter_info.setValidator(QIntValidator(0, 10000000000))
+        self.lbl_box_3.enter_info.setValidator(QIntValidator(0, 2 ** 31 - 1))
+        self.lbl_box_4.enter_info.setValidator(QIntValidator(0, 2 ** 31 - 1))
+        self.lbl_box_5.enter_info.setValidator(QIntValidator(0, 2 ** 31 - 1))
         self.addLayout(self.lbl_box_1)
         self.addStretch(1)
         self.addLayout(self.lbl_box_2)
@@ -461,7 +641,8 @@ class SetupView(QVBoxLayout):
 
     def get_text(self):
         """
-        A method that returns the information in the text boxes.
+        A method that returns the information in the text boxes: the names of the players followed by the stake, as
+        GameModel.start_game takes them.
         """
         if self.lbl_box_1.enter_info.text() == '':
             self.lbl_box_1.enter_info.setText('Player 1')
@@ -476,7 +657,8 @@ class SetupView(QVBoxLayout):
         # if self.lbl_box_5.enter_info.text() == '':
         #     self.lbl_box_5.enter_info.setText('20')
 
-        return self.lbl_box_1.enter_info.text(), self.lbl_box_2.enter_info.text(), self.lbl_box_3.enter_info.text(), self.lbl_box_4.enter_info.text(), self.lbl_box_5.enter_info.text()
+        # The blinds are not part of the game yet, so their boxes are left out until they are.
+        return self.lbl_box_1.enter_info.text(), self.lbl_box_2.enter_info.text(), self.lbl_box_3.enter_info.text()
 
 
 class SetupWindow(QMainWindow):
@@ -487,20 +669,22 @@ class SetupWindow(QMainWindow):
         super().__init__()
         self.GameModel = GameModel
         self.setWindowTitle("Setup: Texas Hold'em")
-        self.setStyleSheet('background-image: url(cards/table.png);')
 
         self.layout = SetupView()
         self.button = QPushButton("Confirm")
         self.button.setDefault(True)
         self.button.clicked.connect(self.proceed_to_main)
         self.layout.addWidget(self.button, alignment=Qt.AlignCenter)
-        screen = app.primaryScreen()
+        screen = QApplication.primaryScreen()
         self.button.setFixedWidth(int(screen.size().width() * 0.05))
 
-        test_widget = QWidget()
+        test_widget = TableBackground()
         test_widget.setLayout(self.layout)
         self.setCentralWidget(test_widget)
 
+        # Read the card images while the players fill in the setup.
+        CardView.art.preload()
+
     def proceed_to_main(self):
         """
         A method that closes the window and proceeds to the main game.
@@ -519,7 +703,6 @@ class MainGameWindow(QMainWindow):
         super().__init__()
 
         self.setWindowTitle("Texas Hold'em")
-        self.setStyleSheet('background-image: url(cards/table.png);')
         self.move(100, 50)
 
         # Lower row
@@ -562,7 +745,7 @@ class MainGameWindow(QMainWindow):
         main_vertical.addStretch(1)
         main_vertical.addLayout(h_layout)
 
-        widget = QWidget()
+        widget = TableBackground()
         widget.setLayout(main_vertical)
         self.setCentralWidget(widget)
 
@@ -0,0 +1,292 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+A precomputed table of the all-in preflop equity of every heads-up matchup, so preflop queries are table lookups.
+
+Two hands are the same matchup when one can be turned into the other by renaming the suits. The table holds every
+such matchup, indexed by the starting hand class of the player (one of the 169 classes such as 'AA', 'AKs' or 'AKo')
+and the values and suits of the opponent relative to the suits of the player. It also holds the average equity of
+every class against every class.
+
+The win and tie probabilities of a matchup are estimated from the boards dealt to the class of the player. The
+reverse matchup, with the opponent as the player, is estimated from other boards dealt to the class of the opponent.
+The two are independent samples, so equity(a, b) and equity(b, a) do not add up to exactly one.
+
+Build the table with ``python preflop.py --workers 8``. The build deals millions of boards and takes around 25
+CPU-minutes, so loading never builds it: load_preflop_table raises an error that tells how to build a missing table.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from itertools import combinations
+import argparse
+import mmap
+import os
+import struct
+import sys
+from cardlib import *
+
+
+MAGIC = b'PKPF'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')  #: Magic, version, reserved and the number of boards dealt per class.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.bin')
+
+RANKS = '23456789TJQKA'
+# The 169 starting hand classes from AA down to 32o, with the pairs before the suited and offsuit hands of a value.
+CLASSES = [RANKS[high] + RANKS[low] + ('' if high == low else suited)
+           for high in range(12, -1, -1) for low in range(high, -1, -1) for suited in ('s', 'o')
+           if high != low or suited == 's']
+CLASS_INDEX = {name: i for i, name in enumerate(CLASSES)}
+# The class of two hole cards by (high value * 13 + low value) * 2 + 1 if suited, with values from 0 for a two.
+_CLASS_OF = [CLASS_INDEX.get(RANKS[i // 26] + RANKS[i // 2 % 13] + 'os'[i % 2], CLASS_INDEX.get(RANKS[i // 26] * 2))
+             for i in range(13 * 13 * 2)]
+
+# The opponent hand of a matchup is stored by its two values, high first, and the labels of its suits. The suits of
+# the player are labelled 0 and 0 or 1, the opponent suits get the same label or the next free one.
+_VILLAIN_SLOTS = 13 * 13 * 3 * 4
+_SCALE = 65535  #: Probabilities are stored as fractions of this number.
+
+
+def hand_class(hole):
+    """A function returning the starting hand class of two hole cards.
+
+        :param hole: The two hole cards, or their codes.
+        :type hole: list of PlayingCard
+        :return: The index of the class in CLASSES.
+        :rtype: int
+            """
+    a, b = (card if isinstance(card, int) else card.code for card in hole)
+    return _CLASS_OF[(max(a, b) >> 2) * 26 + (min(a, b) >> 2) * 2 + (a & 3 == b & 3)]
+
+
+def _ordered(a, b):
+    """Returns the orders of two cards with the higher value first. Both orders are returned for a pair, since the
+    suits of a pair can be swapped.
+    """
+    if a >> 2 == b >> 2:
+        return (a, b), (b, a)
+    return ((a, b),) if a > b else ((b, a),)
+
+
+def matchup_slot(hero, villain):
+    """A function returning the position of a matchup in the table, which is the same for all matchups that only
+    differ in the names of the suits.
+
+        :param hero: The codes of the two hole cards of the player.
+        :type hero: tuple of int
+        :param villain: The codes of the two hole cards of the opponent.
+        :type villain: tuple of int
+        :return: The position of the matchup.
+        :rtype: int
+            """
+    best = None
+    for a1, a2 in _ordered(*hero):
+        for b1, b2 in _ordered(*villain):
+            labels = {a1 & 3: 0}
+            labels.setdefault(a2 & 3, 1)
+            s1 = labels.setdefault(b1 & 3, len(labels))
+            s2 = labels.setdefault(b2 & 3, len(labels))
+            slot = (((b1 >> 2) * 13 + (b2 >> 2)) * 3 + s1) * 4 + s2
+            if best is None or slot < best:
+                best = slot
+    return hand_class(hero) * _VILLAIN_SLOTS + best
+
+
+def _class_cards(index):
+    """Returns the codes of the hole cards of a class with the suits 0 and 0 or 1.
+    """
+    name = CLASSES[index]
+    high, low = RANKS.index(name[0]), RANKS.index(name[1])
+    return 4 * high, 4 * low + (0 if name.endswith('s') else 1)
+
+
+def _class_counts(index, boards, seed):
+    """Deals random boards to the player hand of a class and plays it against every opponent hand on every board.
+    Runs in a worker process.
+
+        :param index: The class of the player.
+        :type index: int
+        :param boards: The number of boards to deal.
+        :type boards: int
+        :param seed: The seed sequence of the boards.
+        :type seed: SeedSequence
+        :return: The wins, ties and samples of every opponent slot of the class.
+        :rtype: tuple of list of int
+            """
+    hero = _class_cards(index)
+    hero_key = card_eval_key(hero[0]) + card_eval_key(hero[1])
+    villains = []
+    for villain in combinations([code for code in range(52) if code not in hero], 2):
+        villains.append(((1 << villain[0]) | (1 << villain[1]), card_eval_key(villain[0]) + card_eval_key(villain[1]),
+                         villain, matchup_slot(hero, villain) - index * _VILLAIN_SLOTS))
+
+    wins = [0] * _VILLAIN_SLOTS
+    ties = [0] * _VILLAIN_SLOTS
+    samples = [0] * _VILLAIN_SLOTS
+    for board in sample_deals(seed.generator(), boards, 5, hero):
+        board = tuple(board)
+        board_key = sum(map(card_eval_key, board))
+        board_mask = cards_to_mask(board)
+        hero_rank = rank_packed(board_key + hero_key, board + hero)
+        for mask, key, villain, slot in villains:
+            if mask & board_mask:
+                continue
+            villain_rank = rank_packed(board_key + key, board + villain)
+            samples[slot] += 1
+            if hero_rank > villain_rank:
+                wins[slot] += 1
+            elif hero_rank == villain_rank:
+                ties[slot] += 1
+    return wins, ties, samples
+
+
+def build_preflop_table(path=DEFAULT_PATH, boards=10000, workers=None, seed=0):
+    """A function that estimates the equity of every matchup and writes the table. Every class of the player is
+    one task for the pool of worker processes. Every board that is dealt to the player is played against all
+    opponent hands at once, which gives every matchup thousands of samples from a few thousand boards.
+
+        :param path: The file to write.
+        :type path: str
+        :param boards: The number of boards dealt to every class of the player.
+        :type boards: int
+        :param workers: The number of worker processes, defaults to the number of CPUs. 1 builds in this process.
+        :type workers: int
+        :param seed: The root seed of the boards.
+        :type seed: int
+            """
+    root = SeedSequence(seed)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_class_counts(index, boards, root.child(index)) for index in range(len(CLASSES))]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_class_counts, range(len(CLASSES)), [boards] * len(CLASSES),
+                                    [root.child(index) for index in range(len(CLASSES))]))
+
+    matchups = array('H', bytes(4 * len(CLASSES) * _VILLAIN_SLOTS))
+    classes = array('H', bytes(4 * len(CLASSES) ** 2))
+    for index, (wins, ties, samples) in enumerate(results):
+        class_counts = [[0, 0, 0] for _ in CLASSES]
+        for slot in range(_VILLAIN_SLOTS):
+            if samples[slot]:
+                position = 2 * (index * _VILLAIN_SLOTS + slot)
+                matchups[position] = round(wins[slot] / samples[slot] * _SCALE)
+                matchups[position + 1] = round(ties[slot] / samples[slot] * _SCALE)
+
+                high, low, s1, s2 = slot // 156, slot // 12 % 13, slot // 4 % 3, slot % 4
+                counts = class_counts[hand_class((4 * high + s1, 4 * low + s2))]
+                counts[0] += wins[slot]
+                counts[1] += ties[slot]
+                counts[2] += samples[slot]
+        for other, (win, tie, total) in enumerate(class_counts):
+            # With few boards, every hand of a class can be blocked by the boards, which leaves it without samples.
+            if total:
+                classes[2 * (index * len(CLASSES) + other)] = round(win / total * _SCALE)
+                classes[2 * (index * len(CLASSES) + other) + 1] = round(tie / total * _SCALE)
+
+    if sys.byteorder == 'big':
+        matchups.byteswap()
+        classes.byteswap()
+    # Write to a temporary file first, so a reader never maps a half written table.
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, boards))
+        f.write(matchups.tobytes())
+        f.write(classes.tobytes())
+    os.replace(path + '.tmp', path)
+
+
+class PreflopTable:
+    """A class that looks up preflop equities in a table file. The file is memory-mapped, so loading it only reads
+    the header and the pages of the table are read by the operating system when they are first used.
+
+        :param path: The table file written by build_preflop_table.
+        :type path: str
+            """
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.boards = HEADER.unpack_from(self.map)
+        size = HEADER.size + 4 * len(CLASSES) * (_VILLAIN_SLOTS + len(CLASSES))
+        if magic != MAGIC or version != VERSION or len(self.map) != size:
+            self.map.close()
+            raise ValueError(f'{path} is not a preflop equity table of version {VERSION}.')
+
+        self.values = None
+        if sys.byteorder == 'big':
+            values = array('H', self.map[HEADER.size:])
+            values.byteswap()
+        else:
+            values = self.values = memoryview(self.map)[HEADER.size:].cast('H')
+        self.matchups = values[:2 * len(CLASSES) * _VILLAIN_SLOTS]
+        self.classes = values[2 * len(CLASSES) * _VILLAIN_SLOTS:]
+
+    def equity(self, hero, villain):
+        """A method returning the probabilities that the player wins and ties when both players are all in preflop.
+
+            :param hero: The two hole cards of the player, or their codes.
+            :type hero: list of PlayingCard
+            :param villain: The two hole cards of the opponent, or their codes.
+            :type villain: list of PlayingCard
+            :return: The probabilities to win and to tie.
+            :rtype: tuple of float
+                """
+        hero = tuple(card if isinstance(card, int) else card.code for card in hero)
+        villain = tuple(card if isinstance(card, int) else card.code for card in villain)
+        if len(hero) != 2 or len(villain) != 2 or len(set(hero + villain)) != 4:
+            raise ValueError('Both players need two hole cards and no card can be dealt twice.')
+        position = 2 * matchup_slot(hero, villain)
+        return self.matchups[position] / _SCALE, self.matchups[position + 1] / _SCALE
+
+    def class_equity(self, hero, villain):
+        """A method returning the average probabilities that a class wins and ties against another class, over all
+        hands of the classes that do not share a card.
+
+            :param hero: The class of the player, such as 'AKs'.
+            :type hero: str
+            :param villain: The class of the opponent.
+            :type villain: str
+            :return: The probabilities to win and to tie.
+            :rtype: tuple of float
+                """
+        position = 2 * (CLASS_INDEX[hero] * len(CLASSES) + CLASS_INDEX[villain])
+        return self.classes[position] / _SCALE, self.classes[position + 1] / _SCALE
+
+    def close(self):
+        """Releases the memory map.
+        """
+        if self.values is not None:
+            self.matchups.release()
+            self.classes.release()
+            self.values.release()
+        self.map.close()
+
+
+def load_preflop_table(path=DEFAULT_PATH):
+    """A function that opens the preflop table. Raises FileNotFoundError with the build command if the table has not
+    been built.
+
+        :param path: The table file.
+        :type path: str
+        :return: The table.
+        :rtype: PreflopTable
+            """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'There is no preflop table at {path}. Build it with '
+                                f'"python preflop.py --output {path} --workers {os.cpu_count() or 1}".')
+    return PreflopTable(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Builds the table of preflop equities of all heads-up matchups.')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='the file to write')
+    parser.add_argument('--boards', type=int, default=10000, help='the number of boards dealt to every class')
+    parser.add_argument('--workers', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='the root seed of the boards')
+    args = parser.parse_args(argv)
+    build_preflop_table(args.output, args.boards, args.workers, args.seed)
+
+
+if __name__ == '__main__':
+    main()
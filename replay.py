@@ -0,0 +1,268 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+Replays hand-history logs written by HandHistoryWriter through the GameEngine rules, without any user interface, and
+checks that the pots, stacks and winners are the same as recorded.
+
+Run from the command line with for example ``python replay.py hand_history/*.phh``, or rebuild the state of one hand
+with ``python replay.py hand_history/hands-00000.phh --hand 12 --actions 3``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import argparse
+import mmap
+import os
+import sys
+import warnings
+from pokerengine import *
+from handhistory import *
+
+
+class HandHistory:
+    """A class that reads a hand-history log through a memory map. The hands are found through the index file of the
+    log, so any hand can be read without scanning the file. If the index file is missing, it is rebuilt from the
+    kinds of the records.
+
+        :param path: The path of the log file.
+        :type path: str
+            """
+    def __init__(self, path):
+        self.path = path
+        # An empty file can not be mapped, and a file shorter than the header is not a log either.
+        if os.path.getsize(path) < FILE_HEADER.size:
+            raise ValueError(f'{path} is not a hand-history log of version {VERSION}.')
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size = FILE_HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.map.close()
+            raise ValueError(f'{path} is not a hand-history log of version {VERSION}.')
+        # A log that is still being written can end in the middle of a record.
+        self.records = (len(self.map) - FILE_HEADER.size) // RECORD.size
+        self.index = self._read_index()
+
+    def _read_index(self):
+        """Returns the record numbers of the HAND records.
+        """
+        index = array('Q')
+        try:
+            with open(index_path(self.path), 'rb') as f:
+                data = f.read()
+            index.frombytes(data[:len(data) - len(data) % index.itemsize])
+            if sys.byteorder == 'big':
+                index.byteswap()
+        except FileNotFoundError:
+            pass
+
+        # The records after the last indexed hand can be more hands whose index entries were not written yet.
+        start = index[-1] + 1 if index else 0
+        kinds = self.map[FILE_HEADER.size + start * RECORD.size:FILE_HEADER.size + self.records * RECORD.size:RECORD.size]
+        position = kinds.find(HAND)
+        while position >= 0:
+            index.append(start + position)
+            position = kinds.find(HAND, position + 1)
+        return index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        for n in range(len(self.index)):
+            yield self.hand(n)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def hand(self, n):
+        """A method returning the records of a hand.
+
+            :param n: The number of the hand in this file, starting at 0.
+            :type n: int
+            :return: The records as (kind, seat, card, extra, value) tuples.
+            :rtype: list of tuple
+                """
+        start = self.index[n]
+        stop = self.index[n + 1] if n + 1 < len(self.index) else self.records
+        data = self.map[FILE_HEADER.size + start * RECORD.size:FILE_HEADER.size + stop * RECORD.size]
+        return list(RECORD.iter_unpack(data))
+
+    def close(self):
+        """Closes the memory map.
+        """
+        self.map.close()
+
+
+def rebuild(records, actions=None):
+    """A function that sets up a GameEngine at the start of a recorded hand and replays its actions. The deck is
+    stacked so that the recorded table cards are dealt in the recorded order.
+
+        :param records: The records of one hand, starting with its HAND record.
+        :type records: list of tuple
+        :param actions: The number of actions to replay, or None for all of them.
+        :type actions: int
+        :return: The game after the replayed actions and the events it notified as (event, *args) tuples.
+        :rtype: tuple
+            """
+    kind, starter, players, _, rounds = records[0]
+    if kind != HAND:
+        raise ValueError('The records of a hand must start with a HAND record.')
+
+    game = GameEngine()
+    game.rounds = rounds
+    game.PlayerStates = [game.new_player(f'Seat {seat}', 0) for seat in range(players)]
+    board = []
+    for kind, seat, card, extra, value in records:
+        if kind == STACK:
+            game.PlayerStates[seat].money = value
+        elif kind == HOLE:
+            game.PlayerStates[seat].hand.add_card(card)
+        elif kind == BOARD:
+            board.append(card)
+    for seat, player in enumerate(game.PlayerStates):
+        player.started = seat == starter
+        # Players without hole cards had no money left and sit out the hand.
+        player.folded = not player.hand.cards
+    game.set_active_seat(starter)
+
+    # Draws take the last card of the deck, so the table cards go last in reverse order.
+    game.deck.cards = [CARDS[code] for code in range(52) if code not in board] + [CARDS[code] for code in board[::-1]]
+    game.deck.reset()
+
+    events = []
+    game.add_observer(lambda event, *args: events.append((event,) + args))
+    replayed = 0
+    for kind, seat, card, extra, value in records:
+        if kind not in KIND_ACTIONS:
+            continue
+        if actions is not None and replayed == actions:
+            break
+        if not game.PlayerStates[seat].active:
+            raise ValueError(f'Seat {seat} acts when it is not its turn.')
+        if kind == BET:
+            game.bet(value)
+        else:
+            getattr(game, KIND_ACTIONS[kind])()
+        replayed += 1
+    return game, events
+
+
+def check_hand(records):
+    """A function that replays a recorded hand and compares the outcome with the records.
+
+        :param records: The records of one hand, starting with its HAND record.
+        :type records: list of tuple
+        :return: The differences between the replay and the records, empty if there are none.
+        :rtype: list of str
+            """
+    try:
+        game, events = rebuild(records)
+    except (ValueError, IndexError) as e:
+        return [f'the replay failed: {e}']
+
+    problems = []
+    recorded_actions = [(seat, KIND_ACTIONS[kind], value) for kind, seat, card, extra, value in records
+                        if kind in KIND_ACTIONS]
+    replayed_actions = [tuple(args) for event, *args in events if event == 'action']
+    if replayed_actions != recorded_actions:
+        problems.append(f'actions {replayed_actions} were taken instead of {recorded_actions}')
+
+    # A log can end in the middle of a hand, which is only checked as far as it goes.
+    ends = [(seat, value) for kind, seat, card, extra, value in records if kind == END]
+    recorded_board = [card for kind, seat, card, extra, value in records if kind == BOARD]
+    replayed_board = [args[1] for event, *args in events if event == 'deal' and args[0] is None]
+    if replayed_board[:len(recorded_board) if not ends else None] != recorded_board:
+        problems.append(f'table cards {replayed_board} were dealt instead of {recorded_board}')
+
+    if ends:
+        recorded_results = [(seat, value, extra) for kind, seat, card, extra, value in records if kind == RESULT]
+        replayed_results = [tuple(args) for event, *args in events if event == 'result']
+        if replayed_results != recorded_results:
+            problems.append(f'the payouts {replayed_results} were made instead of {recorded_results}')
+        stacks = [(seat, player.money) for seat, player in enumerate(game.PlayerStates)]
+        if stacks != ends:
+            problems.append(f'the stacks are {stacks} instead of {ends}')
+    return problems
+
+
+def replay_file(path):
+    """A function that replays every hand of a log file. Runs in a worker process.
+
+        :param path: The path of the log file.
+        :type path: str
+        :return: The number of hands and the differences of every hand that did not match, by hand number.
+        :rtype: tuple
+            """
+    mismatches = {}
+    with HandHistory(path) as history:
+        for n, records in enumerate(history):
+            problems = check_hand(records)
+            if problems:
+                mismatches[n] = problems
+        return len(history), mismatches
+
+
+def replay_files(paths, workers=None):
+    """A generator that replays log files in a pool of worker processes, one file per task. A file that is not a
+    hand-history log is skipped with a warning.
+
+        :param paths: The paths of the log files.
+        :type paths: list of str
+        :param workers: The number of worker processes, defaults to the number of CPUs. 1 replays in this process.
+        :type workers: int
+        :return: The path, the number of hands and the mismatches of every log file, in the given order.
+        :rtype: iterator of tuple
+            """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            try:
+                yield (path,) + replay_file(path)
+            except ValueError as error:
+                warnings.warn(f'Skipped {error}')
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(replay_file, path) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                yield (path,) + future.result()
+            except ValueError as error:
+                warnings.warn(f'Skipped {error}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays hand-history logs and checks them against the rules.')
+    parser.add_argument('paths', nargs='+', help='the log files to replay')
+    parser.add_argument('--workers', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--hand', type=int, default=None, help='print the state of this hand of the first file')
+    parser.add_argument('--actions', type=int, default=None, help='the number of actions to replay with --hand')
+    args = parser.parse_args(argv)
+
+    if args.hand is not None:
+        with HandHistory(args.paths[0]) as history:
+            game, events = rebuild(history.hand(args.hand), args.actions)
+        print(f'Round {game.rounds}, pot {game.pot}, table {game.tablestate.tablecards.cards}')
+        for player in game.PlayerStates:
+            print(f'{player.name}: money {player.money}, bet {player.bet}, active {player.active}, '
+                  f'hand {player.hand.cards}')
+        return 0
+
+    total = failed = 0
+    for path, hands, mismatches in replay_files(args.paths, args.workers):
+        total += hands
+        failed += len(mismatches)
+        for n, problems in mismatches.items():
+            for problem in problems:
+                print(f'{path} hand {n}: {problem}')
+    print(f'Replayed {total} hands, {failed} did not match the records.')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,548 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+An asyncio server that hosts many heads-up tables in one process, each played with the GameEngine rules.
+
+The protocol is one JSON object per line in both directions. A client joins a seat with
+``{"op": "join", "table": 7, "name": "Felix"}`` and acts with ``{"op": "action", "table": 7, "seat": 0,
+"action": "bet", "amount": 20}``, where the action is one of 'call', 'bet', 'all_in' and 'fold'. The server answers
+with 'joined', 'event', 'rejected' and 'error' messages, and keeps the clients in sync with numbered 'keyframe' and
+'delta' messages from statesync. A client that misses an update asks for a keyframe with
+``{"op": "resync", "table": 7, "seat": 0}``. One connection can hold seats at many tables.
+
+Tables are sharded over worker processes by their number: shard i listens on port + i (or on the Unix socket
+path.i), and only hosts the tables with table % shards == i. Start a server with ``python server.py serve --shards 4``
+and play it with the test client, ``python server.py bots --tables 1000 --shards 4``.
+"""
+
+from multiprocessing import Process
+from types import SimpleNamespace
+import argparse
+import asyncio
+import json
+import random
+import time
+from pokerengine import *
+from simulator import RandomPolicy
+from statesync import *
+
+
+ACTIONS = ('call', 'bet', 'all_in', 'fold')
+
+
+def shard_for(table, shards):
+    """Returns the shard that hosts a table.
+    """
+    return table % shards
+
+
+def encode(message):
+    """Returns a message as a line of compact JSON.
+    """
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+class Connection:
+    """
+    A class representing a connected client, which can sit at several tables.
+
+    The messages to the client are collected and written together once per pass of the event loop, so a client with
+    seats at many tables gets one write, and one system call, for all the tables that changed in that pass. A client
+    that does not read its messages is dropped once the transport holds more than max_buffer bytes for it, instead
+    of buffering them without a limit.
+
+    :param writer: The stream to send the messages of the client to.
+    :type writer: asyncio.StreamWriter
+    """
+    max_buffer = 1 << 20  #: The most bytes waiting to be sent to a client before it is dropped.
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.seats = set()  # (table, seat) pairs
+        self.pending = []
+
+    def send(self, message):
+        """
+        Sends a message to the client. The message is written at the end of the current pass of the event loop.
+        """
+        self.send_encoded(encode(message))
+
+    def send_encoded(self, data):
+        """
+        Sends messages that are already encoded, such as the events that both seats of a table get.
+        """
+        if self.writer.is_closing():
+            return
+        if not self.pending:
+            asyncio.get_running_loop().call_soon(self.write_pending)
+        self.pending.append(data)
+
+    def write_pending(self):
+        """
+        Writes the collected messages, and closes the connection if the client is too far behind reading them.
+        """
+        data = b''.join(self.pending)
+        self.pending.clear()
+        if self.writer.is_closing():
+            return
+        self.writer.write(data)
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.writer.close()
+
+
+class ServerTable:
+    """
+    A class representing one table of the server: a GameEngine, the connections in its two seats and a queue of the
+    requests of the seats. The requests are applied one at a time by the task of the table, so the engine is never
+    used by two requests at once. A player that does not act within the idle timeout folds.
+
+    :param number: The number of the table.
+    :type number: int
+    :param stack: The money of both players at the start of a game.
+    :type stack: int
+    :param idle_timeout: The number of seconds a player has to act.
+    :type idle_timeout: float
+    :param seed: The seed sequence of the decks of the table.
+    :type seed: SeedSequence
+    """
+    def __init__(self, number, stack, idle_timeout, seed):
+        self.number = number
+        self.stack = stack
+        self.idle_timeout = idle_timeout
+        self.seed = seed
+        self.seats = [None, None]
+        self.names = ['', '']
+        self.engine = None
+        self.encoder = StateEncoder()
+        self.events = []
+        self.accepted = False
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    def join(self, connection, name):
+        """
+        Seats a connection at the first free seat and starts a game when both seats are taken.
+
+        :return: The seat, or None if the table is full.
+        :rtype: int
+        """
+        for seat in range(2):
+            if self.seats[seat] is None:
+                self.seats[seat] = connection
+                self.names[seat] = name or f'Seat {seat}'
+                connection.seats.add((self.number, seat))
+                connection.send({'type': 'joined', 'table': self.number, 'seat': seat})
+                if None not in self.seats:
+                    self.start()
+                return seat
+        return None
+
+    def start(self):
+        """
+        Starts a new game with a new engine, dealt from the next stream of the seed of the table.
+        """
+        self.engine = GameEngine(self.seed.spawn(1)[0].generator())
+        self.engine.add_observer(self.record_event)
+        self.engine.start_game((self.names[0], self.names[1], self.stack))
+        self.encoder.attach(self.engine)
+        self.flush()
+
+    def record_event(self, event, *args):
+        """
+        Collects the message events of the engine, which are sent to the players after the request.
+        """
+        if event == 'action':
+            self.accepted = True
+        elif event in ('bet', 'call', 'fold', 'all_in', 'winner', 'endround', 'endgame'):
+            self.events.append({'type': 'event', 'table': self.number, 'event': event,
+                                'message': args[0] if args else ''})
+
+    def keyframe(self, seat):
+        """
+        Returns the keyframe message of a seat, which only shows the hole cards of that seat.
+        """
+        return {'type': 'keyframe', 'table': self.number, 'seat': seat, 'seq': self.encoder.seq,
+                'state': self.encoder.keyframe(seat)}
+
+    def flush(self):
+        """
+        Sends the collected events and the changes of the state to both seats.
+        """
+        update = self.encoder.update() if self.engine is not None else None
+        # The events are the same for both seats, so they are encoded once.
+        events = b''.join(map(encode, self.events))
+        for seat, connection in enumerate(self.seats):
+            if connection is not None:
+                if events:
+                    connection.send_encoded(events)
+                if update is None:
+                    continue
+                kind, seq, ops = update
+                if kind == 'keyframe':
+                    connection.send(self.keyframe(seat))
+                else:
+                    connection.send({'type': 'delta', 'table': self.number, 'seat': seat, 'seq': seq,
+                                     'ops': visible_ops(ops, seat)})
+        self.events.clear()
+
+    def active_seat(self):
+        """
+        Returns the seat whose turn it is.
+        """
+        return self.engine.active_seat()
+
+    def apply(self, seat, request):
+        """
+        Applies one request of a seat to the engine.
+        """
+        if request['op'] == 'leave':
+            self.leave(seat)
+            return
+        connection = self.seats[seat]
+        if request['op'] == 'resync':
+            if self.engine is not None:
+                connection.send(self.keyframe(seat))
+            return
+        if self.engine is None or self.engine.endgame:
+            connection.send({'type': 'error', 'table': self.number, 'message': 'The game has not started.'})
+            return
+        if seat != self.active_seat():
+            connection.send({'type': 'error', 'table': self.number, 'message': 'It is not your turn.'})
+            return
+
+        action = request.get('action')
+        self.accepted = False
+        if action == 'bet':
+            try:
+                amount = int(request.get('amount', 0))
+            except (TypeError, ValueError):
+                connection.send({'type': 'error', 'table': self.number, 'message': 'The amount must be a number.'})
+                return
+            self.engine.bet(amount)
+        elif action in ACTIONS:
+            getattr(self.engine, action)()
+        else:
+            connection.send({'type': 'error', 'table': self.number, 'message': f'Unknown action {action!r}.'})
+            return
+
+        if not self.accepted:
+            # The rules turned the action down, the message of the engine tells why.
+            message = self.events.pop()['message'] if self.events else ''
+            connection.send({'type': 'rejected', 'table': self.number, 'seat': seat, 'message': message})
+        if self.engine.endgame:
+            # Play on with fresh stacks, so the table never needs to be set up again. The events of the last hand are
+            # sent together with the state of the new game.
+            self.start()
+        else:
+            self.flush()
+
+    def leave(self, seat):
+        """
+        Frees a seat. A running game is over and the other player waits for a new opponent.
+        """
+        connection = self.seats[seat]
+        if connection is None:
+            return
+        connection.seats.discard((self.number, seat))
+        self.seats[seat] = None
+        self.engine = None
+        self.encoder.detach()
+        for other in self.seats:
+            if other is not None:
+                other.send({'type': 'event', 'table': self.number, 'event': 'left',
+                            'message': f'{self.names[seat]} left the table.'})
+
+    def empty(self):
+        return self.seats == [None, None]
+
+    async def run(self):
+        """
+        The task of the table, which applies the requests in the order they arrive and folds for idle players. The time
+        to act starts when the turn passes to a seat and only starts over after an accepted action, so requests that
+        do not play, such as resyncs or actions of the other seat, do not keep a player from timing out.
+        """
+        loop = asyncio.get_running_loop()
+        turn = deadline = None
+        while not self.empty() or not self.queue.empty():
+            if self.engine is None:
+                turn = deadline = None
+            elif self.accepted or (self.engine, self.active_seat()) != turn:
+                turn = (self.engine, self.active_seat())
+                deadline = loop.time() + self.idle_timeout
+                self.accepted = False
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                seat, request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                seat = self.active_seat()
+                self.events.append({'type': 'event', 'table': self.number, 'event': 'timeout',
+                                    'message': f'{self.names[seat]} did not act in time.'})
+                request = {'op': 'action', 'action': 'fold'}
+            self.apply(seat, request)
+
+
+class GameServer:
+    """
+    A class hosting the tables of one shard.
+
+    :param shard: The index of this shard.
+    :type shard: int
+    :param shards: The number of shards.
+    :type shards: int
+    :param stack: The money of both players at the start of a game.
+    :type stack: int
+    :param idle_timeout: The number of seconds a player has to act.
+    :type idle_timeout: float
+    :param seed: The root seed of the decks of all tables.
+    :type seed: int
+    """
+    def __init__(self, shard=0, shards=1, stack=1000, idle_timeout=30.0, seed=None):
+        self.shard = shard
+        self.shards = shards
+        self.stack = stack
+        self.idle_timeout = idle_timeout
+        self.seed = SeedSequence(seed)
+        self.tables = {}
+
+    def table(self, number):
+        """
+        Returns a table, creating it and its task on the first join.
+        """
+        table = self.tables.get(number)
+        if table is None:
+            table = self.tables[number] = ServerTable(number, self.stack, self.idle_timeout, self.seed.child(number))
+        if table.task is None or table.task.done():
+            table.task = asyncio.get_running_loop().create_task(table.run())
+            table.task.add_done_callback(lambda task: self.close_table(table))
+        return table
+
+    def close_table(self, table):
+        """
+        Forgets a table whose task ended because both players left, so idle tables cost no memory.
+        """
+        if self.tables.get(table.number) is table and table.empty():
+            del self.tables[table.number]
+
+    async def handle(self, reader, writer):
+        """
+        Reads the requests of one connection and passes them on to the tables.
+        """
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    self.dispatch(connection, request)
+                except (ValueError, KeyError, TypeError) as e:
+                    connection.send({'type': 'error', 'message': f'Bad request: {e}'})
+        except ConnectionError:
+            pass
+        finally:
+            for number, seat in list(connection.seats):
+                self.tables[number].queue.put_nowait((seat, {'op': 'leave'}))
+            writer.close()
+
+    def dispatch(self, connection, request):
+        """
+        Handles one request of a connection.
+        """
+        number = int(request['table'])
+        if shard_for(number, self.shards) != self.shard:
+            connection.send({'type': 'error', 'table': number,
+                             'message': f'Table {number} is hosted by shard {shard_for(number, self.shards)}.'})
+            return
+
+        if request['op'] == 'join':
+            if self.table(number).join(connection, str(request.get('name', ''))) is None:
+                connection.send({'type': 'error', 'table': number, 'message': 'The table is full.'})
+            return
+
+        seat = int(request.get('seat', -1))
+        if (number, seat) not in connection.seats:
+            connection.send({'type': 'error', 'table': number, 'message': 'You do not sit in that seat.'})
+            return
+        if request['op'] in ('action', 'leave', 'resync'):
+            self.tables[number].queue.put_nowait((seat, request))
+        else:
+            connection.send({'type': 'error', 'table': number, 'message': f'Unknown op {request["op"]!r}.'})
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        """
+        Listens for connections until cancelled.
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, f'{unix_path}.{self.shard}')
+        else:
+            server = await asyncio.start_server(self.handle, host, port + self.shard)
+        async with server:
+            await server.serve_forever()
+
+
+def _run_shard(shard, shards, host, port, unix_path, stack, idle_timeout, seed):
+    """Runs one shard in a worker process.
+    """
+    server = GameServer(shard, shards, stack, idle_timeout, seed)
+    try:
+        asyncio.run(server.serve(host, port, unix_path))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(host='127.0.0.1', port=8765, shards=1, unix_path=None, stack=1000, idle_timeout=30.0, seed=None):
+    """A function that runs the server, with one worker process per shard when there is more than one.
+
+        :param host: The address to listen on.
+        :type host: str
+        :param port: The port of shard 0, shard i listens on port + i.
+        :type port: int
+        :param shards: The number of shards.
+        :type shards: int
+        :param unix_path: The start of the Unix socket paths, to listen on Unix sockets instead of TCP.
+        :type unix_path: str
+        :param stack: The money of both players at the start of a game.
+        :type stack: int
+        :param idle_timeout: The number of seconds a player has to act.
+        :type idle_timeout: float
+        :param seed: The root seed of the decks, shared by all shards.
+        :type seed: int
+            """
+    seed = SeedSequence(seed).entropy
+    if shards == 1:
+        _run_shard(0, 1, host, port, unix_path, stack, idle_timeout, seed)
+        return
+    processes = [Process(target=_run_shard, args=(shard, shards, host, port, unix_path, stack, idle_timeout, seed))
+                 for shard in range(shards)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+async def _bot_connection(host, port, unix_path, shard, tables, hands, seed, latencies, received):
+    """Plays both seats of the given tables over one connection with random actions, until every table has played
+    the given number of hands.
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(f'{unix_path}.{shard}')
+    else:
+        reader, writer = await asyncio.open_connection(host, port + shard)
+    rng = random.Random(seed)
+    policy = RandomPolicy()
+    played = dict.fromkeys(tables, 0)
+    decoders = {}
+    sent = {}
+
+    def send(message):
+        writer.write(encode(message))
+
+    def act(table, seat):
+        if table in sent:
+            latencies.append(time.perf_counter() - sent.pop(table))
+        action = policy.act(SimpleNamespace(pot=decoders[table, seat].state['pot']), seat, rng)
+        request = {'op': 'action', 'table': table, 'seat': seat, 'action': action[0]}
+        if action[0] == 'bet':
+            request['amount'] = action[1]
+        send(request)
+        sent[table] = time.perf_counter()
+
+    for table in tables:
+        send({'op': 'join', 'table': table, 'name': 'Bot A'})
+        send({'op': 'join', 'table': table, 'name': 'Bot B'})
+
+    while any(count < hands for count in played.values()):
+        line = await reader.readline()
+        if not line:
+            break
+        received[0] += len(line)
+        message = json.loads(line)
+        kind = message['type']
+        table = message.get('table')
+        if kind == 'event' and message['event'] == 'endround':
+            played[table] += 1
+        elif kind == 'error':
+            raise RuntimeError(message['message'])
+        elif kind in ('keyframe', 'delta', 'rejected'):
+            seat = message['seat']
+            decoder = decoders.setdefault((table, seat), StateDecoder())
+            if kind == 'keyframe':
+                decoder.keyframe(message['seq'], message['state'])
+            elif kind == 'delta' and not decoder.delta(message['seq'], message['ops']):
+                send({'op': 'resync', 'table': table, 'seat': seat})
+                continue
+            if played[table] < hands and decoder.state['active'] == seat:
+                act(table, seat)
+
+    for table in tables:
+        send({'op': 'leave', 'table': table, 'seat': 0})
+        send({'op': 'leave', 'table': table, 'seat': 1})
+    await writer.drain()
+    writer.close()
+
+
+async def run_bots(host='127.0.0.1', port=8765, shards=1, unix_path=None, tables=100, hands=10, connections=10,
+                   seed=0):
+    """A function that stands in for real players: it fills the given number of tables with bots that play random
+    actions over a few connections and reports the time from an action to the next turn and the bytes the server sent.
+
+        :param tables: The number of tables to play.
+        :type tables: int
+        :param hands: The number of hands to play at every table.
+        :type hands: int
+        :param connections: The number of connections per shard.
+        :type connections: int
+        :return: The latencies of the actions in seconds, sorted, and the number of bytes received.
+        :rtype: tuple
+            """
+    latencies = []
+    received = [0]
+    jobs = []
+    for shard in range(shards):
+        numbers = [table for table in range(tables) if shard_for(table, shards) == shard]
+        for i in range(connections):
+            if numbers[i::connections]:
+                jobs.append(_bot_connection(host, port, unix_path, shard, numbers[i::connections], hands,
+                                            seed * 1000003 + shard * connections + i, latencies, received))
+    await asyncio.gather(*jobs)
+    return sorted(latencies), received[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='A server hosting many heads-up tables, and a test client.')
+    parser.add_argument('mode', choices=('serve', 'bots'), help='run the server or the test client')
+    parser.add_argument('--host', default='127.0.0.1', help='the address of the server')
+    parser.add_argument('--port', type=int, default=8765, help='the port of shard 0')
+    parser.add_argument('--unix', default=None, help='use Unix sockets starting with this path instead of TCP')
+    parser.add_argument('--shards', type=int, default=1, help='the number of shards')
+    parser.add_argument('--stack', type=int, default=1000, help='the starting money of the players')
+    parser.add_argument('--idle-timeout', type=float, default=30.0, help='the seconds a player has to act')
+    parser.add_argument('--seed', type=int, default=None, help='the root seed of the decks')
+    parser.add_argument('--tables', type=int, default=100, help='the number of tables the bots play')
+    parser.add_argument('--hands', type=int, default=10, help='the number of hands per table the bots play')
+    parser.add_argument('--connections', type=int, default=10, help='the bot connections per shard')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'serve':
+        serve(args.host, args.port, args.shards, args.unix, args.stack, args.idle_timeout, args.seed)
+        return
+
+    start = time.perf_counter()
+    latencies, received = asyncio.run(run_bots(args.host, args.port, args.shards, args.unix, args.tables, args.hands,
+                                     args.connections, args.seed or 0))
+    elapsed = time.perf_counter() - start
+    if latencies:
+        print(f'{len(latencies)} actions in {elapsed:.2f} s ({len(latencies) / elapsed:,.0f} actions/s), latency '
+              f'median {latencies[len(latencies) // 2] * 1e3:.2f} ms, '
+              f'99th percentile {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms, '
+              f'{received / len(latencies):,.0f} bytes received per action')
+
+
+if __name__ == '__main__':
+    main()
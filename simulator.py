@@ -0,0 +1,296 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+Self-play of heads-up hands through the GameEngine rules, with the actions of both seats chosen by policy objects.
+
+Run from the command line with for example ``python simulator.py --hands 1000000 random call``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from abc import ABC, abstractmethod
+import argparse
+import os
+from pokerengine import *
+
+
+STREETS = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}  #: Maps the number of table cards to the street.
+ACTIONS = ('call', 'bet', 'all_in', 'fold')
+
+
+class Policy(ABC):
+    """
+    A base class for the bots playing a seat. Subclasses decide the action of the seat when it is their turn.
+    """
+    @abstractmethod
+    def act(self, game, seat, rng):
+        """
+        Returns the action of the seat as one of ('call',), ('bet', raise_amount), ('all_in',) or ('fold',).
+
+        :param game: The game, where game.PlayerStates[seat] is the player to act.
+        :type game: GameEngine
+        :param seat: The index of the player to act.
+        :type seat: int
+        :param rng: The random generator to use for any random decision, so that simulations can be repeated.
+        :type rng: random.Random
+        :return: The action and its arguments.
+        :rtype: tuple
+        """
+
+
+class CallPolicy(Policy):
+    """
+    A policy that always checks or calls.
+    """
+    def act(self, game, seat, rng):
+        return 'call',
+
+
+class RaisePolicy(Policy):
+    """
+    A policy that raises half the pot (at least 1) on every street and calls when the raise is not possible.
+
+    :param fraction: The size of the raise as a fraction of the pot.
+    :type fraction: float
+    """
+    def __init__(self, fraction=0.5):
+        self.fraction = fraction
+
+    def act(self, game, seat, rng):
+        return 'bet', max(1, int(game.pot * self.fraction))
+
+
+class RandomPolicy(Policy):
+    """
+    A policy that picks a random action with fixed probabilities.
+
+    :param weights: The weights of call, bet, all in and fold.
+    :type weights: tuple of float
+    """
+    def __init__(self, weights=(0.6, 0.25, 0.05, 0.1)):
+        self.weights = weights
+
+    def act(self, game, seat, rng):
+        action = rng.choices(ACTIONS, self.weights)[0]
+        if action == 'bet':
+            return 'bet', rng.randint(1, max(1, game.pot))
+        return action,
+
+
+POLICIES = {'call': CallPolicy, 'raise': RaisePolicy, 'random': RandomPolicy}  #: Policies by command line name.
+
+
+class SimulationResult:
+    """
+    A class that adds up the results of simulated hands for both seats.
+    """
+    def __init__(self):
+        self.hands = 0
+        self.chips = [0, 0]
+        self.chips_squared = [0, 0]
+        self.wins = [0, 0]
+        self.losses = [0, 0]
+        self.actions = [{street: dict.fromkeys(ACTIONS, 0) for street in STREETS.values()} for _ in range(2)]
+
+    def add_hand(self, deltas):
+        """
+        A method that counts the chips won or lost by both seats in one hand.
+
+        :param deltas: The change in money of both seats.
+        :type deltas: list of int
+        """
+        self.hands += 1
+        for seat, delta in enumerate(deltas):
+            self.chips[seat] += delta
+            self.chips_squared[seat] += delta * delta
+            if delta > 0:
+                self.wins[seat] += 1
+            elif delta < 0:
+                self.losses[seat] += 1
+
+    def merge(self, other):
+        """
+        A method that adds the counts of another result to this one.
+
+        :param other: The result to add.
+        :type other: SimulationResult
+        :return: This result.
+        :rtype: SimulationResult
+        """
+        self.hands += other.hands
+        for seat in range(2):
+            self.chips[seat] += other.chips[seat]
+            self.chips_squared[seat] += other.chips_squared[seat]
+            self.wins[seat] += other.wins[seat]
+            self.losses[seat] += other.losses[seat]
+            for street, counts in other.actions[seat].items():
+                for action, count in counts.items():
+                    self.actions[seat][street][action] += count
+        return self
+
+    def chip_ev(self, seat):
+        """
+        Returns the average number of chips the seat wins per hand.
+        """
+        return self.chips[seat] / self.hands if self.hands else 0.0
+
+    def chip_ev_error(self, seat):
+        """
+        Returns the standard error of the chip EV of the seat.
+        """
+        if self.hands < 2:
+            return 0.0
+        variance = (self.chips_squared[seat] - self.chips[seat] ** 2 / self.hands) / (self.hands - 1)
+        return (max(variance, 0.0) / self.hands) ** 0.5
+
+    def win_rate(self, seat):
+        """
+        Returns the share of hands in which the seat won chips.
+        """
+        return self.wins[seat] / self.hands if self.hands else 0.0
+
+    def action_frequencies(self, seat):
+        """
+        Returns the share of every action of the seat on every street.
+
+        :return: A dictionary from street to a dictionary from action to frequency.
+        :rtype: dict
+        """
+        frequencies = {}
+        for street, counts in self.actions[seat].items():
+            total = sum(counts.values())
+            frequencies[street] = {action: count / total if total else 0.0 for action, count in counts.items()}
+        return frequencies
+
+    def __repr__(self):
+        seats = '; '.join(f'seat {seat}: {self.chip_ev(seat):+.3f} +- {self.chip_ev_error(seat):.3f} chips/hand, '
+                          f'wins {self.win_rate(seat):.3f}' for seat in range(2))
+        return f'{self.hands} hands with {seats}'
+
+
+def _game_state(game):
+    """Returns the part of the game state that every accepted action changes.
+    """
+    players = game.PlayerStates
+    return (game.pot, game.rounds, game.endgame, len(game.tablestate.tablecards.cards),
+            players[0].money, players[0].bet, players[0].active, players[1].money, players[1].bet, players[1].active)
+
+
+def play_hands(policies, hands, stack=1000, seed=0, max_actions=10000):
+    """A function that plays a number of heads-up hands in this process. Every hand starts with both seats holding
+    the given stack, so the hands are independent of each other.
+
+        :param policies: The policies of seat 0 and seat 1.
+        :type policies: list of Policy
+        :param hands: The number of hands to play.
+        :type hands: int
+        :param stack: The money of both seats at the start of every hand.
+        :type stack: int
+        :param seed: The seed sequence of the cards and the random decisions of the policies, or an integer root seed.
+        :type seed: SeedSequence
+        :param max_actions: The number of actions after which a hand is considered stuck.
+        :type max_actions: int
+        :return: The counts of the played hands.
+        :rtype: SimulationResult
+            """
+    seed = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+    deck_stream, policy_stream = seed.spawn(2)
+    rng = policy_stream.generator()
+
+    game = GameEngine(deck_stream.generator())
+    game.start_game(('Seat 0', 'Seat 1', stack))
+    players = game.PlayerStates
+    result = SimulationResult()
+
+    for _ in range(hands):
+        rounds = game.rounds
+        actions = 0
+        while game.rounds == rounds and not game.endgame:
+            seat = 0 if players[0].active else 1
+            street = STREETS[len(game.tablestate.tablecards.cards)]
+            action = policies[seat].act(game, seat, rng)
+
+            before = _game_state(game)
+            getattr(game, action[0])(*action[1:])
+            if _game_state(game) == before:
+                # The engine turned the action down, for example a too large bet. Check or call instead.
+                action = 'call',
+                game.call()
+            result.actions[seat][street][action[0]] += 1
+
+            actions += 1
+            if actions > max_actions:
+                raise RuntimeError(f'A hand did not finish within {max_actions} actions.')
+
+        result.add_hand([player.money - stack for player in players])
+        for player in players:
+            player.money = stack
+        if game.endgame:
+            game.endgame = False
+            game.next_round()
+
+    return result
+
+
+def simulate(policies, hands, stack=1000, seed=0, workers=None, chunk_size=10000):
+    """A generator that plays heads-up hands in parallel worker processes and yields the aggregated results every
+    time a chunk of hands is finished.
+
+    Chunk i is always played with the seed sequence child i of the root seed, so the final result does not depend on
+    the number of workers.
+
+        :param policies: The policies of seat 0 and seat 1. They must be picklable.
+        :type policies: list of Policy
+        :param hands: The total number of hands to play.
+        :type hands: int
+        :param stack: The money of both seats at the start of every hand.
+        :type stack: int
+        :param seed: The root seed of the simulation.
+        :type seed: int
+        :param workers: The number of worker processes, defaults to the number of CPUs. 1 plays in this process.
+        :type workers: int
+        :param chunk_size: The number of hands per chunk.
+        :type chunk_size: int
+        :return: The results of all finished chunks, after every chunk.
+        :rtype: iterator of SimulationResult
+            """
+    root = SeedSequence(seed)
+    chunks = [(min(chunk_size, hands - start), root.child(i)) for i, start in enumerate(range(0, hands, chunk_size))]
+    workers = workers or os.cpu_count() or 1
+    total = SimulationResult()
+
+    if workers == 1:
+        for size, chunk_seed in chunks:
+            yield total.merge(play_hands(policies, size, stack, chunk_seed))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_hands, policies, size, stack, chunk_seed) for size, chunk_seed in chunks]
+        for future in futures:
+            yield total.merge(future.result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Self-play of heads-up hands between two policies.')
+    parser.add_argument('policies', nargs=2, choices=sorted(POLICIES), help='the policies of seat 0 and seat 1')
+    parser.add_argument('--hands', type=int, default=100000, help='the number of hands to play')
+    parser.add_argument('--stack', type=int, default=1000, help='the money of both seats at the start of every hand')
+    parser.add_argument('--seed', type=int, default=0, help='the root seed of the simulation')
+    parser.add_argument('--workers', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='the number of hands per chunk')
+    args = parser.parse_args(argv)
+
+    policies = [POLICIES[name]() for name in args.policies]
+    result = None
+    for result in simulate(policies, args.hands, args.stack, args.seed, args.workers, args.chunk_size):
+        print(result, flush=True)
+
+    if result is not None:
+        for seat in range(2):
+            print(f'Seat {seat} ({args.policies[seat]}) action frequencies:')
+            for street, frequencies in result.action_frequencies(seat).items():
+                print(f'  {street:<8}' + ' '.join(f'{action} {share:.3f}' for action, share in frequencies.items()))
+
+
+if __name__ == '__main__':
+    main()
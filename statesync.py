@@ -0,0 +1,219 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+"""
+Delta-encoded synchronisation of the state of a game with remote clients.
+
+The encoder listens to the change notifications of the players, hands and table of a game (the same notifications
+that become data_changed and new_cards signals in GameModel) and only marks what changed. When the server sends an
+update, the marked parts are compared with the state the clients already have and turned into a short list of
+operations, such as ['stack', 0, 980] or ['card', -1, 37]:
+
+    ['round', n]           a new round started
+    ['pot', amount]        the pot changed
+    ['stack', seat, money] the money of a player changed
+    ['bet', seat, bet]     the bet of a player changed
+    ['active', seat]       the turn moved to a seat
+    ['card', target, code] a card was added to the hole cards of a seat, or to the table for target -1
+    ['clear', target]      the cards of a seat, or of the table for target -1, were cleared
+
+Every update carries a sequence number. A client that misses an update, or joins late, asks for a keyframe with the
+full state, and the encoder also sends keyframes periodically so lagging clients catch up on their own.
+"""
+
+TABLE = -1  #: The target of the table cards in 'card' and 'clear' operations.
+
+
+def snapshot(game):
+    """A function returning the synchronised state of a game.
+
+        :param game: The game.
+        :type game: GameEngine
+        :return: The round, pot, active seat, table cards and the name, money, bet and hole cards of every player.
+        :rtype: dict
+            """
+    players = game.PlayerStates
+    return {'round': game.rounds,
+            'pot': game.pot,
+            'active': next((seat for seat, player in enumerate(players) if player.active), None),
+            'board': [card.code for card in game.tablestate.tablecards.cards],
+            'players': [{'name': player.name, 'money': player.money, 'bet': player.bet,
+                         'hole': [card.code for card in player.hand.cards]} for player in players]}
+
+
+def _card_ops(target, old, new):
+    """Returns the operations that turn one list of cards into another.
+    """
+    if new[:len(old)] == old:
+        return [['card', target, code] for code in new[len(old):]]
+    return [['clear', target]] + [['card', target, code] for code in new]
+
+
+class StateEncoder:
+    """
+    A class that turns the change notifications of a game into numbered updates.
+
+    :param keyframe_interval: The number of updates after which a keyframe is sent instead of a delta.
+    :type keyframe_interval: int
+    """
+    def __init__(self, keyframe_interval=50):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.game = None
+        self.state = None
+        self.dirty = False
+        self.since_keyframe = 0
+        self.subscriptions = []
+
+    def attach(self, game):
+        """
+        Starts following a game. The next update is a keyframe.
+
+        :param game: The game to follow.
+        :type game: GameEngine
+        """
+        self.detach()
+        self.game = game
+        for observable in [game, game.tablestate, game.tablestate.tablecards] + \
+                [item for player in game.PlayerStates for item in (player, player.hand)]:
+            observable.add_observer(self.mark)
+            self.subscriptions.append(observable)
+        self.state = snapshot(game)
+        self.since_keyframe = self.keyframe_interval
+
+    def detach(self):
+        """
+        Stops following the current game.
+        """
+        for observable in self.subscriptions:
+            observable.remove_observer(self.mark)
+        self.subscriptions.clear()
+        self.game = None
+
+    def mark(self, event, *args):
+        """
+        Notes that the game changed. The comparison is only made when the next update is encoded, so a burst of
+        notifications costs one comparison.
+        """
+        if event in ('changed', 'new_cards', 'endround'):
+            self.dirty = True
+
+    def delta(self):
+        """
+        Compares the game with the state of the last update.
+
+        :return: The operations, empty if nothing changed.
+        :rtype: list
+        """
+        if not self.dirty:
+            return []
+        self.dirty = False
+        old, new = self.state, snapshot(self.game)
+        ops = []
+        if new['round'] != old['round']:
+            ops.append(['round', new['round']])
+        if new['pot'] != old['pot']:
+            ops.append(['pot', new['pot']])
+        for seat, (before, after) in enumerate(zip(old['players'], new['players'])):
+            if after['money'] != before['money']:
+                ops.append(['stack', seat, after['money']])
+            if after['bet'] != before['bet']:
+                ops.append(['bet', seat, after['bet']])
+            if after['hole'] != before['hole']:
+                ops += _card_ops(seat, before['hole'], after['hole'])
+        if new['board'] != old['board']:
+            ops += _card_ops(TABLE, old['board'], new['board'])
+        if new['active'] != old['active']:
+            ops.append(['active', new['active']])
+        self.state = new
+        return ops
+
+    def update(self):
+        """
+        Encodes the next update: a delta, or a keyframe when one is due.
+
+        :return: None if nothing changed, otherwise the kind of the update ('delta' or 'keyframe'), its sequence
+         number and the delta operations.
+        :rtype: tuple
+        """
+        ops = self.delta()
+        if not ops and self.since_keyframe < self.keyframe_interval:
+            return None
+        self.seq += 1
+        if self.since_keyframe >= self.keyframe_interval:
+            self.since_keyframe = 0
+            return 'keyframe', self.seq, ops
+        self.since_keyframe += 1
+        return 'delta', self.seq, ops
+
+    def keyframe(self, seat):
+        """
+        Returns the full state of the last update as seen from a seat, which only holds the hole cards of the seat.
+
+        :param seat: The seat of the client.
+        :type seat: int
+        :return: The state.
+        :rtype: dict
+        """
+        state = dict(self.state, board=list(self.state['board']))
+        state['players'] = [dict(player, hole=list(player['hole']) if i == seat else []) for i, player
+                            in enumerate(self.state['players'])]
+        return state
+
+
+def visible_ops(ops, seat):
+    """A function that removes the hole cards of the other seats from delta operations.
+
+        :param ops: The operations of a delta.
+        :type ops: list
+        :param seat: The seat of the client.
+        :type seat: int
+        :return: The operations the client may see.
+        :rtype: list
+            """
+    return [op for op in ops if op[0] not in ('card', 'clear') or op[1] == TABLE or op[1] == seat]
+
+
+class StateDecoder:
+    """
+    A class that rebuilds the state of a game on the client from keyframes and deltas.
+    """
+    def __init__(self):
+        self.seq = None
+        self.state = None
+
+    def keyframe(self, seq, state):
+        """
+        Replaces the state with a keyframe.
+        """
+        self.seq = seq
+        self.state = state
+
+    def delta(self, seq, ops):
+        """
+        Applies a delta.
+
+        :return: False if an update was missed and a keyframe is needed, True otherwise.
+        :rtype: bool
+        """
+        if self.seq is None or seq != self.seq + 1:
+            return False
+        state = self.state
+        for op in ops:
+            kind = op[0]
+            if kind == 'round':
+                state['round'] = op[1]
+            elif kind == 'pot':
+                state['pot'] = op[1]
+            elif kind == 'stack':
+                state['players'][op[1]]['money'] = op[2]
+            elif kind == 'bet':
+                state['players'][op[1]]['bet'] = op[2]
+            elif kind == 'active':
+                state['active'] = op[1]
+            elif kind == 'card':
+                (state['board'] if op[1] == TABLE else state['players'][op[1]]['hole']).append(op[2])
+            elif kind == 'clear':
+                (state['board'] if op[1] == TABLE else state['players'][op[1]]['hole']).clear()
+        self.seq = seq
+        return True
@@ -0,0 +1,22 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import os
+import sys
+
+# The modules live in the root of the repository, and the GUI tests run without a display.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """The QApplication of the GUI tests. Skips the test when PyQt5 is not installed."""
+    QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+    pytest.importorskip('PyQt5.QtSvg')
+    # The card images are read relative to the working directory.
+    os.chdir(ROOT)
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
@@ -0,0 +1,43 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+import pytest
+from cardlib import *
+
+np = pytest.importorskip('numpy')
+from batcheval import *
+
+
+@pytest.mark.parametrize('size', [5, 6, 7])
+def test_batch_ranks_match_poker_hand(size):
+    rng = random.Random(size)
+    hands = [rng.sample(range(52), size) for _ in range(3000)]
+    ranks = evaluate_batch(np.array(hands))
+    assert ranks.tolist() == [PokerHand(hand).rank for hand in hands]
+
+
+def test_batch_of_cards_matches_its_codes():
+    hands = [[CARDS[code] for code in random.Random(1).sample(range(52), 7)] for _ in range(10)]
+    assert evaluate_batch(hands_to_codes(hands)).tolist() == [PokerHand(hand).rank for hand in hands]
+
+
+@pytest.mark.parametrize('codes', [
+    [[0, 1, 2, 3]],                   # Too few cards
+    [[0, 1, 2, 3, 4, 5, 6, 7]],       # Too many cards
+    [0, 1, 2, 3, 4],                  # Not a 2-dimensional array
+    [[0, 1, 2, 3, 52]],               # No such card
+    [[-1, 1, 2, 3, 4]],
+    [[0, 1, 2, 3, 4, 5], [8, 9, 10, 11, 12, 8]],  # A card twice
+])
+def test_invalid_rows_are_rejected(codes):
+    with pytest.raises(ValueError):
+        evaluate_batch(np.array(codes))
+
+
+def test_random_deals_avoid_the_excluded_cards():
+    deals = random_deals(SeedSequence(7), 500, 5, excluded=range(10))
+    assert deals.shape == (500, 5)
+    assert deals.min() >= 10
+    assert all(len(set(row)) == 5 for row in deals.tolist())
+    assert (random_deals(SeedSequence(7), 500, 5, excluded=range(10)) == deals).all()
@@ -0,0 +1,229 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+from itertools import combinations
+import pytest
+from cardlib import *
+
+
+def five_card_key(codes):
+    """A brute force strength of five cards that compares like the hands: the hierarchy value followed by the values
+    that break ties, written independently of the evaluator."""
+    values = sorted((code // 4 + 2 for code in codes), reverse=True)
+    flush = len({code % 4 for code in codes}) == 1
+    distinct = sorted(set(values), reverse=True)
+    straight = 0
+    if len(distinct) == 5:
+        if distinct[0] - distinct[4] == 4:
+            straight = distinct[0]
+        elif distinct == [14, 5, 4, 3, 2]:
+            straight = 5
+    groups = sorted(((values.count(v), v) for v in distinct), reverse=True)
+    counts = [count for count, _ in groups]
+    grouped = [value for _, value in groups]
+    if straight and flush:
+        return 9, straight
+    if counts == [4, 1]:
+        return (8, *grouped)
+    if counts == [3, 2]:
+        return (7, *grouped)
+    if flush:
+        return (6, *values)
+    if straight:
+        return 5, straight
+    if counts == [3, 1, 1]:
+        return (4, *grouped)
+    if counts == [2, 2, 1]:
+        return (3, *grouped)
+    if counts == [2, 1, 1, 1]:
+        return (2, *grouped)
+    return (1, *values)
+
+
+def best_key(codes):
+    return max(five_card_key(five) for five in combinations(codes, 5))
+
+
+def five_card_classes():
+    """Yields one hand of every distinct five-card poker hand: every multiset of values without a flush, and every
+    set of five values in one suit."""
+    def multisets(first, cards):
+        if not cards:
+            yield []
+            return
+        for value in range(first, 15):
+            for count in range(1, min(4, cards) + 1):
+                for rest in multisets(value + 1, cards - count):
+                    yield [value] * count + rest
+    for values in multisets(2, 5):
+        # Consecutive cards get consecutive suits, so equal values differ in suit and no suit holds all five.
+        yield [4 * (value - 2) + i % 4 for i, value in enumerate(values)]
+    for values in combinations(range(2, 15), 5):
+        yield [4 * (value - 2) for value in values]
+
+
+def test_every_five_card_class_has_its_own_rank_in_order():
+    hands = list(five_card_classes())
+    assert len(hands) == 7462
+    ranked = sorted(hands, key=five_card_key)
+    ranks = [rank_codes(hand) for hand in ranked]
+    assert ranks == list(range(1, 7463))
+    for hand in ranked[::50]:
+        assert PokerHand(hand).type.value == five_card_key(hand)[0]
+
+
+@pytest.mark.parametrize('size', [5, 6, 7, 8, 10])
+def test_random_hands_against_brute_force(size):
+    rng = random.Random(size)
+    hands = [rng.sample(range(52), size) for _ in range(1500 if size < 8 else 300)]
+    keyed = sorted(((best_key(hand), hand) for hand in hands), key=lambda item: item[0])
+    previous_key = previous_rank = None
+    for key, hand in keyed:
+        poker_hand = PokerHand([CARDS[code] for code in hand])
+        assert poker_hand.type.value == key[0]
+        assert poker_hand.rank == rank_codes(hand)
+        if previous_key is not None:
+            assert (poker_hand.rank == previous_rank) == (key == previous_key)
+            assert poker_hand.rank >= previous_rank
+        previous_key, previous_rank = key, poker_hand.rank
+
+
+def tie_break_values(secondary):
+    """The values of the tie-break data of a PokerHand in order, without the suit of a flush."""
+    values = []
+    for part in secondary if isinstance(secondary, (tuple, list)) else [secondary]:
+        if isinstance(part, list):
+            values += part
+        elif isinstance(part, int):
+            values.append(part)
+    return values
+
+
+@pytest.mark.parametrize('size', [5, 6, 7, 9])
+def test_tie_break_data_against_brute_force(size):
+    rng = random.Random(10 + size)
+    for _ in range(1000):
+        hand = rng.sample(range(52), size)
+        poker_hand = PokerHand(hand)
+        key = best_key(hand)
+        assert poker_hand.type.value == key[0]
+        assert tie_break_values(poker_hand.secondary) == list(key[1:])
+
+
+def test_flush_suit_is_named():
+    poker_hand = PokerHand([48, 40, 32, 20, 8, 1, 6])
+    assert poker_hand.type == PokerHierarchy.Flush
+    assert poker_hand.secondary == ([14, 12, 10, 7, 4], 'Hearts')
+
+
+def test_many_cards_with_a_flush_and_a_full_house():
+    # Five hearts together with three twos and two threes: the full house beats the flush.
+    hand = [0, 8, 16, 24, 32, 1, 2, 5, 6]
+    assert PokerHand(hand).type == PokerHierarchy.Full_House
+    # Two suits with a flush each: the better flush wins.
+    hand = [0, 4, 8, 12, 20, 1, 29, 33, 37, 41]
+    assert PokerHand(hand).type == PokerHierarchy.Flush
+    assert tie_break_values(PokerHand(hand).secondary) == [12, 11, 10, 9, 2]
+
+
+def test_incremental_state_matches_full_evaluation():
+    rng = random.Random(2)
+    for _ in range(500):
+        hole, table = rng.sample(range(52), 2), rng.sample(range(52), 5)
+        if set(hole) & set(table):
+            continue
+        state = HandState(hole)
+        board = HandState(table)
+        assert state.combine(board).rank() == rank_codes(hole + table)
+
+
+def test_hand_keeps_its_key_through_changes():
+    rng = random.Random(5)
+    for _ in range(300):
+        cards = rng.sample(range(52), 9)
+        hand = Hand()
+        for code in cards[:4]:
+            hand.add_card(code if rng.random() < 0.5 else CARDS[code])
+        hand.drop_cards([rng.randrange(4)])
+        hand.sort()
+        board = cards[4:4 + rng.randint(0, 5)]
+        best = hand.best_poker_hand([CARDS[code] for code in board])
+        expected = PokerHand([card.code for card in hand.cards] + board)
+        assert (best.type, best.secondary, best.rank) == (expected.type, expected.secondary, expected.rank)
+        assert best.cards == hand.cards + [CARDS[code] for code in board]
+        hand.clear_all_cards()
+        hand.add_card(cards[0])
+        assert hand.best_poker_hand(cards[1:3]).rank == rank_codes(cards[:3])
+
+
+def test_outs_on_a_known_flop():
+    # Seven of clubs and diamonds on a board of the ace of clubs, the king of hearts and the two of spades.
+    outs, probability = find_outs(HandState([22, 23]), HandState([50, 44, 1]))
+    # Two sevens make three of a kind, and three aces, three kings and three twos make two pairs.
+    assert outs == [0, 2, 3, 20, 21, 45, 46, 47, 48, 49, 51]
+    # 36 of the 47 unseen cards miss, for both the turn and the river.
+    assert probability == pytest.approx(1 - (36 * 35) / (47 * 46))
+
+
+def test_outs_against_an_opponent():
+    rng = random.Random(6)
+    for _ in range(100):
+        cards = rng.sample(range(52), 7)
+        hole, opponent, table = cards[:2], cards[2:4], cards[4:]
+        outs, _ = find_outs(HandState(hole), HandState(table), HandState(opponent))
+        hand_type, _, rank = evaluate_codes(hole + table)
+        behind = rank_codes(opponent + table) >= rank
+        expected = [code for code in range(52) if code not in cards and
+                    (evaluate_codes(hole + table + [code])[0].value > hand_type.value or
+                     behind and rank_codes(hole + table + [code]) > rank_codes(opponent + table + [code]))]
+        assert outs == expected
+        state = HandState(hole + table)
+        assert state.evaluate_with_each(range(52)) == [state.evaluate_with(code) for code in range(52)]
+
+
+def test_showdown_ranks_match_rank_codes():
+    rng = random.Random(3)
+    for _ in range(200):
+        cards = rng.sample(range(52), 5 + 2 * 6)
+        table, holes = cards[:5], [cards[5 + 2 * i:7 + 2 * i] for i in range(6)]
+        ranks = showdown_ranks([HandState(hole) for hole in holes], HandState(table))
+        assert ranks == [rank_codes(hole + table) for hole in holes]
+
+
+def test_partial_hands_rank_between_five_card_hands():
+    aakq = rank_codes([48, 49, 44, 40])
+    assert rank_codes([48, 49, 44, 36, 32]) < aakq < rank_codes([48, 49, 44, 40, 0])
+    rng = random.Random(4)
+    hands = [rng.sample(range(52), rng.randint(1, 4)) for _ in range(2000)]
+    for hand in hands:
+        rank = rank_codes(hand)
+        assert rank != int(rank)
+    # Partial hands keep the order of their tie-break data among themselves.
+    ordered = sorted(hands, key=lambda hand: hand_strength(*evaluate_codes(hand)[:2]))
+    for a, b in zip(ordered, ordered[1:]):
+        strength_a, strength_b = (hand_strength(*evaluate_codes(hand)[:2]) for hand in (a, b))
+        assert (rank_codes(a) < rank_codes(b)) == (strength_a < strength_b)
+
+
+def test_cache_ignores_lists_with_a_card_twice():
+    cache = EvaluationCache()
+    straight_flush = [0, 4, 8, 12, 16]
+    cache.evaluate(straight_flush)
+    assert cache.evaluate([0, 4, 8, 12, 16, 16])[0] == evaluate_codes([0, 4, 8, 12, 16, 16])[0]
+    assert len(cache) == 1
+
+
+def test_cache_drops_the_least_recently_used(tmp_path):
+    cache = EvaluationCache(2)
+    hands = [[0, 4, 8, 12, 16], [1, 5, 9, 13, 17], [2, 6, 10, 14, 18]]
+    cache.evaluate(hands[0])
+    cache.evaluate(hands[1])
+    cache.evaluate(hands[0])
+    cache.evaluate(hands[2])
+    assert set(cache.entries) == {cards_to_mask(hands[0]), cards_to_mask(hands[2])}
+    path = str(tmp_path / 'cache.bin')
+    cache.save(path)
+    loaded = EvaluationCache(2)
+    assert loaded.load(path) == 2
+    assert list(loaded.entries) == list(cache.entries)
@@ -0,0 +1,76 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import subprocess
+import sys
+import pytest
+from conftest import ROOT
+from pokerengine import *
+from equity import *
+import equity
+
+ACES = [48, 49]  # The aces of hearts and spades
+KINGS = [46, 47]  # The kings of clubs and diamonds
+
+
+@pytest.fixture(scope='module')
+def aces_against_kings():
+    return exact_equity([ACES, KINGS], workers=1)
+
+
+def test_exact_equity_of_aces_against_kings(aces_against_kings):
+    result = aces_against_kings
+    assert result.samples == 1712304
+    assert result.equity(0) == pytest.approx(0.82, abs=0.01)
+    assert result.equity(0) + result.equity(1) == pytest.approx(1)
+    for player in range(2):
+        assert result.win_probability(player) + result.tie_probability(player) + result.lose_probability(player) == \
+            pytest.approx(1)
+
+
+@pytest.mark.parametrize('batch', [True, False])
+def test_monte_carlo_matches_the_exact_equity(aces_against_kings, batch, monkeypatch):
+    if not batch:
+        monkeypatch.setattr(equity, '_batch_evaluator', lambda: None)
+    elif equity._batch_evaluator() is None:
+        pytest.skip('NumPy is not installed')
+    result = monte_carlo_equity([ACES, KINGS], samples=20000, workers=1, seed=1)
+    assert result.samples == 20000
+    # The standard error of 20000 samples is about 0.003.
+    assert result.equity(0) == pytest.approx(aces_against_kings.equity(0), abs=0.015)
+
+
+def test_results_do_not_depend_on_the_number_of_workers():
+    holes, board = [ACES, KINGS, [0, 5]], [8, 13, 30]
+    one = monte_carlo_equity(holes, board, samples=25000, workers=1, seed=7)
+    two = monte_carlo_equity(holes, board, samples=25000, workers=2, seed=7)
+    assert (one.samples, one.wins, one.ties) == (two.samples, two.wins, two.ties)
+
+    one = exact_equity([ACES, KINGS], board, workers=1)
+    two = exact_equity([ACES, KINGS], board, workers=2)
+    assert (one.samples, one.wins, one.ties) == (two.samples, two.wins, two.ties) and one.samples == 990
+
+
+def test_game_equity_uses_the_players_left_in_the_round():
+    game = GameEngine(SeedSequence(3).generator())
+    game.start_game(('P0', 'P1', 'P2', 1000))
+    with pytest.raises(ValueError):
+        game_equity(game, workers=1)
+
+    # The first seat folds and the other two call to the flop.
+    game.fold()
+    game.call()
+    game.call()
+    assert len(game.tablestate.tablecards.cards) == 3
+
+    result = game_equity(game, workers=1)
+    expected = exact_equity([game.PlayerStates[1].hand.cards, game.PlayerStates[2].hand.cards],
+                            game.tablestate.tablecards.cards, workers=1)
+    assert result.samples == 990
+    assert (result.wins, result.ties) == (expected.wins, expected.ties)
+
+
+def test_equity_and_preflop_do_not_import_numpy():
+    # NumPy is optional: only batcheval needs it.
+    code = 'import sys, equity, preflop; sys.exit("numpy" in sys.modules)'
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
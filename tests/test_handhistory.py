@@ -0,0 +1,98 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+import pytest
+from cardlib import SeedSequence
+from handhistory import *
+from pokerengine import GameEngine
+from replay import HandHistory, check_hand, replay_files
+
+
+def play_to_the_end(game, seed=0):
+    """Plays random actions until the game is over and returns the number of rounds."""
+    rng = random.Random(seed)
+    while not game.endgame:
+        rng.choice([game.call, game.call, game.all_in, game.fold, lambda: game.bet(str(rng.randint(1, 40)))])()
+    return game.rounds
+
+
+def read_hands(writer):
+    hands = []
+    for path in writer.paths:
+        with HandHistory(path) as history:
+            hands += list(history)
+    return hands
+
+
+def test_log_is_written_when_the_game_ends(tmp_path):
+    game = GameEngine(SeedSequence(1).generator())
+    writer = HandHistoryWriter(game, str(tmp_path))
+    game.start_game(('A', 'B', 'C', '100'))
+    rounds = play_to_the_end(game)
+
+    # Nothing closes the writer here, the end of the game does.
+    assert writer.file is None
+    assert writer not in game.observers
+    hands = read_hands(writer)
+    assert len(hands) == rounds + 1
+    for records in hands:
+        assert [kind for kind, *_ in records[-3:]] == [END] * 3
+        assert check_hand(records) == []
+    with open(index_path(writer.paths[0]), 'rb') as f:
+        assert len(f.read()) == 8 * len(hands)
+
+
+def test_closing_twice_keeps_the_log(tmp_path):
+    game = GameEngine(SeedSequence(2).generator())
+    writer = HandHistoryWriter(game, str(tmp_path))
+    game.start_game(('A', 'B', '50'))
+    play_to_the_end(game, seed=2)
+    size = os.path.getsize(writer.paths[0])
+    writer.close()
+    assert os.path.getsize(writer.paths[0]) == size > FILE_HEADER.size
+
+
+def test_observers_after_the_writer_see_the_end_of_the_game(tmp_path):
+    game = GameEngine(SeedSequence(3).generator())
+    HandHistoryWriter(game, str(tmp_path))
+    events = []
+    game.add_observer(lambda event, *args: events.append(event))
+    game.start_game(('A', 'B', '50'))
+    play_to_the_end(game, seed=3)
+    assert events.count('endgame') == 1
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_replay_skips_files_that_are_not_logs(tmp_path, workers):
+    game = GameEngine(SeedSequence(5).generator())
+    writer = HandHistoryWriter(game, str(tmp_path))
+    game.start_game(('A', 'B', '50'))
+    rounds = play_to_the_end(game, seed=5)
+    empty = tmp_path / 'empty.phh'
+    empty.write_bytes(b'')
+    with pytest.raises(ValueError):
+        HandHistory(str(empty))
+
+    with pytest.warns(UserWarning, match='empty.phh'):
+        results = list(replay_files([str(empty)] + writer.paths, workers))
+    assert results == [(writer.paths[0], rounds + 1, {})]
+
+
+def test_gui_end_of_game_writes_the_log(qapp, tmp_path, monkeypatch):
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    from pokermodel import GameModel
+    from pokerview import InformationView
+    monkeypatch.setattr(QMessageBox, 'exec', lambda self: 0)
+    quits = []
+    monkeypatch.setattr(QApplication, 'quit', lambda: quits.append(True))
+
+    game = GameModel()
+    view = InformationView(game)
+    writer = HandHistoryWriter(game, str(tmp_path))
+    game.start_game(('A', 'B', '50'))
+    rounds = play_to_the_end(game, seed=4)
+
+    assert quits == [True]
+    assert writer.file is None
+    assert len(read_hands(writer)) == rounds + 1
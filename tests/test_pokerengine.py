@@ -0,0 +1,123 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+import pytest
+from pokerengine import *
+from simulator import RandomPolicy
+
+
+def reference_payouts(contributed, live, ranks):
+    """Pays the pot the slow way: peel off layers of the smallest contribution still in the pot, and give every layer
+    to the best hands among the players who paid into all of it. The odd chips go to the first seats."""
+    left = list(contributed)
+    payouts = [0] * len(contributed)
+    winners = None
+    while any(left):
+        eligible = [seat for seat in live if left[seat] > 0]
+        if not eligible:
+            # Money of folded players above every live contribution goes to the winners of the last layer.
+            payouts[winners[0]] += sum(left)
+            break
+        level = min(left[seat] for seat in eligible)
+        layer = sum(min(amount, level) for amount in left)
+        left = [amount - min(amount, level) for amount in left]
+        best = max(ranks[seat] for seat in eligible)
+        winners = sorted(seat for seat in eligible if ranks[seat] == best)
+        for n, seat in enumerate(winners):
+            payouts[seat] += layer // len(winners) + (n < layer % len(winners))
+    return payouts
+
+
+def play(game, rng, policy, max_steps=20000):
+    """Plays random actions until the game is over. An action the rules turn down is replaced by a call."""
+    for _ in range(max_steps):
+        if game.endgame:
+            return
+        seat = game.active_seat()
+        player = game.PlayerStates[seat]
+        before = game.pot, player.money, player.bet, game.active_seat(), game.rounds
+        action = policy.act(game, seat, rng)
+        getattr(game, action[0])(*action[1:])
+        if (game.pot, player.money, player.bet, game.active_seat(), game.rounds) == before and not game.endgame:
+            game.call()
+
+
+@pytest.mark.parametrize('trial', range(40))
+def test_showdowns_pay_the_side_pots(trial):
+    rng = random.Random(trial)
+    seats = 2 + trial % 9
+    game = GameEngine(SeedSequence(trial).generator())
+    game.start_game(tuple(f'P{seat}' for seat in range(seats)) + (100,))
+    for player in game.PlayerStates:
+        player.money = rng.randint(1, 400)
+    total = sum(player.money for player in game.PlayerStates)
+    showdowns = []
+    evaluate_winner = game.evaluate_winner
+
+    def checked_evaluate_winner():
+        players = game.PlayerStates
+        live = [seat for seat, player in enumerate(players) if not player.folded]
+        board = [card.code for card in game.tablestate.tablecards.cards]
+        ranks = {seat: rank_codes(board + [card.code for card in players[seat].hand.cards]) for seat in live}
+        expected = reference_payouts([player.contributed for player in players], live, ranks)
+        assert sum(expected) == game.pot
+        before = [player.money for player in players]
+        evaluate_winner()
+        assert [player.money - money for player, money in zip(players, before)] == expected
+        showdowns.append(len(live))
+
+    game.evaluate_winner = checked_evaluate_winner
+    play(game, rng, RandomPolicy())
+    assert game.endgame
+    assert showdowns
+    # Every chip is still in front of a player at the end.
+    assert sum(player.money for player in game.PlayerStates) == total
+
+
+def test_chips_are_conserved_during_the_game():
+    rng = random.Random(5)
+    game = GameEngine(SeedSequence(5).generator())
+    game.start_game(('A', 'B', 'C', 'D', 200))
+    total = sum(player.money for player in game.PlayerStates)
+    policy = RandomPolicy()
+    for _ in range(3000):
+        if game.endgame:
+            break
+        seat = game.active_seat()
+        action = policy.act(game, seat, rng)
+        getattr(game, action[0])(*action[1:])
+        if not game.endgame:
+            assert sum(player.money for player in game.PlayerStates) + game.pot == total
+            assert not game.PlayerStates[game.active_seat()].folded
+
+
+@pytest.mark.parametrize('names', [('A',), tuple('ABCDEFGHIJK')])
+def test_start_game_needs_two_to_ten_players(names):
+    with pytest.raises(ValueError):
+        GameEngine().start_game(names + (100,))
+
+
+def test_check_around_reaches_the_showdown():
+    game = GameEngine(SeedSequence(7).generator())
+    events = []
+    game.add_observer(lambda event, *args: events.append(event))
+    game.start_game(('A', 'B', 'C', 100))
+    for _ in range(4 * 3):
+        game.call()
+    assert 'winner' in events
+    assert game.rounds == 1
+    assert sum(player.money for player in game.PlayerStates) == 300
+
+
+def test_hand_state_follows_the_cards():
+    hand = EngineHand()
+    hand.add_card(48)
+    hand.add_card(CARDS[49])
+    assert hand.state.codes == [48, 49]
+    hand.add_card(0)
+    assert hand.state.mask == cards_to_mask(hand.cards)
+    hand.drop_cards([0])
+    assert hand.state.codes == [49, 0] and hand.state.key == HandState([49, 0]).key
+    hand.clear_all_cards()
+    assert hand.state.codes == [] and hand.key == 0
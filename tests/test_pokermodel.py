@@ -0,0 +1,67 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+from collections import Counter
+import pytest
+
+
+@pytest.fixture
+def game(qapp):
+    from pokermodel import GameModel
+    game = GameModel()
+    game.start_game(('A', 'B', 1000))
+    return game
+
+
+def record(game):
+    """Connects to every signal of the models of a game and returns the list the emissions are logged in."""
+    log = []
+
+    def watch(model, label, name):
+        getattr(model, name).connect(lambda *args: log.append((label, name)))
+
+    watch(game, 'game', 'data_changed')
+    for name in game.signals.values():
+        watch(game, 'game', name)
+    watch(game.tablestate, 'table', 'data_changed')
+    watch(game.tablestate.tablecards, 'board', 'new_cards')
+    for seat, player in enumerate(game.PlayerStates):
+        watch(player, f'player {seat}', 'data_changed')
+        watch(player.hand, f'hand {seat}', 'new_cards')
+    return log
+
+
+def test_each_model_signals_once_per_action(game):
+    log = record(game)
+    game.bet(20)
+    counts = Counter(log)
+    assert set(counts.values()) == {1}
+    assert {('player 0', 'data_changed'), ('player 1', 'data_changed'), ('game', 'data_changed'),
+            ('game', 'signal_bet')} == set(counts)
+
+    # The call closes the betting round and deals the flop, three cards in one signal.
+    log.clear()
+    game.call()
+    counts = Counter(log)
+    assert set(counts.values()) == {1}
+    assert {('player 0', 'data_changed'), ('player 1', 'data_changed'), ('board', 'new_cards'),
+            ('game', 'data_changed'), ('game', 'signal_call')} == set(counts)
+    assert len(game.tablestate.tablecards.cards) == 3
+
+
+def test_the_end_of_a_round_is_signalled_after_the_pending_state(game):
+    log = record(game)
+    seen = []
+    game.signal_endround.connect(lambda: seen.append((list(log), dict(game.batch.pending), list(game.batch.messages))))
+    game.fold()
+
+    assert len(seen) == 1
+    before, pending, messages = seen[0]
+    # The views show the folded round and the winner before the dialog opens.
+    assert pending == {} and messages == []
+    assert set(before[:-1]) == {('player 0', 'data_changed'), ('player 1', 'data_changed'), ('game', 'signal_winner')}
+    assert before[-2:] == [('game', 'signal_winner'), ('game', 'signal_endround')]
+    # The new round is signalled once the dialog is closed.
+    after = Counter(log[len(before):])
+    assert set(after.values()) == {1}
+    assert {('hand 0', 'new_cards'), ('hand 1', 'new_cards'), ('game', 'data_changed')} <= set(after)
@@ -0,0 +1,67 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import pytest
+
+
+@pytest.fixture
+def setup_window(qapp):
+    from pokermodel import GameModel
+    from pokerview import SetupWindow
+    window = SetupWindow(GameModel())
+    yield window
+    window.close()
+
+
+def test_start_game_with_setup_defaults(setup_window):
+    game = setup_window.GameModel
+    game.start_game(setup_window.layout.get_text())
+    assert [player.name for player in game.PlayerStates] == ['Player 1', 'Player 2']
+    assert [player.money for player in game.PlayerStates] == [100, 100]
+
+
+def test_start_game_with_entered_setup(setup_window):
+    layout = setup_window.layout
+    layout.lbl_box_1.enter_info.setText('Ada')
+    layout.lbl_box_2.enter_info.setText('Bo')
+    layout.lbl_box_3.enter_info.setText('250')
+    setup_window.GameModel.start_game(layout.get_text())
+    assert [(player.name, player.money) for player in setup_window.GameModel.PlayerStates] == \
+        [('Ada', 250), ('Bo', 250)]
+
+
+def test_confirm_opens_the_game_window(setup_window):
+    from pokerview import CardView, MainGameWindow, PlayerView
+    setup_window.show()
+    setup_window.button.click()
+    window = setup_window.w
+    assert isinstance(window, MainGameWindow)
+    game = setup_window.GameModel
+    game.bet('10')
+    game.call()
+    window.grab()
+    items = [item for view in window.findChildren(CardView) for item in view.card_items if item.isVisible()]
+    assert len(items) == 2 + 2 + 3
+    assert not any(item.pixmap().isNull() for item in items)
+    # The player views show the outs, so the engine counts them.
+    assert game.track_outs
+    boxes = [view.outs_box.text() for view in window.findChildren(PlayerView)]
+    assert boxes and all(text.startswith('Outs: ') and text != 'Outs: -' for text in boxes)
+    window.close()
+
+
+def test_startup_report_stops_waiting_for_card_images(setup_window, monkeypatch, capsys):
+    import time
+    from PyQt5.QtWidgets import QApplication
+    from pokerview import CardArt, CardView
+    from pokergame import StartupReport
+    # Card images that nothing loads.
+    monkeypatch.setattr(CardView, 'art', CardArt())
+    report = StartupReport(setup_window)
+    report.wait_ms = 50
+    setup_window.show()
+    deadline = time.perf_counter() + 5
+    while not report.reported and time.perf_counter() < deadline:
+        QApplication.processEvents()
+    assert report.reported
+    assert 'card images not loaded' in capsys.readouterr().err
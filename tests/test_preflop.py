@@ -0,0 +1,59 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+import pytest
+from preflop import *
+from preflop import _SCALE, _class_counts
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory):
+    # One board per class is enough to fill in the table, but not for good estimates.
+    path = str(tmp_path_factory.mktemp('preflop') / 'table.bin')
+    build_preflop_table(path, boards=1, workers=1, seed=3)
+    table = load_preflop_table(path)
+    yield table
+    table.close()
+
+
+def test_table_is_read_back_through_the_memory_map(table):
+    assert table.boards == 1
+    # Every win and tie pair leaves a probability to lose between 0 and 1.
+    for values in (table.matchups, table.classes):
+        for i in range(0, len(values), 2):
+            assert values[i] + values[i + 1] <= _SCALE + 1
+    win, tie = table.equity([48, 49], [0, 5])
+    assert 0 <= win + tie <= 1
+
+
+def test_equity_does_not_depend_on_card_order_or_suit_names(table):
+    rng = random.Random(4)
+    for _ in range(200):
+        a, b, c, d = rng.sample(range(52), 4)
+        expected = table.equity((a, b), (c, d))
+        assert table.equity((b, a), (d, c)) == expected
+        assert table.equity([CARDS[b], CARDS[a]], [CARDS[c], CARDS[d]]) == expected
+        rename = rng.sample(range(4), 4)
+        renamed = [code & ~3 | rename[code & 3] for code in (a, b, c, d)]
+        assert table.equity(renamed[:2], renamed[2:]) == expected
+
+
+def test_invalid_hands_and_files_are_rejected(table, tmp_path):
+    with pytest.raises(ValueError):
+        table.equity([48, 49], [49, 0])
+    with pytest.raises(FileNotFoundError):
+        load_preflop_table(str(tmp_path / 'missing.bin'))
+    broken = tmp_path / 'broken.bin'
+    broken.write_bytes(b'PKPF' + bytes(100))
+    with pytest.raises(ValueError):
+        load_preflop_table(str(broken))
+
+
+def test_aces_beat_seven_two_offsuit_against_a_random_hand():
+    equities = {}
+    for name in ('AA', '72o'):
+        wins, ties, samples = _class_counts(CLASS_INDEX[name], 200, SeedSequence(1))
+        equities[name] = (sum(wins) + sum(ties) / 2) / sum(samples)
+    assert equities['AA'] == pytest.approx(0.85, abs=0.02)
+    assert equities['72o'] == pytest.approx(0.35, abs=0.02)
@@ -0,0 +1,107 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import asyncio
+import json
+from cardlib import SeedSequence
+from server import Connection, ServerTable
+
+
+class FakeTransport:
+    """Holds the bytes that a client has not read yet."""
+    def __init__(self):
+        self.buffered = 0
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+
+class FakeWriter:
+    """Collects the messages sent to a connection. A writer that is not read keeps every byte in its transport."""
+    def __init__(self, read=True):
+        self.messages = []
+        self.writes = 0
+        self.read = read
+        self.closed = False
+        self.transport = FakeTransport()
+
+    def is_closing(self):
+        return self.closed
+
+    def write(self, data):
+        self.writes += 1
+        self.messages += [json.loads(line) for line in data.splitlines()]
+        if not self.read:
+            self.transport.buffered += len(data)
+
+    def close(self):
+        self.closed = True
+
+
+def timeouts(connection):
+    return [message for message in connection.writer.messages if message.get('event') == 'timeout']
+
+
+async def play(spam_seat=None, spam_op=None, seconds=0.7):
+    table = ServerTable(0, 1000, 0.2, SeedSequence(0))
+    connections = [Connection(FakeWriter()), Connection(FakeWriter())]
+    for n, connection in enumerate(connections):
+        table.join(connection, f'P{n}')
+    table.task = asyncio.create_task(table.run())
+    first = table.active_seat()
+    waiting = 1 - first if spam_seat is None else spam_seat
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        if spam_op is not None:
+            table.queue.put_nowait((waiting, spam_op))
+        await asyncio.sleep(0.05)
+    for seat in range(2):
+        table.queue.put_nowait((seat, {'op': 'leave'}))
+    await table.task
+    return table, connections
+
+
+def test_idle_player_times_out():
+    table, connections = asyncio.run(play())
+    assert timeouts(connections[0])
+
+
+def test_resyncs_of_the_other_seat_do_not_restart_the_timer():
+    table, connections = asyncio.run(play(spam_op={'op': 'resync'}))
+    assert timeouts(connections[0])
+
+
+def test_rejected_actions_do_not_restart_the_timer():
+    table, connections = asyncio.run(play(spam_op={'op': 'action', 'action': 'dance'}))
+    assert timeouts(connections[0])
+
+
+def test_messages_of_one_pass_are_written_together():
+    async def send():
+        connection = Connection(FakeWriter())
+        for n in range(3):
+            connection.send({'n': n})
+        assert connection.writer.writes == 0
+        await asyncio.sleep(0)
+        return connection.writer
+
+    writer = asyncio.run(send())
+    assert writer.writes == 1
+    assert writer.messages == [{'n': 0}, {'n': 1}, {'n': 2}]
+
+
+def test_client_that_does_not_read_is_dropped():
+    async def send():
+        connection = Connection(FakeWriter(read=False))
+        connection.max_buffer = 1000
+        for n in range(100):
+            connection.send({'n': n, 'padding': 'x' * 50})
+            await asyncio.sleep(0)
+        return connection.writer
+
+    writer = asyncio.run(send())
+    assert writer.closed
+    assert writer.transport.buffered > 1000
+    # Nothing is written after the connection is closed.
+    assert len(writer.messages) == writer.writes < 100
@@ -0,0 +1,97 @@
+# DAT-171: Computer assignment 3
+# Authors: Daniel Soderqvist and Felix Mare
+
+import random
+import pytest
+from pokerengine import *
+from simulator import RandomPolicy
+from statesync import *
+
+
+def actions(game, rng, count):
+    """Plays up to count random actions and yields after every one of them."""
+    policy = RandomPolicy()
+    for _ in range(count):
+        if game.endgame:
+            return
+        action = policy.act(game, game.active_seat(), rng)
+        getattr(game, action[0])(*action[1:])
+        yield
+
+
+def hidden_cards(game, seat):
+    """Returns the codes of the hole cards of the other seats."""
+    return {card.code for other, player in enumerate(game.PlayerStates) if other != seat for card in player.hand.cards}
+
+
+def check_private(message, game, seat):
+    """Fails if an update sent to a seat holds a hole card of another seat."""
+    if isinstance(message, dict):
+        for other, player in enumerate(message['players']):
+            assert other == seat or player['hole'] == []
+        return
+    for op in message:
+        if op[0] in ('card', 'clear'):
+            assert op[1] in (seat, TABLE)
+        if op[0] == 'card':
+            assert op[2] not in hidden_cards(game, seat)
+
+
+@pytest.mark.parametrize('trial', range(20))
+def test_decoders_follow_the_encoder(trial):
+    rng = random.Random(trial)
+    seats = 2 + trial % 5
+    game = GameEngine(SeedSequence(trial).generator())
+    encoder = StateEncoder(keyframe_interval=rng.randint(1, 30))
+    game.start_game(tuple(f'P{seat}' for seat in range(seats)) + (200,))
+    encoder.attach(game)
+    decoders = [StateDecoder() for _ in range(seats)]
+
+    for _ in actions(game, rng, 400):
+        update = encoder.update()
+        if update is None:
+            continue
+        kind, seq, ops = update
+        for seat, decoder in enumerate(decoders):
+            if kind == 'keyframe':
+                state = encoder.keyframe(seat)
+                check_private(state, game, seat)
+                decoder.keyframe(seq, state)
+            else:
+                visible = visible_ops(ops, seat)
+                check_private(visible, game, seat)
+                assert decoder.delta(seq, visible)
+            assert decoder.state == encoder.keyframe(seat)
+            assert decoder.state['players'][seat]['hole'] == [card.code for card in game.PlayerStates[seat].hand]
+
+
+def test_a_missed_delta_is_caught_up_with_a_keyframe():
+    rng = random.Random(1)
+    game = GameEngine(SeedSequence(1).generator())
+    encoder = StateEncoder(keyframe_interval=1000)
+    game.start_game(('A', 'B', 1000))
+    encoder.attach(game)
+    decoder = StateDecoder()
+    kind, seq, _ = encoder.update()
+    assert kind == 'keyframe'
+    decoder.keyframe(seq, encoder.keyframe(0))
+
+    dropped = resynced = 0
+    for n, _ in enumerate(actions(game, rng, 200)):
+        update = encoder.update()
+        if update is None:
+            continue
+        kind, seq, ops = update
+        assert kind == 'delta'
+        if n % 7 == 3:
+            # This update is lost on the way.
+            dropped += 1
+            continue
+        if not decoder.delta(seq, visible_ops(ops, 0)):
+            # The decoder sees the gap and asks for a keyframe of the current state.
+            assert decoder.seq < seq - 1
+            decoder.keyframe(encoder.seq, encoder.keyframe(0))
+            resynced += 1
+        assert decoder.seq == seq
+        assert decoder.state == encoder.keyframe(0)
+    assert dropped and resynced == dropped